@@ -1,5 +1,6 @@
 import requests
 import json
+import numpy
 
 from requests.auth import AuthBase
 
@@ -7,7 +8,24 @@ from functools import wraps
 
 from .models import *
 from .files import *
+from .binary import *
 from .vectors import *
+from .lookup import *
+from .cache import *
+from .search import *
+from .ann import *
+from .vocabulary import *
+from .statistics import *
+from .clustering import *
+from .projection import *
+from .payloads import *
+from .batch import *
+from .streaming import *
+from .arithmetic import *
+from .embedding import *
+from .compression import *
+from .quantizers import *
+from .migrate import *
 from .args import *
 from .config import *
 
@@ -107,6 +125,105 @@ class FasttextApi(object):
             auth=FasttextAuth(self.username, self.password, self.config),
             **kwargs)
 
+    def embed_documents(self,
+                        documents,
+                        id,
+                        weighting='mean',
+                        weights=None,
+                        normalize=False):
+        """
+        Returns the pooled vectors of a batch of tokenized documents (a
+        list of lists of tokens) as a numpy array, one row per document
+        """
+        response = requests.post(
+            self._get_url('model/%s/embed' % id),
+            cookies=self._get_cookies(),
+            auth=FasttextAuth(self.username, self.password, self.config),
+            json={
+                'documents': documents,
+                'weighting': weighting,
+                'weights': weights,
+                'normalize': normalize
+            })
+        response.raise_for_status()
+        self.session = response.cookies.get('session', self.session)
+        shape = response.headers['X-Fasttextdb-Shape'].split(',')
+        return numpy.frombuffer(
+            response.content, dtype='<f4').reshape([int(x) for x in shape])
+
+    def get_vectors(self, id, words=None, format='npy', **params):
+        """
+        Returns a tuple of (words, values) of the vectors of a model (a
+        page of them, see the page, page_size and cursor parameters) or
+        of the given words, with the values as a numpy array. They are
+        fetched as an .npy or Arrow (format='arrow') payload instead of
+        JSON.
+        """
+        mimetype = {'npy': NPY_MIMETYPE, 'arrow': ARROW_MIMETYPE}[format]
+        kwargs = {
+            'cookies': self._get_cookies(),
+            'auth': FasttextAuth(self.username, self.password, self.config),
+            'headers': {
+                'Accept': mimetype
+            }
+        }
+
+        if words is None:
+            response = requests.get(
+                self._get_url('model/%s/vectors' % id),
+                params=params,
+                **kwargs)
+        else:
+            response = requests.post(
+                self._get_url('model/%s/vectors/words' % id),
+                params=dict(params, word=words),
+                **kwargs)
+
+        response.raise_for_status()
+        self.session = response.cookies.get('session', self.session)
+        return decode_payload(response.content,
+                              response.headers['Content-Type'].split(';')[0])
+
+    def lookup_words(self, words, id, format='npy'):
+        """
+        Looks up the vectors of a long list of words in one request.
+        Returns a tuple of a float32 (len(words), dim) array in the order
+        of the words and a boolean array of the words that were found
+        (the rows of the others are NaN).
+        """
+        mimetype = {'npy': NPY_MIMETYPE, 'arrow': ARROW_MIMETYPE}[format]
+        response = requests.post(
+            self._get_url('model/%s/vectors/batch' % id),
+            cookies=self._get_cookies(),
+            auth=FasttextAuth(self.username, self.password, self.config),
+            headers={
+                'Accept': mimetype,
+                'Content-Type': 'text/plain; charset=utf-8'
+            },
+            data='\n'.join(words).encode('utf-8'))
+        response.raise_for_status()
+        self.session = response.cookies.get('session', self.session)
+        words, values = decode_payload(
+            response.content, response.headers['Content-Type'].split(';')[0])
+        return values, ~numpy.isnan(values).any(axis=1)
+
+    def stream_vectors(self, blocks, id, format='binary'):
+        """
+        Sends a source of (words, values) blocks to a model in one
+        streamed request, as length-prefixed binary records or NDJSON
+        (format='ndjson'), without holding more than a block in memory
+        """
+        if format == 'ndjson':
+            mimetype, body = 'application/x-ndjson', ndjson_records(blocks)
+        else:
+            mimetype, body = 'application/octet-stream', binary_records(
+                blocks)
+
+        return self.post(
+            'model/%s/vectors/stream' % id,
+            headers={'Content-Type': mimetype},
+            data=body)
+
     def upload_file(self, file, id=None, name=None):
         if id:
             return self.post(
@@ -0,0 +1,367 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import numpy
+
+from sqlalchemy.engine.url import make_url
+
+from .models import *
+from .lookup import *
+from .quantizers import _nearest
+from .search import METRICS, top_k, _get_executor
+
+__all__ = [
+    'IVFIndex', 'index_dir', 'model_index_path', 'build_index',
+    'update_index', 'load_index', 'DEFAULT_NPROBE'
+]
+
+DEFAULT_NPROBE = 16
+
+_META = 'meta.json'
+_ARRAYS = ['centroids', 'offsets', 'vectors', 'norms']
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def index_dir(config):
+    """
+    Returns the directory for the ANN index files: index.path from the
+    configuration, or an indexes directory next to a SQLite database
+    (or in the working directory for other databases)
+    """
+    if config['index']['path']:
+        return config['index']['path']
+
+    url = make_url(config['db']['url'])
+
+    if url.drivername.startswith('sqlite') and url.database:
+        return os.path.join(
+            os.path.dirname(os.path.abspath(url.database)), 'indexes')
+
+    return os.path.join(os.getcwd(), 'indexes')
+
+
+def model_index_path(config, model):
+    return os.path.join(index_dir(config), 'model-%s' % model.id)
+
+
+class IVFIndex(object):
+    """
+    An inverted file (IVF-flat) index over a model's vectors: the unit
+    length vectors are clustered around nlist centroids and stored
+    sorted by cluster, so a search only scores the vectors of the nprobe
+    clusters closest to each query. last_id is the highest Vector.id in
+    the index, so vectors added later can be indexed incrementally.
+    """
+
+    def __init__(self, centroids, offsets, vectors, norms, words, last_id):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.norms = norms
+        self.words = words
+        self.last_id = last_id
+        self._rows = None
+
+    def __len__(self):
+        return len(self.words)
+
+    @staticmethod
+    def train(values, nlist=None, iterations=10, sample_size=None, seed=0):
+        """
+        Clusters a sample of the (unit length) values with k-means and
+        returns an empty index with the centroids. nlist defaults to the
+        square root of the number of values, and the sample to 40
+        vectors per centroid.
+        """
+        nlist = min(nlist or int(numpy.sqrt(len(values))) or 1, len(values))
+        sample_size = min(sample_size or nlist * 40, len(values))
+        random = numpy.random.RandomState(seed)
+        sample = values[numpy.sort(
+            random.choice(len(values), sample_size, replace=False))]
+        centroids = sample[random.choice(sample_size, nlist, replace=False)]
+
+        for i in range(iterations):
+            assignments = _nearest(sample, centroids)
+            order = numpy.argsort(assignments, kind='mergesort')
+            clusters, starts = numpy.unique(
+                assignments[order], return_index=True)
+            sums = numpy.add.reduceat(sample[order], starts)
+            centroids[clusters] = sums / numpy.maximum(
+                numpy.linalg.norm(sums, axis=1), 1e-12)[:, None]
+
+        return IVFIndex(
+            numpy.ascontiguousarray(centroids, dtype=numpy.float32),
+            numpy.zeros(nlist + 1, dtype=numpy.int64),
+            numpy.empty((0, values.shape[1]), dtype=numpy.float32),
+            numpy.empty(0, dtype=numpy.float32), [], -1)
+
+    def add(self, ids, words, values):
+        """
+        Adds vectors (with their Vector.ids) to the index, assigning
+        them to the existing clusters. The vectors are merged with the
+        indexed ones into new in-memory arrays.
+        """
+        if not len(words):
+            return self
+
+        values = numpy.asarray(values, dtype=numpy.float32)
+        norms = numpy.linalg.norm(values, axis=1)
+        values = values / numpy.where(norms == 0, 1, norms)[:, None]
+        lists = numpy.concatenate([
+            numpy.repeat(
+                numpy.arange(len(self.centroids)), numpy.diff(self.offsets)),
+            _nearest(values, self.centroids)
+        ])
+        order = numpy.argsort(lists, kind='mergesort')
+        self.vectors = numpy.concatenate([self.vectors, values])[order]
+        self.norms = numpy.concatenate([self.norms, norms])[order]
+        all_words = list(self.words) + list(words)
+        self.words = [all_words[i] for i in order]
+        self.offsets = numpy.concatenate([[0], numpy.cumsum(
+            numpy.bincount(lists, minlength=len(self.centroids)))])
+        self.last_id = max(self.last_id, int(max(ids)))
+        self._rows = None
+        return self
+
+    def row(self, word):
+        if self._rows is None:
+            self._rows = dict((w, i) for i, w in enumerate(self.words))
+
+        return self._rows.get(word)
+
+    def vectors_for_rows(self, rows):
+        return self.vectors[rows] * self.norms[rows, None]
+
+    def search(self,
+               queries,
+               k=10,
+               metric='cosine',
+               exclude=None,
+               nprobe=DEFAULT_NPROBE):
+        """
+        Approximate search for the k rows with the highest cosine
+        similarity (or dot product) to each query vector, scoring only
+        the vectors in the nprobe clusters whose centroids are closest
+        to the query; a larger nprobe gives better recall for more
+        latency. Queries are searched in parallel on the thread pool of
+        fasttextdb.search. Returns a list of lists of (row, score) tuples
+        like ModelMatrix.search.
+        """
+        if metric not in METRICS:
+            raise Exception('unknown metric %s' % metric)
+
+        queries = numpy.atleast_2d(
+            numpy.asarray(queries, dtype=numpy.float32))
+        norms = numpy.linalg.norm(queries, axis=1)
+        units = queries / numpy.where(norms == 0, 1, norms)[:, None]
+        nprobe = max(1, min(int(nprobe), len(self.centroids)))
+        probes = top_k(self.centroids.dot(units.T), nprobe)
+        extra = 1 if exclude is not None else 0
+
+        def search_one(i):
+            q = units[i] if metric == 'cosine' else queries[i]
+            rows = []
+            scores = []
+
+            for c in probes[:, i]:
+                start, end = self.offsets[c], self.offsets[c + 1]
+                s = self.vectors[start:end].dot(q)
+
+                if metric == 'dot':
+                    s *= self.norms[start:end]
+
+                rows.append(numpy.arange(start, end))
+                scores.append(s)
+
+            rows = numpy.concatenate(rows)
+            scores = numpy.concatenate(scores)[:, None]
+            best = top_k(scores, k + extra)[:, 0]
+            result = [(int(rows[b]), float(scores[b, 0])) for b in best
+                      if exclude is None or rows[b] != exclude[i]]
+            return result[:k]
+
+        return list(_get_executor().map(search_one, range(len(queries))))
+
+    def save(self, path):
+        """
+        Writes the index to a new versioned directory next to path and
+        then points path (a symbolic link) at it with a single
+        os.replace, so loaders see either the previous version or this
+        one, never a mix of files. The version before the previous one
+        is removed; the previous one is kept for loaders still reading
+        it.
+        """
+        path = os.path.abspath(path)
+        parent, name = os.path.split(path)
+
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+
+        version = tempfile.mkdtemp(prefix='%s.v' % name, dir=parent)
+
+        for array in _ARRAYS:
+            numpy.save(
+                os.path.join(version, '%s.npy' % array),
+                numpy.ascontiguousarray(getattr(self, array)))
+
+        with open(os.path.join(version, _META), 'w') as f:
+            json.dump({
+                'lastId': self.last_id,
+                'words': list(self.words)
+            }, f)
+
+        previous = _current_version(path)
+
+        if os.path.isdir(path) and not os.path.islink(path):
+            # an index saved in place before versioned directories
+            shutil.rmtree(path)
+
+        link = os.path.join(parent, '%s.link.%s.%s' %
+                            (name, os.getpid(), threading.get_ident()))
+
+        if os.path.lexists(link):
+            os.remove(link)
+
+        os.symlink(os.path.basename(version), link)
+        os.replace(link, path)
+
+        for entry in os.listdir(parent):
+            old = os.path.join(parent, entry)
+
+            if entry.startswith('%s.v' % name) and old not in (version,
+                                                              previous):
+                shutil.rmtree(old, ignore_errors=True)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """
+        Reads an index written by save, memory-mapping the vectors. The
+        link is resolved once, so all files come from one version; if
+        that version is removed by later saves while it is being read,
+        the current one is read instead.
+        """
+        while True:
+            version = os.path.realpath(path)
+
+            try:
+                return IVFIndex._load_version(version, mmap)
+            except (IOError, OSError):
+                if os.path.realpath(path) == version:
+                    raise
+
+    @staticmethod
+    def _load_version(path, mmap):
+        with open(os.path.join(path, _META)) as f:
+            meta = json.load(f)
+
+        arrays = dict((name, numpy.load(
+            os.path.join(path, '%s.npy' % name),
+            mmap_mode='r' if mmap and name == 'vectors' else None))
+                      for name in _ARRAYS)
+        return IVFIndex(arrays['centroids'], arrays['offsets'],
+                        arrays['vectors'], arrays['norms'], meta['words'],
+                        meta['lastId'])
+
+
+def _new_vectors(session, model, after_id, batch_size):
+    """
+    Reads the model's vectors with an ID above after_id in batches, as
+    tuples of (ids, words, values)
+    """
+    table = Vector.__table__
+
+    while True:
+        q = select_vectors(model).where(table.c.id > after_id).order_by(
+            table.c.id).limit(batch_size)
+        rows = session.execute(q).fetchall()
+
+        if not rows:
+            break
+
+        values = unpack_arrays([r[3] for r in rows], [r[4] for r in rows],
+                               model.compression_dict, model.quantizer)
+        yield [r[0] for r in rows], [r[1] for r in rows], values
+        after_id = rows[-1][0]
+
+
+def build_index(session,
+                model,
+                path,
+                nlist=None,
+                iterations=10,
+                sample_size=None,
+                batch_size=100000):
+    """
+    Builds the IVF index of all of the model's vectors and saves it to
+    path. Returns the index.
+    """
+    ids = []
+    words = []
+    values = []
+
+    for i, w, v in _new_vectors(session, model, -1, batch_size):
+        ids.extend(i)
+        words.extend(w)
+        values.append(v)
+
+    if not values:
+        raise Exception('model %s has no vectors to index' % model.id)
+
+    values = numpy.concatenate(values)
+    norms = numpy.linalg.norm(values, axis=1)
+    units = values / numpy.where(norms == 0, 1, norms)[:, None]
+    index = IVFIndex.train(units, nlist, iterations, sample_size)
+    index.add(ids, words, values)
+    index.save(path)
+    return index
+
+
+def update_index(session, model, path, batch_size=100000):
+    """
+    Adds the model's vectors created since the index at path was built
+    or last updated, keeping the clusters, and saves it again. Returns
+    the number of vectors added.
+    """
+    index = IVFIndex.load(path, mmap=False)
+    count = 0
+
+    for ids, words, values in _new_vectors(session, model, index.last_id,
+                                           batch_size):
+        index.add(ids, words, values)
+        count += len(ids)
+
+    if count:
+        index.save(path)
+
+    return count
+
+
+def _current_version(path):
+    """
+    Returns the versioned directory an index path links to, or None
+    """
+    if not os.path.islink(path):
+        return None
+
+    return os.path.realpath(path)
+
+
+def load_index(path):
+    """
+    Returns the index saved at path, or None if there is none. Loaded
+    indexes are kept in memory and reloaded when a new version is saved.
+    """
+    if not os.path.exists(os.path.join(path, _META)):
+        return None
+
+    version = os.path.realpath(path)
+
+    with _loaded_lock:
+        if path not in _loaded or _loaded[path][0] != version:
+            _loaded[path] = (version, IVFIndex.load(version))
+
+        return _loaded[path][1]
@@ -0,0 +1,91 @@
+import re
+import numpy
+
+__all__ = ['parse_expression', 'expression_terms', 'evaluate_expressions']
+
+# optional sign, optional "weight *", and a word (which may contain
+# hyphens, so subtraction needs a space before the word)
+_TERM = re.compile(r'\s*([+-]?)\s*'
+                   r'(?:(\d+(?:\.\d*)?|\.\d+)\s*\*\s*)?'
+                   r'([^\s+*-][^\s+*]*)')
+
+
+def parse_expression(expression):
+    """
+    Parses an expression over words like "king - man + woman" or
+    "0.5 * paris + 0.5 * berlin" into a list of (weight, word) tuples
+    """
+    terms = []
+    pos = 0
+    expression = expression.strip()
+
+    while pos < len(expression):
+        match = _TERM.match(expression, pos)
+
+        if not match or (terms and not match.group(1)):
+            raise ValueError('cannot parse expression %r' % expression)
+
+        sign = -1.0 if match.group(1) == '-' else 1.0
+        weight = float(match.group(2)) if match.group(2) else 1.0
+        terms.append((sign * weight, match.group(3)))
+        pos = match.end()
+
+    if not terms:
+        raise ValueError('empty expression')
+
+    return terms
+
+
+def expression_terms(expression):
+    """
+    Returns the (weight, word) terms of an expression given as a string
+    (see parse_expression), a list of words (their centroid) or a dict
+    with positive and negative lists of words. Raises ValueError for
+    an empty expression.
+    """
+    if isinstance(expression, str):
+        return parse_expression(expression)
+    elif isinstance(expression, dict):
+        terms = [(1.0, w) for w in expression.get('positive', [])] + \
+            [(-1.0, w) for w in expression.get('negative', [])]
+    elif isinstance(expression, list):
+        terms = [(1.0 / len(expression), w) for w in expression]
+    else:
+        raise ValueError('cannot parse expression %r' % (expression, ))
+
+    if not terms:
+        raise ValueError('empty expression')
+
+    return terms
+
+
+def evaluate_expressions(terms, words, values, normalize=True):
+    """
+    Evaluates lists of (weight, word) terms over the vectors of words
+    (values, an (n, dim) array) as one matrix product of the weights by
+    the (unit length, if normalize) vectors. Returns a tuple of the
+    (expressions, dim) result array and a list of the missing words of
+    each expression; the results of expressions with missing words are
+    left as zeros.
+    """
+    values = numpy.asarray(values, dtype=numpy.float32)
+
+    if normalize and len(values):
+        norms = numpy.linalg.norm(values, axis=1)
+        values = values / numpy.where(norms == 0, 1, norms)[:, None]
+
+    rows = dict((w, i) for i, w in enumerate(words))
+    weights = numpy.zeros((len(terms), len(words)), dtype=numpy.float32)
+    missing = []
+
+    for i, expression in enumerate(terms):
+        missing.append([w for weight, w in expression if w not in rows])
+
+        if not missing[-1]:
+            for weight, w in expression:
+                weights[i, rows[w]] += weight
+
+    if not len(values):
+        return numpy.zeros((len(terms), 0), dtype=numpy.float32), missing
+
+    return weights.dot(values), missing
@@ -0,0 +1,90 @@
+import numpy
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .lookup import *
+from .cache import *
+
+__all__ = ['lookup_matrix', 'in_chunk_size', 'DEFAULT_LOOKUP_WORKERS']
+
+DEFAULT_LOOKUP_WORKERS = 4
+
+# words per IN (...) query: SQLite builds before 3.32 allow 999 bound
+# parameters per statement (one is the model ID); other databases plan
+# very long IN lists poorly, so they get a few thousand
+_IN_CHUNK_SIZES = {'sqlite': 900, 'postgresql': 5000, 'mysql': 5000}
+
+
+def in_chunk_size(dialect):
+    """
+    Returns the number of words to look up per query for a database
+    dialect name
+    """
+    return _IN_CHUNK_SIZES.get(dialect, 1000)
+
+
+def lookup_matrix(Session,
+                  model,
+                  words,
+                  cache=None,
+                  chunk_size=None,
+                  workers=DEFAULT_LOOKUP_WORKERS,
+                  executor=None):
+    """
+    Looks up the vectors of a long list of words as a dense float32
+    (len(words), dim) array in the order of the words, with rows of NaN
+    for words without a vector. Returns a tuple of the array and a
+    boolean array of the words that were found.
+
+    The distinct words are split into chunks of chunk_size (see
+    in_chunk_size) and the chunks are looked up concurrently by workers
+    threads (or on executor), each in its own session from Session, so
+    they run on separate pooled connections. Words in the cache (a
+    VectorCache) are not read again.
+    """
+    distinct = list(dict.fromkeys(words))
+    dim = model.dim or 0
+
+    if not chunk_size:
+        session = Session()
+        chunk_size = in_chunk_size(session.bind.dialect.name)
+        session.close()
+
+    chunks = [
+        distinct[start:start + chunk_size]
+        for start in range(0, len(distinct), chunk_size)
+    ]
+
+    def lookup_chunk(chunk):
+        session = Session()
+
+        try:
+            if cache is not None:
+                records = cached_vectors(session, model, chunk, cache)
+                return ([r.word for r in records],
+                        [r.values for r in records])
+
+            return read_matrix(session, select_vectors(model, chunk), model)
+        finally:
+            session.close()
+
+    if executor is None and len(chunks) > 1:
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(lookup_chunk, chunks))
+    else:
+        results = list((executor.map if executor else map)(lookup_chunk,
+                                                           chunks))
+
+    values = numpy.full((len(words), dim), numpy.nan, dtype=numpy.float32)
+    found = numpy.zeros(len(words), dtype=bool)
+    positions = {}
+
+    for i, w in enumerate(words):
+        positions.setdefault(w, []).append(i)
+
+    for chunk_words, chunk_values in results:
+        for w, v in zip(chunk_words, chunk_values):
+            values[positions[w]] = v
+            found[positions[w]] = True
+
+    return values, found
@@ -0,0 +1,245 @@
+import struct
+import numpy
+
+from .subwords import subword_ids, save_buckets
+
+__all__ = [
+    'FASTTEXT_MAGIC', 'read_fasttext_header', 'read_fasttext_blocks',
+    'read_word2vec_blocks', 'is_fasttext_file', 'is_word2vec_file'
+]
+
+FASTTEXT_MAGIC = 793712314
+
+DEFAULT_BLOCK_ROWS = 1000
+
+_LOSS_FUNCTIONS = {1: 'hs', 2: 'ns', 3: 'softmax', 4: 'ova'}
+
+_TEXT_BYTES = frozenset(b'0123456789.-+eEinfaINFA \t\r\n')
+
+
+class _Reader(object):
+    """
+    Buffered reader over a file-like object, for reading the mix of
+    fixed-size and delimited fields found in binary model files.
+    """
+
+    def __init__(self, file_, buffer_size=1024 * 1024):
+        self.file = file_
+        self.buffer_size = buffer_size
+        self.buffer = b''
+        self.pos = 0
+
+    def _fill(self):
+        chunk = self.file.read(self.buffer_size)
+
+        if not chunk:
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def read(self, size):
+        while len(self.buffer) - self.pos < size:
+            if not self._fill():
+                raise Exception('unexpected end of model file')
+
+        x = self.buffer[self.pos:self.pos + size]
+        self.pos += size
+        return x
+
+    def read_until(self, delimiter):
+        """
+        Reads up to the delimiter, consuming but not returning it. Returns
+        None at the end of the file.
+        """
+        while True:
+            end = self.buffer.find(delimiter, self.pos)
+
+            if end >= 0:
+                x = self.buffer[self.pos:end]
+                self.pos = end + len(delimiter)
+                return x
+
+            if not self._fill():
+                return None
+
+    def unpack(self, fmt):
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))
+
+    def readinto(self, array):
+        """
+        Fills a numpy array with raw bytes from the file, copying what is
+        left in the buffer and reading the rest straight into the array.
+        """
+        view = memoryview(array).cast('B')
+        n = min(len(view), len(self.buffer) - self.pos)
+        view[:n] = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+
+        while n < len(view):
+            if hasattr(self.file, 'readinto'):
+                m = self.file.readinto(view[n:])
+            else:
+                x = self.file.read(len(view) - n)
+                m = len(x)
+                view[n:n + m] = x
+
+            if not m:
+                raise Exception('unexpected end of model file')
+
+            n += m
+
+        return array
+
+
+def is_fasttext_file(head):
+    """
+    Checks the first bytes of a file for the fastText magic number
+    """
+    return len(head) >= 4 and struct.unpack('<i',
+                                            head[:4])[0] == FASTTEXT_MAGIC
+
+
+def is_word2vec_file(head):
+    """
+    Checks the first bytes of a file (including the header line) for
+    word2vec binary vectors, which follow the header line and the first
+    word as raw floats instead of text.
+    """
+    header, _, rest = head.partition(b'\n')
+    parts = header.split()
+
+    if len(parts) != 2 or not all(p.isdigit() for p in parts):
+        return False
+
+    word, _, values = rest.partition(b' ')
+    line, newline, _ = values.partition(b'\n')
+
+    if not set(line) <= _TEXT_BYTES:
+        return True
+
+    return bool(newline) and len(line.split()) != int(parts[1])
+
+
+def read_fasttext_header(file_):
+    """
+    Reads the arguments and dictionary of a fastText .bin model. Returns
+    a tuple of (model_info, words, reader), where model_info has values
+    for the Model columns, and reader is positioned at the input matrix,
+    ready for read_fasttext_blocks.
+    """
+    reader = _Reader(file_)
+    magic, version = reader.unpack('<ii')
+
+    if magic != FASTTEXT_MAGIC:
+        raise Exception('not a fastText model file (or an old version)')
+
+    (dim, ws, epoch, min_count, neg, word_ngrams, loss, model, bucket, minn,
+     maxn, lr_update_rate, t) = reader.unpack('<12id')
+
+    size, nwords, nlabels, ntokens, pruneidx_size = reader.unpack('<iiiqq')
+    words = []
+
+    for i in range(size):
+        word = reader.read_until(b'\0')
+        count, type_ = reader.unpack('<qb')
+
+        if i < nwords:
+            words.append(word.decode('utf-8'))
+
+    if pruneidx_size > 0:
+        reader.read(8 * pruneidx_size)
+
+    quant, = reader.unpack('<?')
+
+    if quant:
+        raise Exception('quantized fastText models are not supported')
+
+    model_info = {
+        'num_words': nwords,
+        'dim': dim,
+        'window_size': ws,
+        'epoch': epoch,
+        'min_count': min_count,
+        'negatives_sampled': neg,
+        'word_ngrams': word_ngrams,
+        'loss_function': _LOSS_FUNCTIONS.get(loss),
+        'num_buckets': bucket,
+        'min_ngram_len': minn,
+        'max_ngram_len': maxn,
+        'learning_rate_update_rate_change': lr_update_rate,
+        'sampling_threshold': t
+    }
+
+    return model_info, words, reader
+
+
+def read_fasttext_blocks(model_info,
+                         words,
+                         reader,
+                         block_rows=DEFAULT_BLOCK_ROWS,
+                         buckets_path=None):
+    """
+    Generator: reads the input matrix of a fastText .bin model (see
+    read_fasttext_header), and returns tuples of (words, values) like
+    fasttextdb.files.read_blocks. As in fastText itself, the vector of
+    a word is the average of its own row and the rows of its n-grams.
+    If buckets_path is given, the n-gram bucket rows are saved there
+    (see fasttextdb.subwords.BucketMatrix).
+    """
+    rows, cols = reader.unpack('<qq')
+    matrix = reader.readinto(numpy.empty((rows, cols), dtype='<f4'))
+    nwords = len(words)
+
+    if buckets_path and rows > nwords:
+        save_buckets(buckets_path, matrix[nwords:])
+
+    for start in range(0, nwords, block_rows):
+        block = words[start:start + block_rows]
+        ids, counts = subword_ids(block, model_info['min_ngram_len'],
+                                  model_info['max_ngram_len'],
+                                  model_info['num_buckets'], nwords)
+        values = matrix[start:start + len(block)].astype(numpy.float32)
+
+        if len(ids):
+            offsets = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+            sums = numpy.zeros_like(values)
+            has = counts > 0
+            sums[has] = numpy.add.reduceat(
+                matrix[ids], offsets[has], axis=0)
+            values = (values + sums) / (counts + 1.0).astype(
+                numpy.float32)[:, None]
+
+        yield block, values
+
+
+def read_word2vec_blocks(file_, num_words, dim, block_rows=DEFAULT_BLOCK_ROWS):
+    """
+    Generator: reads word2vec binary vectors from a file (assumes the
+    header line was read with fasttextdb.files.model_file), and returns
+    tuples of (words, values) like fasttextdb.files.read_blocks.
+    """
+    reader = _Reader(file_)
+    size = 4 * dim
+    words = []
+    values = []
+
+    for i in range(num_words):
+        word = reader.read_until(b' ')
+
+        if word is None:
+            break
+
+        words.append(word.lstrip(b'\n').decode('utf-8'))
+        values.append(reader.read(size))
+
+        if len(words) == block_rows:
+            yield words, numpy.frombuffer(
+                b''.join(values), dtype='<f4').reshape((len(words), dim))
+            words = []
+            values = []
+
+    if words:
+        yield words, numpy.frombuffer(
+            b''.join(values), dtype='<f4').reshape((len(words), dim))
@@ -0,0 +1,167 @@
+import time
+import threading
+import numpy
+
+from collections import OrderedDict
+
+from .models import *
+from .lookup import *
+
+__all__ = ['VectorCache', 'cached_vectors', 'DEFAULT_CACHE_BYTES']
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# rough per-entry overhead of the key, record and dict slot in bytes
+_ENTRY_OVERHEAD = 200
+
+
+class VectorCache(object):
+    """
+    A thread-safe LRU cache of decoded vectors (VectorRecords) keyed by
+    (model_id, word), bounded by the estimated size of the entries in
+    bytes. Entries expire after ttl seconds if ttl is set. Words a
+    model has no vector for are cached too, so repeated misses don't go
+    to the database either.
+
+    Every invalidation of a model moves it to a new generation; records
+    read before that (see generation) are not cached, so a read that
+    raced with an invalidation cannot leave stale entries behind.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self, model_id):
+        """
+        Returns the current generation of a model's entries, to pass to
+        put for records read from now on
+        """
+        with self._lock:
+            return self._generation, self._generations.get(model_id, 0)
+
+    def get(self, model_id, words):
+        """
+        Returns a tuple of (found, missing): a dict of the cached
+        records by word (None for words known to have no vector) and a
+        list of the words that have to be read from the database
+        """
+        found = {}
+        missing = []
+        now = time.time()
+
+        with self._lock:
+            for word in words:
+                key = (model_id, word)
+                entry = self._entries.get(key)
+
+                if entry is not None and entry[2] is not None and \
+                   entry[2] < now:
+                    self._remove(key)
+                    entry = None
+
+                if entry is None:
+                    self.misses += 1
+                    missing.append(word)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    found[word] = entry[0]
+
+        return found, missing
+
+    def put(self, model_id, word, record, generation=None):
+        """
+        Caches the record for the word (None if the model has no vector
+        for it), evicting the least recently used entries if needed. If
+        generation is given, the record is only cached if the model has
+        not been invalidated since.
+        """
+        size = _ENTRY_OVERHEAD + len(word) * 4
+
+        if record is not None:
+            # the values of a read record are a row of its batch's
+            # matrix, which would keep the whole matrix alive, so a
+            # copy of the record with a copy of the row is cached
+            values = numpy.array(record.values)
+            values.flags.writeable = False
+            record = VectorRecord(record.id, record.word, record.model_id,
+                                  values, record._model, record.norm)
+            size += values.nbytes
+
+        if size > self.max_bytes:
+            return
+
+        expires = time.time() + self.ttl if self.ttl else None
+
+        with self._lock:
+            if generation is not None and generation != (
+                    self._generation, self._generations.get(model_id, 0)):
+                return
+
+            key = (model_id, word)
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (record, size, expires)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, model_id=None):
+        """
+        Drops the cached entries of a model, or all entries
+        """
+        with self._lock:
+            if model_id is None:
+                self._generation += 1
+                self._entries.clear()
+                self.size = 0
+            else:
+                self._generations[model_id] = \
+                    self._generations.get(model_id, 0) + 1
+
+                for key in [k for k in self._entries if k[0] == model_id]:
+                    self._remove(key)
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key)[1]
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'maxBytes': self.max_bytes
+        }
+
+
+def cached_vectors(session, model, words, cache, by_hash=False):
+    """
+    Returns the VectorRecords for the words of a model in the order of
+    the words (skipping words without a vector), reading only the words
+    not in the cache from the database, with one query
+    """
+    generation = cache.generation(model.id)
+    found, missing = cache.get(model.id, words)
+
+    if missing:
+        records = read_vectors(session,
+                               select_vectors(model, missing, by_hash), model)
+        read = dict((r.word, r) for r in records)
+
+        for word in missing:
+            found[word] = read.get(word)
+            cache.put(model.id, word, found[word], generation)
+
+    return [found[w] for w in words if found[w] is not None]
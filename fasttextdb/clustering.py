@@ -0,0 +1,266 @@
+import numpy
+
+from sqlalchemy import func
+
+from .models import *
+from .ann import _new_vectors
+from .search import _get_executor
+
+__all__ = [
+    'MiniBatchKMeans', 'cluster_model', 'latest_clustering',
+    'cluster_of_word', 'cluster_members', 'count_cluster_members'
+]
+
+
+class MiniBatchKMeans(object):
+    """
+    Mini-batch k-means (Sculley, 2010): each batch of vectors is
+    assigned to the closest centroids, and every centroid moves to the
+    running mean of all of the vectors assigned to it so far. Only the
+    centroids and their counts are kept, so any number of vectors can be
+    streamed through partial_fit. With normalize, vectors and centroids
+    are scaled to unit length (spherical k-means, for cosine similarity).
+    """
+
+    def __init__(self, k, normalize=True, block_rows=1024, seed=0):
+        self.k = k
+        self.normalize = normalize
+        self.block_rows = block_rows
+        self.random = numpy.random.RandomState(seed)
+        self.centroids = None
+        self._seed_rows = []
+        self.counts = numpy.zeros(k, dtype=numpy.int64)
+
+    def _prepare(self, values):
+        values = numpy.asarray(values, dtype=numpy.float32)
+
+        if self.normalize:
+            norms = numpy.linalg.norm(values, axis=1)
+            values = values / numpy.where(norms == 0, 1, norms)[:, None]
+
+        return values
+
+    def assign(self, values, prepared=False):
+        """
+        Returns the index of the closest centroid to each vector and the
+        distance to it (cosine distance if normalized, else euclidean),
+        scoring blocks of block_rows vectors in parallel on the thread
+        pool of fasttextdb.search
+        """
+        values = values if prepared else self._prepare(values)
+        c2 = (self.centroids**2).sum(axis=1)
+
+        def assign_block(start):
+            block = values[start:start + self.block_rows]
+            d = c2 - 2 * block.dot(self.centroids.T)
+            labels = d.argmin(axis=1)
+            d = d[numpy.arange(len(block)), labels] + (block**2).sum(axis=1)
+            return labels, d
+
+        blocks = list(_get_executor().map(
+            assign_block, range(0, len(values), self.block_rows)))
+
+        if not blocks:
+            return numpy.empty(0, numpy.int64), numpy.empty(0, numpy.float32)
+
+        labels = numpy.concatenate([b[0] for b in blocks])
+        distances = numpy.maximum(numpy.concatenate([b[1] for b in blocks]),
+                                  0)
+        # |a - b|^2 = 2 - 2 cos for unit vectors
+        return labels, (distances / 2 if self.normalize else
+                        numpy.sqrt(distances))
+
+    def partial_fit(self, values):
+        """
+        Updates the centroids with a batch of vectors. The first
+        batches (until there are 3 * k vectors) seed the centroids.
+        Returns self.
+        """
+        values = self._prepare(values)
+
+        if not len(values):
+            return self
+
+        if self.centroids is None:
+            self._seed_rows.append(values)
+
+            if sum(len(v) for v in self._seed_rows) < 3 * self.k:
+                return self
+
+            return self.flush()
+
+        return self._update(values)
+
+    def flush(self):
+        """
+        Seeds the centroids from the batches held back so far, if there
+        are at least k vectors (at the end of a stream shorter than
+        3 * k vectors). Returns self.
+        """
+        if self.centroids is None and self._seed_rows:
+            values = numpy.concatenate(self._seed_rows)
+
+            if len(values) >= self.k:
+                self._seed_rows = []
+                self.centroids = self._seed(values)
+                self._update(values)
+
+        return self
+
+    def _update(self, values):
+        labels = self.assign(values, prepared=True)[0]
+        order = numpy.argsort(labels, kind='mergesort')
+        clusters, starts, counts = numpy.unique(
+            labels[order], return_index=True, return_counts=True)
+        sums = numpy.add.reduceat(values[order], starts)
+        total = self.counts[clusters] + counts
+        self.centroids[clusters] = (
+            self.centroids[clusters] * self.counts[clusters, None] + sums
+        ) / total[:, None]
+        self.counts[clusters] = total
+
+        if self.normalize:
+            norms = numpy.linalg.norm(self.centroids[clusters], axis=1)
+            self.centroids[clusters] /= numpy.where(norms == 0, 1,
+                                                    norms)[:, None]
+
+        return self
+
+    def _seed(self, values):
+        """
+        Picks k of the values as initial centroids with k-means++: each
+        next one is drawn with probability proportional to the squared
+        distance to the closest one picked so far
+        """
+        v2 = (values**2).sum(axis=1)
+        centroids = numpy.empty((self.k, values.shape[1]), values.dtype)
+        centroids[0] = values[self.random.randint(len(values))]
+        closest = numpy.maximum(
+            v2 - 2 * values.dot(centroids[0]) + (centroids[0]**2).sum(), 0)
+
+        for i in range(1, self.k):
+            p = closest.astype(numpy.float64)
+            p = p / p.sum() if p.sum() > 0 else None
+            centroids[i] = values[self.random.choice(len(values), p=p)]
+            d = numpy.maximum(v2 - 2 * values.dot(centroids[i]) +
+                              (centroids[i]**2).sum(), 0)
+            closest = numpy.minimum(closest, d)
+
+        return centroids
+
+    def reseed_empty(self, values):
+        """
+        Moves the centroids that no vector was assigned to onto random
+        vectors of values
+        """
+        empty = numpy.flatnonzero(self.counts == 0)
+
+        if len(empty) and len(values) >= len(empty):
+            values = self._prepare(values)
+            self.centroids[empty] = values[self.random.choice(
+                len(values), len(empty), replace=False)]
+
+
+def _batches(chunks, batch_size):
+    for ids, words, values in chunks:
+        for start in range(0, len(ids), batch_size):
+            yield values[start:start + batch_size]
+
+
+def cluster_model(session,
+                  model,
+                  k,
+                  epochs=3,
+                  batch_size=4096,
+                  chunk_size=50000,
+                  normalize=True,
+                  seed=0):
+    """
+    Clusters a model's vectors into k clusters with mini-batch k-means,
+    streaming the vectors from the database in chunks of chunk_size for
+    each of the epochs, and then once more to assign every word to its
+    closest centroid. Only a chunk of vectors is in memory at a time.
+    The centroids and assignments are saved as a new Clustering in one
+    transaction, which is returned.
+    """
+    kmeans = MiniBatchKMeans(k, normalize, seed=seed)
+    last = None
+
+    for epoch in range(epochs):
+        for values in _batches(
+                _new_vectors(session, model, -1, chunk_size), batch_size):
+            kmeans.partial_fit(values)
+            last = values
+
+        if kmeans.flush().centroids is None:
+            raise Exception('model %s has fewer than %s vectors' %
+                            (model.id, k))
+
+        if epoch < epochs - 1:
+            kmeans.reseed_empty(last)
+
+    clustering = Clustering(
+        model_id=model.id,
+        num_clusters=k,
+        normalized=normalize,
+        centroids=kmeans.centroids.astype('<f4').tobytes())
+    table = ClusterAssignment.__table__
+
+    # the clustering and all of its assignments are committed together,
+    # so latest_clustering never sees a partly assigned one
+    try:
+        session.add(clustering)
+        session.flush()
+
+        for ids, words, values in _new_vectors(session, model, -1,
+                                               chunk_size):
+            labels, distances = kmeans.assign(values)
+            session.execute(table.insert(), [{
+                'clustering_id': clustering.id,
+                'vector_id': i,
+                'word': w,
+                'cluster': int(c),
+                'distance': float(d)
+            } for i, w, c, d in zip(ids, words, labels, distances)])
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return clustering
+
+
+def latest_clustering(session, model):
+    """
+    Returns the most recent Clustering of a model, or None
+    """
+    return session.query(Clustering).filter(
+        Clustering.model_id == model.id).order_by(
+            Clustering.id.desc()).first()
+
+
+def cluster_of_word(session, clustering, word):
+    """
+    Returns the ClusterAssignment of a word, or None
+    """
+    return session.query(ClusterAssignment).filter(
+        ClusterAssignment.clustering_id == clustering.id).filter(
+            ClusterAssignment.word == word).first()
+
+
+def cluster_members(session, clustering, cluster):
+    """
+    Returns a query of the ClusterAssignments of a cluster, closest to
+    the centroid first
+    """
+    return session.query(ClusterAssignment).filter(
+        ClusterAssignment.clustering_id == clustering.id).filter(
+            ClusterAssignment.cluster == cluster).order_by(
+                ClusterAssignment.distance, ClusterAssignment.id)
+
+
+def count_cluster_members(session, clustering, cluster):
+    return session.query(func.count(ClusterAssignment.id)).filter(
+        ClusterAssignment.clustering_id == clustering.id).filter(
+            ClusterAssignment.cluster == cluster).scalar()
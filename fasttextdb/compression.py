@@ -0,0 +1,234 @@
+import time
+import numpy
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from sqlalchemy import func
+
+from .models import *
+from .quantizers import *
+
+__all__ = [
+    'train_dictionary', 'train_quantizer', 'sample_vectors',
+    'evaluate_codecs', 'choose_codec', 'quantize_model', 'DEFAULT_DICT_SIZE',
+    'DEFAULT_TIME_WEIGHT'
+]
+
+DEFAULT_DICT_SIZE = 32 * 1024
+
+# bytes of blob size considered as costly as one microsecond of decoding
+DEFAULT_TIME_WEIGHT = 20
+
+
+def train_dictionary(values,
+                     encoding=FLOAT32_ENCODING,
+                     dict_size=DEFAULT_DICT_SIZE,
+                     quantizer=None):
+    """
+    Trains a zstd dictionary on a sample of vectors (a list or numpy
+    array of rows), encoded with the given encoding. Returns the
+    dictionary as bytes, for Model.compression_dict.
+    """
+    if zstandard is None:
+        raise Exception('zstd compression requires the zstandard package')
+
+    samples = [
+        pack_values(v, encoding, NO_COMPRESSION, quantizer=quantizer)[0]
+        for v in values
+    ]
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
+
+
+def train_quantizer(values, encoding=PQ_ENCODING, num_subspaces=None):
+    """
+    Trains the quantizer for a per-model int8 or product quantized
+    encoding on a sample of vectors. Returns it serialized as bytes, for
+    Model.quantizer.
+    """
+    if (encoding & ENCODING_MASK) == INT8_MODEL_ENCODING:
+        return ScalarQuantizer.train(values).to_bytes()
+    elif (encoding & ENCODING_MASK) == PQ_ENCODING:
+        return ProductQuantizer.train(values, num_subspaces).to_bytes()
+    else:
+        raise Exception('encoding %s does not use a quantizer' % encoding)
+
+
+def sample_vectors(session, model, sample_size=1000):
+    """
+    Returns the decoded values of a random sample of the model's vectors
+    """
+    q = Vector.vectors_for_model(session, model).order_by(
+        func.random()).limit(sample_size)
+    return [v.unpack_array() for v in q]
+
+
+def evaluate_codecs(values, encodings=('json', 'float32'), compressions=None):
+    """
+    Packs a sample of vectors with every combination of the given
+    encodings and compressions (names, see ENCODINGS and COMPRESSIONS;
+    all available compressions by default), and returns a list of
+    dicts with the mean blob size in bytes and mean decode time in
+    microseconds of each. For zstd-dict, the dictionary is trained on
+    one half of the sample and measured on the other.
+    """
+    results = []
+    compressions = compressions or available_compressions()
+
+    for encoding in encodings:
+        for compression in compressions:
+            test = values
+            dictionary = None
+
+            if COMPRESSIONS[compression] == ZSTD_DICT_COMPRESSION:
+                half = len(values) // 2
+                dictionary = train_dictionary(values[:half],
+                                              ENCODINGS[encoding])
+                test = values[half:]
+
+            packed = [
+                pack_values(v, ENCODINGS[encoding], COMPRESSIONS[compression],
+                            dictionary) for v in test
+            ]
+            start = time.time()
+
+            for x, encoding_compression in packed:
+                unpack_array(x, encoding_compression, dictionary)
+
+            elapsed = time.time() - start
+            results.append({
+                'encoding': encoding,
+                'compression': compression,
+                'size': numpy.mean([len(x) for x, ec in packed]),
+                'decodeTime': elapsed * 1e6 / len(packed)
+            })
+
+    return results
+
+
+def choose_codec(session,
+                 model,
+                 sample_size=1000,
+                 time_weight=DEFAULT_TIME_WEIGHT,
+                 encodings=('json', 'float32'),
+                 compressions=None):
+    """
+    Samples a model's vectors, evaluates the codecs on them (see
+    evaluate_codecs) and records the one with the lowest cost (mean
+    size plus time_weight times the mean decode time) on the model,
+    training a dictionary for zstd-dict unless the model's vectors
+    already use its current one. Vectors are not re-packed; the codec
+    is used for vectors added to the model from now on. Returns a tuple
+    of (best, results).
+    """
+    values = sample_vectors(session, model, sample_size)
+
+    if not values:
+        raise Exception('model %s has no vectors to sample' % model.id)
+
+    results = evaluate_codecs(values, encodings, compressions)
+
+    for r in results:
+        r['cost'] = r['size'] + time_weight * r['decodeTime']
+
+    best = min(results, key=lambda r: r['cost'])
+    encoding = ENCODINGS[best['encoding']]
+    compression = COMPRESSIONS[best['compression']]
+
+    # existing vectors are not re-packed, so a dictionary they were
+    # compressed with has to stay
+    if compression == ZSTD_DICT_COMPRESSION and \
+            not _uses_dictionary(session, model):
+        model.compression_dict = train_dictionary(values, encoding)
+
+    model.encoding_compression = encoding ^ compression
+    session.commit()
+    return best, results
+
+
+def _uses_dictionary(session, model):
+    """
+    Checks whether any of the model's vectors are compressed with its
+    zstd dictionary
+    """
+    codecs = session.query(Vector.encoding_compression).filter(
+        Vector.model_id == model.id).distinct()
+    return model.compression_dict is not None and any(
+        (ec & COMPRESSION_MASK) == ZSTD_DICT_COMPRESSION for ec, in codecs)
+
+
+def quantize_model(session,
+                   model,
+                   encoding=PQ_ENCODING,
+                   compression=NO_COMPRESSION,
+                   sample_size=10000,
+                   num_subspaces=None,
+                   batch_size=1000):
+    """
+    Switches a model's vectors to a quantized encoding: trains the
+    quantizer (for the per-model encodings) on a sample of the vectors,
+    records it and the codec on the model, and re-packs all of the
+    model's vectors in batches of batch_size. Everything is committed
+    in one transaction, so a failure leaves the model with its old
+    quantizer, dictionary and codec and every vector still decodable.
+    Returns the number of vectors re-packed.
+    """
+    dictionary = model.compression_dict
+    old_quantizer = model.quantizer
+    values = sample_vectors(session, model, sample_size)
+
+    if not values:
+        raise Exception('model %s has no vectors to sample' % model.id)
+
+    quantizer = old_quantizer
+    new_dictionary = dictionary
+
+    if (encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS:
+        quantizer = train_quantizer(values, encoding, num_subspaces)
+
+    if (compression & COMPRESSION_MASK) == ZSTD_DICT_COMPRESSION:
+        new_dictionary = train_dictionary(
+            values, encoding, quantizer=quantizer)
+
+    count = 0
+    last_id = -1
+
+    try:
+        while True:
+            batch = list(
+                Vector.vectors_for_model(session, model).filter(
+                    Vector.id > last_id).order_by(Vector.id).limit(
+                        batch_size))
+
+            if not batch:
+                break
+
+            for v in batch:
+                values = unpack_array(v.packed_values,
+                                      v.encoding_compression, dictionary,
+                                      old_quantizer)
+                v.packed_values, v.encoding_compression = pack_values(
+                    values, encoding, compression, new_dictionary,
+                    quantizer)
+
+            # write the batch but keep it out of the session, so memory
+            # does not grow with the model until the commit
+            session.flush()
+
+            for v in batch:
+                session.expunge(v)
+
+            count += len(batch)
+            last_id = batch[-1].id
+
+        model.quantizer = quantizer
+        model.compression_dict = new_dictionary
+        model.encoding_compression = encoding ^ compression
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    return count
@@ -32,6 +32,19 @@ CONFIG_DEFAULTS = {
         'encoding': 'json',
         'compression': 'bz2'
     },
+    'cache': {
+        'max_bytes': 64 * 1024 * 1024,
+        'ttl': 300
+    },
+    'index': {
+        'path': None,
+        'nprobe': 16,
+        'auto_update': True
+    },
+    'lookup': {
+        'workers': 4,
+        'chunk_size': None
+    },
     'host': '127.0.0.1',
     'port': 8888,
     'debug': False,
@@ -154,7 +167,7 @@ def load_config(path=None, file_=None, args=None):
         file_ = open(path)
 
     if file_:
-        configs.append(yaml.load(file_))
+        configs.append(yaml.load(file_, Loader=yaml.SafeLoader))
 
     if args:
         configs.append(_config_from_args(args))
@@ -0,0 +1,86 @@
+import numpy
+
+__all__ = ['document_weights', 'pool_documents', 'WEIGHTINGS']
+
+WEIGHTINGS = ('mean', 'idf')
+
+
+def document_weights(documents, weighting='mean', weights=None):
+    """
+    Returns a dict of the weight of each distinct token of the
+    documents: 1 for the mean, or the smoothed inverse document frequency
+    over the batch (log((1 + n) / (1 + df)) + 1) for idf. Weights given
+    by the caller (e.g. IDF from a whole corpus) take precedence.
+    """
+    if weighting not in WEIGHTINGS:
+        raise ValueError('weighting must be one of %s' %
+                         ', '.join(WEIGHTINGS))
+
+    result = {}
+
+    if weighting == 'idf':
+        df = {}
+
+        for document in documents:
+            for token in set(document):
+                df[token] = df.get(token, 0) + 1
+
+        n = len(documents)
+        result = dict((t, numpy.log((1.0 + n) / (1.0 + c)) + 1)
+                      for t, c in df.items())
+    else:
+        result = dict((t, 1.0) for d in documents for t in d)
+
+    if weights:
+        result.update(weights)
+
+    return result
+
+
+def pool_documents(documents,
+                   words,
+                   values,
+                   weighting='mean',
+                   weights=None,
+                   normalize=False):
+    """
+    Pools the vectors of the tokens of each document (a list of lists of
+    tokens) into one weighted average vector per document. words and
+    values (n, dim) are the distinct tokens that have vectors; other
+    tokens are skipped. With normalize, the word vectors are scaled to
+    unit length first. Returns a tuple of the (documents, dim) float32
+    array (zeros for documents without known tokens) and the number of
+    tokens used for each document.
+    """
+    values = numpy.asarray(values, dtype=numpy.float32)
+    dim = values.shape[1] if values.ndim == 2 else 0
+    result = numpy.zeros((len(documents), dim), dtype=numpy.float32)
+    rows = dict((w, i) for i, w in enumerate(words))
+    token_weights = document_weights(documents, weighting, weights)
+
+    if normalize and len(values):
+        norms = numpy.linalg.norm(values, axis=1)
+        values = values / numpy.where(norms == 0, 1, norms)[:, None]
+
+    token_rows = []
+    token_weight = []
+    counts = numpy.zeros(len(documents), dtype=numpy.int64)
+
+    for i, document in enumerate(documents):
+        for token in document:
+            if token in rows:
+                token_rows.append(rows[token])
+                token_weight.append(token_weights[token])
+                counts[i] += 1
+
+    if not token_rows:
+        return result, counts
+
+    token_weight = numpy.array(token_weight, dtype=numpy.float32)
+    found = counts > 0
+    starts = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])[found]
+    sums = numpy.add.reduceat(values[token_rows] * token_weight[:, None],
+                              starts)
+    totals = numpy.add.reduceat(token_weight, starts)
+    result[found] = sums / numpy.where(totals == 0, 1, totals)[:, None]
+    return result, counts
@@ -19,7 +19,8 @@ class NotFoundException(WebException):
 
 class BadRequestException(WebException):
     def __init__(self, message):
-        super(NotFoundException, self).__init__(message, 400, 'Bad Request')
+        super(BadRequestException, self).__init__(message, 400,
+                                                  'Bad Request')
 
 
 class UnauthorizedException(WebException):
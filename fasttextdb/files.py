@@ -1,11 +1,25 @@
+import numpy
+
 from contextlib import contextmanager
 from magic import from_buffer
 from bz2 import BZ2File
 from gzip import GzipFile
 
 from .models import *
+from .binary import *
+
+__all__ = [
+    "model_file", "model_blocks", "read_file", "read_blocks", "read_chunks",
+    "parse_block",
+    "get_mime_type", "get_model_format", "open_for_mime_type",
+    "DEFAULT_BLOCK_SIZE", "TEXT_FORMAT", "FASTTEXT_FORMAT", "WORD2VEC_FORMAT"
+]
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
 
-__all__ = ["model_file", "read_file", "get_mime_type", "open_for_mime_type"]
+TEXT_FORMAT = 'text'
+FASTTEXT_FORMAT = 'fasttext'
+WORD2VEC_FORMAT = 'word2vec'
 
 
 def get_mime_type(file):
@@ -27,6 +41,58 @@ def open_for_mime_type(file):
     return f
 
 
+def get_model_format(file_):
+    """
+    Peeks at the start of a file to tell text vectors (.vec) from
+    fastText .bin models and word2vec binary vectors.
+    """
+    head = file_.read(4096)
+    file_.seek(0)
+
+    if is_fasttext_file(head):
+        return FASTTEXT_FORMAT
+    elif is_word2vec_file(head):
+        return WORD2VEC_FORMAT
+    else:
+        return TEXT_FORMAT
+
+
+@contextmanager
+def model_blocks(file_,
+                 block_size=DEFAULT_BLOCK_SIZE,
+                 dtype=numpy.float32,
+                 parse=True,
+                 buckets_path=None):
+    """
+    Context: prepare to process vectors from a file-like object in any
+    of the supported formats. Returns tuple of (model_info, blocks), where
+    model_info is a dict of values for the Model columns found in the file,
+    and blocks generates (words, values) tuples (see read_blocks). With
+    parse set to False, text files generate the raw chunks (see
+    read_chunks) instead, to be parsed elsewhere with parse_block. The
+    n-gram buckets of fastText models are saved to buckets_path if given.
+    """
+    format_ = get_model_format(file_)
+
+    if format_ == FASTTEXT_FORMAT:
+        model_info, words, reader = read_fasttext_header(file_)
+        yield model_info, read_fasttext_blocks(
+            model_info, words, reader, buckets_path=buckets_path)
+    else:
+        with model_file(file_) as (num_words, vec_length, file1):
+            model_info = {'num_words': num_words, 'dim': vec_length}
+
+            if format_ == WORD2VEC_FORMAT:
+                blocks = read_word2vec_blocks(file1, num_words, vec_length)
+            elif not parse:
+                blocks = read_chunks(file1, block_size=block_size)
+            else:
+                blocks = read_blocks(
+                    file1, vec_length, block_size=block_size, dtype=dtype)
+
+            yield model_info, blocks
+
+
 @contextmanager
 def model_file(file_):
     """
@@ -45,12 +111,82 @@ def read_file(file_):
     model_file). Returns tuples of (word, vector), where vector is a list of
     floats.
     """
-    l = file_.readline().decode('utf-8')
+    for words, values in read_blocks(file_, dtype=numpy.float64):
+        for word, vector in zip(words, values.tolist()):
+            yield (word, vector)
 
-    while l:
-        parts = l.split()
-        yield (parts[0], [float(x) for x in parts[1:]])
-        l = file_.readline().decode('utf-8')
+
+def read_blocks(file_,
+                dim=None,
+                block_size=DEFAULT_BLOCK_SIZE,
+                dtype=numpy.float32):
+    """
+    Generator: reads words and vectors from a file (assumes it was opened with
+    model_file) in chunks of roughly block_size bytes. Returns tuples of
+    (words, values), where words is a list of strings and values is a numpy
+    array of shape (len(words), dim). If dim is not given, it is inferred
+    from each block.
+    """
+    for chunk in read_chunks(file_, block_size):
+        block = parse_block(chunk, dim, dtype)
+
+        if block:
+            yield block
+
+
+def read_chunks(file_, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Generator: reads a file (assumes it was opened with model_file) in
+    chunks of roughly block_size bytes, each ending with a complete line.
+    """
+    tail = b''
+
+    while True:
+        chunk = file_.read(block_size)
+
+        if not chunk:
+            break
+
+        chunk = tail + chunk
+        end = chunk.rfind(b'\n') + 1
+        tail = chunk[end:]
+
+        if end:
+            yield chunk[:end]
+
+    if tail:
+        yield tail
+
+
+def parse_block(data, dim=None, dtype=numpy.float32):
+    """
+    Parses a chunk of complete lines into (words, values). The words
+    are split off each line, and the remaining numbers of all lines
+    are parsed in one call.
+    """
+    words = []
+    values = []
+
+    for l in data.split(b'\n'):
+        word, _, rest = l.strip().partition(b' ')
+
+        if word:
+            words.append(word.decode('utf-8'))
+            values.append(rest)
+
+    if not words:
+        return None
+
+    x = numpy.fromstring(b' '.join(values), dtype=dtype, sep=' ')
+
+    if dim is None:
+        dim = x.size // len(words)
+
+    if x.size != len(words) * dim:
+        raise Exception('expected %s values for each of %s words, got %s' %
+                        (dim, len(words), x.size))
+
+    return words, x.reshape((len(words), dim))
 
 
 def read_vectors(file_, model=None):
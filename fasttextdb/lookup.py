@@ -0,0 +1,137 @@
+import numpy
+
+from sqlalchemy import select, and_
+
+from .models import *
+
+__all__ = [
+    'VectorRecord', 'select_vectors', 'read_vectors', 'iter_vectors',
+    'read_matrix'
+]
+
+_COLUMNS = [
+    Vector.__table__.c.id, Vector.__table__.c.word,
+    Vector.__table__.c.model_id, Vector.__table__.c.packed_values,
+    Vector.__table__.c.encoding_compression, Vector.__table__.c.norm
+]
+
+
+class VectorRecord(object):
+    """
+    A decoded vector read without the ORM (see read_vectors), with the
+    same to_dict and to_list output as Vector
+    """
+    __slots__ = ('id', 'word', 'model_id', 'values', 'norm', '_model')
+
+    def __init__(self, id, word, model_id, values, model=None, norm=None):
+        self.id = id
+        self.word = word
+        self.model_id = model_id
+        self.values = values
+        self.norm = norm
+        self._model = model
+
+    def unpack_values(self):
+        return self.values.tolist()
+
+    def unpack_array(self):
+        return self.values
+
+    def to_dict(self, include_model=False):
+        x = {
+            'id': self.id,
+            'word': self.word,
+            'values': self.values.tolist(),
+            'norm': self.norm
+        }
+
+        if include_model:
+            x['model'] = self._model
+        else:
+            x['modelId'] = self.model_id
+
+        return x
+
+    def to_list(self):
+        return [self.model_id, self.id, self.word] + self.values.tolist()
+
+
+def select_vectors(model, words=None, by_hash=False):
+    """
+    Returns a Core select of the columns needed to decode the model's
+    vectors, optionally only those for the given words (see
+    Vector.word_criteria). It can be ordered and paged like a query
+    before it is passed to read_vectors or read_matrix.
+    """
+    criteria = [Vector.__table__.c.model_id == model.id]
+
+    if words is not None:
+        criteria.extend(Vector.word_criteria(words, by_hash))
+
+    return select(_COLUMNS).where(and_(*criteria))
+
+
+def _fetch(session, query):
+    rows = session.execute(query).fetchall()
+    return rows, [r[3] for r in rows], [r[4] for r in rows]
+
+
+def read_vectors(session, query, model, dtype=numpy.float64):
+    """
+    Executes a select from select_vectors and returns a list of
+    VectorRecords, with the values of all rows decoded in bulk (see
+    unpack_arrays). The model's to_dict is computed once and shared by
+    the records.
+    """
+    rows, packed, codecs = _fetch(session, query)
+    values = unpack_arrays(packed, codecs, model.compression_dict,
+                           model.quantizer, dtype)
+    model_dict = model.to_dict()
+
+    return [
+        VectorRecord(r[0], r[1], r[2], v, model_dict, r[5])
+        for r, v in zip(rows, values)
+    ]
+
+
+def iter_vectors(session, query, model, dtype=numpy.float64,
+                 batch_size=1000):
+    """
+    Like read_vectors, but generates the VectorRecords from a
+    server-side cursor (where the database driver has one), decoding
+    batch_size rows at a time, so memory does not grow with the number
+    of rows
+    """
+    result = session.execute(query.execution_options(stream_results=True))
+    model_dict = model.to_dict()
+
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+
+            if not rows:
+                break
+
+            values = unpack_arrays([r[3] for r in rows], [r[4] for r in rows],
+                                   model.compression_dict, model.quantizer,
+                                   dtype)
+
+            for r, v in zip(rows, values):
+                yield VectorRecord(r[0], r[1], r[2], v, model_dict, r[5])
+    finally:
+        result.close()
+
+
+def read_matrix(session, query, model, dtype=numpy.float32):
+    """
+    Executes a select from select_vectors and returns a tuple of (words,
+    matrix), the list of words and an (n, dim) array of their values
+    """
+    rows, packed, codecs = _fetch(session, query)
+    values = unpack_arrays(packed, codecs, model.compression_dict,
+                           model.quantizer, dtype)
+
+    if not rows:
+        values = numpy.empty((0, model.dim or 0), dtype=dtype)
+
+    return [r[1] for r in rows], values
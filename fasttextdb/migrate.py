@@ -0,0 +1,163 @@
+import numpy
+
+from sqlalchemy import inspect, text, bindparam, select
+
+from sqlalchemy.orm import sessionmaker
+
+from .models import *
+from .statistics import compute_statistics
+
+__all__ = ['migrate']
+
+
+def migrate(engine, batch_size=10000):
+    """
+    Brings the tables of an existing database up to date with the
+    models: creates missing tables, adds missing columns, replaces the
+    old unique constraint on vector.word (and the index on
+    vector.model_id) with the (model_id, word) indexes, and fills in
+    vector.word_hash and vector.norm for existing rows in batches of
+    batch_size. Statistics are computed for models that have none.
+    """
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+
+        if _word_unique_constraints(inspector):
+            if conn.dialect.name == 'sqlite':
+                # SQLite cannot drop constraints, so the table is rebuilt
+                _rebuild_table(conn, inspector, Vector.__table__)
+            else:
+                for name in _word_unique_constraints(inspector):
+                    conn.execute(
+                        text('ALTER TABLE vector DROP CONSTRAINT %s' % name))
+
+        inspector = inspect(conn)
+        _add_missing_columns(conn, inspector)
+        indexes = [i['name'] for i in inspector.get_indexes('vector')]
+
+        if 'ix_vector_model_id' in indexes:
+            conn.execute(text('DROP INDEX ix_vector_model_id'))
+
+        for index in Vector.__table__.indexes:
+            if index.name not in indexes:
+                index.create(conn)
+
+    _fill_word_hashes(engine, batch_size)
+    _fill_norms(engine, batch_size)
+    _fill_statistics(engine)
+
+
+def _word_unique_constraints(inspector):
+    return [
+        c['name'] for c in inspector.get_unique_constraints('vector')
+        if c['column_names'] == ['word']
+    ]
+
+
+def _add_missing_columns(conn, inspector):
+    for table in Base.metadata.sorted_tables:
+        existing = [c['name'] for c in inspector.get_columns(table.name)]
+
+        for column in table.columns:
+            if column.name not in existing:
+                conn.execute(
+                    text('ALTER TABLE %s ADD COLUMN %s %s' %
+                         (table.name, column.name,
+                          column.type.compile(dialect=conn.dialect))))
+
+
+def _rebuild_table(conn, inspector, table):
+    """
+    Renames the table, creates it again from the model and copies the
+    rows of the columns both have over
+    """
+    old = '%s_old' % table.name
+    existing = [c['name'] for c in inspector.get_columns(table.name)]
+    columns = ', '.join(c.name for c in table.columns if c.name in existing)
+
+    for index in inspector.get_indexes(table.name):
+        if index['name']:
+            conn.execute(text('DROP INDEX %s' % index['name']))
+
+    conn.execute(text('ALTER TABLE %s RENAME TO %s' % (table.name, old)))
+    table.create(conn)
+    conn.execute(
+        text('INSERT INTO %s (%s) SELECT %s FROM %s' % (table.name, columns,
+                                                          columns, old)))
+    conn.execute(text('DROP TABLE %s' % old))
+
+
+def _fill_word_hashes(engine, batch_size):
+    table = Vector.__table__
+    update = table.update().where(table.c.id == bindparam('_id')).values(
+        word_hash=bindparam('_word_hash'))
+    last_id = -1
+
+    while True:
+        with engine.begin() as conn:
+            q = select([table.c.id, table.c.word]).where(
+                table.c.word_hash.is_(None)).where(table.c.id > last_id)
+            rows = list(
+                conn.execute(q.order_by(table.c.id).limit(batch_size)))
+
+            if not rows:
+                break
+
+            conn.execute(update, [{
+                '_id': id,
+                '_word_hash': word_hash(word)
+            } for id, word in rows])
+            last_id = rows[-1][0]
+
+
+def _fill_norms(engine, batch_size):
+    table = Vector.__table__
+    update = table.update().where(table.c.id == bindparam('_id')).values(
+        norm=bindparam('_norm'))
+    last_id = -1
+
+    with engine.begin() as conn:
+        models = dict((r[0], r[1:]) for r in conn.execute(
+            select([
+                Model.__table__.c.id, Model.__table__.c.compression_dict,
+                Model.__table__.c.quantizer
+            ])))
+
+    while True:
+        with engine.begin() as conn:
+            q = select([
+                table.c.id, table.c.model_id, table.c.packed_values,
+                table.c.encoding_compression
+            ]).where(table.c.norm.is_(None)).where(table.c.id > last_id)
+            rows = list(
+                conn.execute(q.order_by(table.c.id).limit(batch_size)))
+
+            if not rows:
+                break
+
+            for model_id in set(r[1] for r in rows):
+                model_rows = [r for r in rows if r[1] == model_id]
+                dictionary, quantizer = models.get(model_id, (None, None))
+                values = unpack_arrays([r[2] for r in model_rows],
+                                       [r[3] for r in model_rows],
+                                       dictionary, quantizer)
+                conn.execute(update, [{
+                    '_id': r[0],
+                    '_norm': float(n)
+                } for r, n in zip(model_rows,
+                                  numpy.linalg.norm(values, axis=1))])
+
+            last_id = rows[-1][0]
+
+
+def _fill_statistics(engine):
+    session = sessionmaker(bind=engine)()
+
+    try:
+        for model in session.query(Model).filter(Model.statistics.is_(None)):
+            compute_statistics(session, model)
+            session.commit()
+    finally:
+        session.close()
@@ -1,10 +1,24 @@
 import json
 import bz2
 import zlib
+import struct
+import hashlib
+import threading
+import numpy
+
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from sqlalchemy import Column, Integer, String, Float
 from sqlalchemy import Unicode, Text, ForeignKey, LargeBinary
-from sqlalchemy import SmallInteger
+from sqlalchemy import SmallInteger, BigInteger, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -12,21 +26,291 @@ from sqlalchemy import func
 
 from flask_login import UserMixin
 
+from .quantizers import quantize_int8, dequantize_int8, load_quantizer
+
 __all__ = [
-    'User', 'Base', 'Model', 'Vector', 'NO_COMPRESSION', 'ZLIB_COMPRESSION',
-    'BZ2_COMPRESSION', 'JSON_ENCODING'
+    'User', 'Base', 'Model', 'Vector', 'Clustering', 'ClusterAssignment',
+    'NO_COMPRESSION', 'ZLIB_COMPRESSION',
+    'BZ2_COMPRESSION', 'LZ4_COMPRESSION', 'ZSTD_COMPRESSION',
+    'ZSTD_DICT_COMPRESSION', 'JSON_ENCODING', 'FLOAT32_ENCODING',
+    'FLOAT16_ENCODING', 'INT8_ENCODING', 'INT8_MODEL_ENCODING', 'PQ_ENCODING',
+    'QUANTIZED_ENCODINGS', 'ENCODINGS', 'COMPRESSIONS', 'COMPRESSION_MASK',
+    'ENCODING_MASK', 'pack_values', 'unpack_array', 'unpack_arrays',
+    'compress', 'decompress', 'available_compressions', 'word_hash'
 ]
 
 COMPRESSION_MASK = 0b00001111
-NO_COMPRESSION = 0b11110000
+NO_COMPRESSION = 0b00000000
 ZLIB_COMPRESSION = 0b00000001
 BZ2_COMPRESSION = 0b00000010
+LZ4_COMPRESSION = 0b00000011
+ZSTD_COMPRESSION = 0b00000100
+ZSTD_DICT_COMPRESSION = 0b00000101
 ENCODING_MASK = 0b11110000
 JSON_ENCODING = 0b00010000
+FLOAT32_ENCODING = 0b00100000
+FLOAT16_ENCODING = 0b00110000
+INT8_ENCODING = 0b01000000
+INT8_MODEL_ENCODING = 0b01010000
+PQ_ENCODING = 0b01100000
+
+ENCODINGS = {
+    'json': JSON_ENCODING,
+    'float32': FLOAT32_ENCODING,
+    'float16': FLOAT16_ENCODING,
+    'int8': INT8_ENCODING,
+    'int8-model': INT8_MODEL_ENCODING,
+    'pq': PQ_ENCODING
+}
+
+# encodings that need a quantizer trained for the model
+QUANTIZED_ENCODINGS = (INT8_MODEL_ENCODING, PQ_ENCODING)
+
+COMPRESSIONS = {
+    'none': NO_COMPRESSION,
+    'zlib': ZLIB_COMPRESSION,
+    'bz2': BZ2_COMPRESSION,
+    'lz4': LZ4_COMPRESSION,
+    'zstd': ZSTD_COMPRESSION,
+    'zstd-dict': ZSTD_DICT_COMPRESSION
+}
+
+ZSTD_LEVEL = 3
+
+_DTYPES = {FLOAT32_ENCODING: '<f4', FLOAT16_ENCODING: '<f2'}
+
+# zstd (de)compression contexts are not thread safe, so each thread
+# keeps its own, keyed by dictionary bytes
+_zstd_contexts = threading.local()
 
 Base = declarative_base()
 
 
+def word_hash(word):
+    """
+    Returns a signed 64-bit hash of a word for the Vector.word_hash
+    column, which gives a fixed-width key for equality lookups however
+    long the word is
+    """
+    return struct.unpack('<q',
+                         hashlib.md5(word.encode('utf-8')).digest()[:8])[0]
+
+
+def _default_word_hash(context):
+    return word_hash(context.current_parameters['word'])
+
+
+def available_compressions():
+    """
+    Returns the names of the compressions usable with the installed
+    libraries (lz4 and zstd are optional)
+    """
+    names = ['none', 'zlib', 'bz2']
+
+    if lz4:
+        names.append('lz4')
+
+    if zstandard:
+        names.extend(['zstd', 'zstd-dict'])
+
+    return names
+
+
+def _zstd_context(kind, factory, dictionary):
+    """
+    Returns this thread's cached zstd (de)compressor of a kind for the
+    given dictionary bytes (or None for no dictionary), as building one
+    is relatively costly
+    """
+    if zstandard is None:
+        raise Exception('zstd compression requires the zstandard package')
+
+    contexts = getattr(_zstd_contexts, kind, None)
+
+    if contexts is None:
+        contexts = {}
+        setattr(_zstd_contexts, kind, contexts)
+
+    if dictionary is not None:
+        dictionary = bytes(dictionary)
+
+    if dictionary not in contexts:
+        if dictionary is None:
+            contexts[dictionary] = factory()
+        else:
+            contexts[dictionary] = factory(
+                dict_data=zstandard.ZstdCompressionDict(dictionary))
+
+    return contexts[dictionary]
+
+
+def compress(x, compression, dictionary=None):
+    """
+    Compresses bytes with the given compression; ZSTD_DICT_COMPRESSION
+    needs the model's trained dictionary
+    """
+    compression = compression & COMPRESSION_MASK
+
+    if compression == BZ2_COMPRESSION:
+        return bz2.compress(x)
+    elif compression == ZLIB_COMPRESSION:
+        return zlib.compress(x)
+    elif compression == LZ4_COMPRESSION:
+        if lz4 is None:
+            raise Exception('lz4 compression requires the lz4 package')
+
+        return lz4.block.compress(x)
+    elif compression in (ZSTD_COMPRESSION, ZSTD_DICT_COMPRESSION):
+        if compression == ZSTD_DICT_COMPRESSION and dictionary is None:
+            raise Exception('zstd dictionary compression needs a dictionary')
+
+        return _zstd_context(
+            'compressors', lambda **kwargs: zstandard.ZstdCompressor(
+                level=ZSTD_LEVEL, **kwargs), dictionary).compress(x)
+    else:
+        return x
+
+
+def decompress(x, compression, dictionary=None):
+    """
+    Reverses compress
+    """
+    compression = compression & COMPRESSION_MASK
+
+    if compression == BZ2_COMPRESSION:
+        return bz2.decompress(x)
+    elif compression == ZLIB_COMPRESSION:
+        return zlib.decompress(x)
+    elif compression == LZ4_COMPRESSION:
+        if lz4 is None:
+            raise Exception('lz4 compression requires the lz4 package')
+
+        return lz4.block.decompress(x)
+    elif compression in (ZSTD_COMPRESSION, ZSTD_DICT_COMPRESSION):
+        if compression == ZSTD_DICT_COMPRESSION and dictionary is None:
+            raise Exception('zstd dictionary compression needs a dictionary')
+
+        return _zstd_context(
+            'decompressors',
+            lambda **kwargs: zstandard.ZstdDecompressor(**kwargs),
+            dictionary).decompress(x)
+    else:
+        return x
+
+
+def pack_values(values,
+                encoding=JSON_ENCODING,
+                compression=BZ2_COMPRESSION,
+                dictionary=None,
+                quantizer=None):
+    """
+    Given a list (or numpy array) of floats, this will encode them as
+    JSON, as a raw little-endian float32/float16 buffer, or as int8 or
+    product quantized codes, and optionally compress them (see compress).
+    The per-model int8 and product quantized encodings need the model's
+    serialized quantizer. Returns a tuple of (packed_values,
+    encoding_compression) for the Vector columns.
+    """
+    if (encoding & ENCODING_MASK) in _DTYPES:
+        x = numpy.asarray(
+            values, dtype=_DTYPES[encoding & ENCODING_MASK]).tobytes()
+    elif (encoding & ENCODING_MASK) == INT8_ENCODING:
+        x = quantize_int8(values)
+    elif (encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS:
+        if quantizer is None:
+            raise Exception('quantized encoding needs a quantizer')
+
+        x = load_quantizer(quantizer).encode([values])[0].tobytes()
+    else:
+        if isinstance(values, numpy.ndarray):
+            values = values.tolist()
+
+        x = str.encode(json.dumps(values))
+
+    return compress(x, compression, dictionary), encoding ^ compression
+
+
+def unpack_array(packed_values,
+                 encoding_compression,
+                 dictionary=None,
+                 quantizer=None):
+    """
+    Reverses pack_values, returning the values as a numpy array
+    (approximate values for the quantized encodings). Raw float
+    encodings without compression are decoded without copying the
+    buffer.
+    """
+    x = decompress(packed_values, encoding_compression, dictionary)
+    encoding = encoding_compression & ENCODING_MASK
+
+    if encoding in _DTYPES:
+        return numpy.frombuffer(x, dtype=_DTYPES[encoding])
+    elif encoding == INT8_ENCODING:
+        return dequantize_int8(x)
+    elif encoding in QUANTIZED_ENCODINGS:
+        if quantizer is None:
+            raise Exception('quantized encoding needs a quantizer')
+
+        codes = numpy.frombuffer(x, dtype=numpy.uint8)
+        return load_quantizer(quantizer).decode(codes[None])[0]
+    else:
+        return numpy.array(json.loads(bytes(x).decode('utf-8')))
+
+
+def unpack_arrays(packed_values,
+                  encoding_compression,
+                  dictionary=None,
+                  quantizer=None,
+                  dtype=numpy.float32):
+    """
+    Decodes a list of packed values (with the matching list of
+    encoding_compression values) of the same length into one (n, dim)
+    numpy array. Rows with the same codec are decoded together: raw
+    float and int8 buffers are joined and read in one go, and product
+    quantized codes are decoded as one batch; only JSON is decoded per
+    row.
+    """
+    if not len(packed_values):
+        return numpy.empty((0, 0), dtype=dtype)
+
+    groups = {}
+
+    for i, ec in enumerate(encoding_compression):
+        groups.setdefault(ec, []).append(i)
+
+    result = None
+
+    for ec, rows in groups.items():
+        x = [decompress(packed_values[i], ec, dictionary) for i in rows]
+        encoding = ec & ENCODING_MASK
+
+        if encoding in _DTYPES:
+            values = numpy.frombuffer(
+                b''.join(x), dtype=_DTYPES[encoding]).reshape((len(rows), -1))
+        elif encoding == INT8_ENCODING:
+            x = numpy.frombuffer(
+                b''.join(x), dtype=numpy.uint8).reshape((len(rows), -1))
+            offset_scale = x[:, :8].copy().view('<f4')
+            values = x[:, 8:] * offset_scale[:, 1:] + offset_scale[:, :1]
+        elif encoding in QUANTIZED_ENCODINGS:
+            if quantizer is None:
+                raise Exception('quantized encoding needs a quantizer')
+
+            codes = numpy.frombuffer(
+                b''.join(x), dtype=numpy.uint8).reshape((len(rows), -1))
+            values = load_quantizer(quantizer).decode(codes)
+        else:
+            values = [json.loads(bytes(v).decode('utf-8')) for v in x]
+
+        if result is None:
+            result = numpy.empty(
+                (len(packed_values), len(values[0])), dtype=dtype)
+
+        result[rows] = values
+
+    return result
+
+
 class User(Base, UserMixin):
     __tablename__ = 'user'
     id = Column(Integer, primary_key=True)
@@ -72,11 +356,30 @@ class Model(Base):
     max_ngram_len = Column(Integer)
     num_threads = Column(Integer)
     sampling_threshold = Column(Float)
+    encoding_compression = Column(SmallInteger)
+    compression_dict = Column(LargeBinary)
+    quantizer = Column(LargeBinary)
+    # JSON of fasttextdb.statistics.ModelStatistics, kept up during ingest
+    statistics = Column(Text)
+    # models derived by fasttextdb.projection.project_model
+    parent_id = Column(Integer, ForeignKey('model.id'))
+    projection = Column(LargeBinary)
 
     @staticmethod
     def count_models(session):
         return list(session.query(func.count(Model.id)))[0][0]
 
+    def codec(self, encoding=JSON_ENCODING, compression=BZ2_COMPRESSION):
+        """
+        Returns a tuple of (encoding, compression) recorded for the model's
+        vectors, or the given defaults if none was recorded
+        """
+        if self.encoding_compression is None:
+            return encoding, compression
+
+        return (self.encoding_compression & ENCODING_MASK,
+                self.encoding_compression & COMPRESSION_MASK)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -99,7 +402,9 @@ class Model(Base):
             'minNgramLen': self.min_ngram_len,
             'maxNgramLen': self.max_ngram_len,
             'numThreads': self.num_threads,
-            'samplingThreshold': self.sampling_threshold
+            'samplingThreshold': self.sampling_threshold,
+            'encodingCompression': self.encoding_compression,
+            'parentId': self.parent_id
         }
 
 
@@ -111,12 +416,17 @@ class Vector(Base):
     writing the values to the database, at least with sqlite.
     """
     __tablename__ = 'vector'
+    __table_args__ = (
+        Index('ix_vector_model_id_word', 'model_id', 'word', unique=True),
+        Index('ix_vector_model_id_word_hash', 'model_id', 'word_hash'))
     id = Column(Integer, primary_key=True)
-    word = Column(Unicode, unique=True)
+    word = Column(Unicode)
+    word_hash = Column(BigInteger, default=_default_word_hash)
     packed_values = Column(LargeBinary)
-    model_id = Column(Integer, ForeignKey('model.id'), index=True)
+    model_id = Column(Integer, ForeignKey('model.id'))
     model = relationship("Model")
     encoding_compression = Column(SmallInteger)
+    norm = Column(Float)
 
     @staticmethod
     def count_vectors_for_model(session, model):
@@ -129,83 +439,118 @@ class Vector(Base):
         return session.query(Vector).filter(Vector.model_id == model.id)
 
     @staticmethod
-    def count_vectors_for_word(session, word, model=None):
+    def count_vectors_for_word(session, word, model=None, by_hash=False):
         q = session.query(func.count(Vector.id))
 
         if model:
             q = q.filter(Vector.model_id == model.id)
 
-        return list(q.filter(Vector.word == word))[0][0]
+        return list(Vector._filter_words(q, [word], by_hash))[0][0]
 
     @staticmethod
-    def vectors_for_word(session, word, model=None):
+    def vectors_for_word(session, word, model=None, by_hash=False):
         q = session.query(Vector)
 
         if model:
             q = q.filter(Vector.model_id == model.id)
 
-        return q.filter(Vector.word == word)
+        return Vector._filter_words(q, [word], by_hash)
 
     @staticmethod
-    def count_vectors_for_words(session, words, model=None):
+    def count_vectors_for_words(session, words, model=None, by_hash=False):
         q = session.query(func.count(Vector.id))
 
         if model:
             q = q.filter(Vector.model_id == model.id)
 
-        return list(q.filter(Vector.word.in_(words)))[0][0]
+        return list(Vector._filter_words(q, words, by_hash))[0][0]
 
     @staticmethod
-    def vectors_for_words(session, words, model=None):
+    def vectors_for_words(session, words, model=None, by_hash=False):
         q = session.query(Vector)
 
         if model:
             q = q.filter(Vector.model_id == model.id)
 
-        return q.filter(Vector.word.in_(words))
+        return Vector._filter_words(q, words, by_hash)
+
+    @staticmethod
+    def _filter_words(q, words, by_hash):
+        return q.filter(*Vector.word_criteria(words, by_hash))
+
+    @staticmethod
+    def word_criteria(words, by_hash=False):
+        """
+        Returns the criteria matching the words, either directly or
+        through the (model_id, word_hash) index; the word itself is still
+        compared in case of hash collisions
+        """
+        criteria = []
+
+        if len(words) == 1:
+            if by_hash:
+                criteria.append(Vector.word_hash == word_hash(words[0]))
+
+            criteria.append(Vector.word == words[0])
+        else:
+            if by_hash:
+                criteria.append(
+                    Vector.word_hash.in_([word_hash(w) for w in words]))
+
+            criteria.append(Vector.word.in_(words))
+
+        return criteria
 
     def pack_values(self,
                     values,
                     encoding=JSON_ENCODING,
                     compression=BZ2_COMPRESSION):
         """
-        Given a list of floats, this method will encode them as JSON
-        and optionally compress them into the packed_values column for
-        storage in the database. Returns Vector object itself.
+        Given a list of floats, this method will encode them (see
+        fasttextdb.models.pack_values) and optionally compress them into
+        the packed_values column for storage in the database, and sets
+        their L2 norm. Returns Vector object itself.
         """
-        x = values
-        x = json.dumps(x)
+        self.norm = float(numpy.linalg.norm(values))
+        self.packed_values, self.encoding_compression = pack_values(
+            values, encoding, compression, self._dictionary(compression),
+            self._quantizer(encoding))
+        return self
 
-        if (compression & COMPRESSION_MASK) == BZ2_COMPRESSION:
-            x = bz2.compress(str.encode(x))
-        elif (compression & COMPRESSION_MASK) == ZLIB_COMPRESSION:
-            x = zlib.compress(str.encode(x))
+    def _dictionary(self, compression):
+        if (compression & COMPRESSION_MASK) == ZSTD_DICT_COMPRESSION:
+            return self.model.compression_dict
 
-        self.packed_values = x
-        self.encoding_compression = encoding ^ compression
-        return self
+    def _quantizer(self, encoding):
+        if (encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS:
+            return self.model.quantizer
 
     def unpack_values(self):
         """
-        unpacks (msgpack.unpackb) the stored float values and returns the list
+        unpacks the stored float values and returns the list
         """
-        x = self.packed_values
-
-        if (self.encoding_compression & COMPRESSION_MASK) == BZ2_COMPRESSION:
-            x = bz2.decompress(x)
-        elif (self.encoding_compression &
-              COMPRESSION_MASK) == ZLIB_COMPRESSION:
-            x = zlib.decompress(x)
+        if (self.encoding_compression & ENCODING_MASK) != JSON_ENCODING:
+            return self.unpack_array().tolist()
 
-        if (self.encoding_compression & ENCODING_MASK) == MSGPACK_ENCODING:
-            x = msgpack.loads(x)
-        else:
-            x = json.loads(x)
+        x = decompress(self.packed_values, self.encoding_compression,
+                       self._dictionary(self.encoding_compression))
+        return json.loads(bytes(x).decode('utf-8'))
 
-        return x
+    def unpack_array(self):
+        """
+        unpacks the stored float values and returns a numpy array
+        """
+        return unpack_array(self.packed_values, self.encoding_compression,
+                            self._dictionary(self.encoding_compression),
+                            self._quantizer(self.encoding_compression))
 
     def to_dict(self, include_model=False):
-        x = {'id': self.id, 'word': self.word, 'values': self.unpack_values()}
+        x = {
+            'id': self.id,
+            'word': self.word,
+            'values': self.unpack_values(),
+            'norm': self.norm
+        }
 
         if include_model:
             x['model'] = self.model.to_dict()
@@ -216,3 +561,57 @@ class Vector(Base):
 
     def to_list(self):
         return [self.model_id, self.id, self.word] + self.unpack_values()
+
+
+class Clustering(Base):
+    """
+    A k-means clustering of a model's vectors (see
+    fasttextdb.clustering.cluster_model), with the centroids packed as
+    a float32 (num_clusters, dim) array
+    """
+    __tablename__ = 'clustering'
+    id = Column(Integer, primary_key=True)
+    model_id = Column(Integer, ForeignKey('model.id'), index=True)
+    model = relationship("Model")
+    num_clusters = Column(Integer)
+    normalized = Column(Boolean)
+    centroids = Column(LargeBinary)
+
+    def centroid_array(self):
+        return numpy.frombuffer(
+            self.centroids, dtype='<f4').reshape(self.num_clusters, -1)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'modelId': self.model_id,
+            'numClusters': self.num_clusters,
+            'normalized': self.normalized
+        }
+
+
+class ClusterAssignment(Base):
+    """
+    The cluster of a word in a Clustering, and its distance to the
+    cluster's centroid
+    """
+    __tablename__ = 'cluster_assignment'
+    __table_args__ = (
+        Index('ix_cluster_assignment_clustering_id_word', 'clustering_id',
+              'word'),
+        Index('ix_cluster_assignment_clustering_id_cluster',
+              'clustering_id', 'cluster', 'distance'))
+    id = Column(Integer, primary_key=True)
+    clustering_id = Column(Integer, ForeignKey('clustering.id'))
+    vector_id = Column(Integer)
+    word = Column(Unicode)
+    cluster = Column(Integer)
+    distance = Column(Float)
+
+    def to_dict(self):
+        return {
+            'word': self.word,
+            'vectorId': self.vector_id,
+            'cluster': self.cluster,
+            'distance': self.distance
+        }
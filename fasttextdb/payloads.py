@@ -0,0 +1,90 @@
+import io
+import numpy
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+__all__ = [
+    'NPY_MIMETYPE', 'ARROW_MIMETYPE', 'encode_npy', 'decode_npy',
+    'encode_arrow', 'decode_arrow', 'decode_payload'
+]
+
+NPY_MIMETYPE = 'application/x-npy'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+
+def encode_npy(words, values):
+    """
+    Returns words and their (n, dim) values as a .npy file of a
+    structured array, with a word field and a values field of dim
+    float32 values
+    """
+    values = numpy.asarray(values, dtype='<f4')
+    width = max([len(w) for w in words] or [1])
+    array = numpy.empty(
+        len(words), dtype=[('word', 'U%s' % width),
+                           ('values', '<f4', (values.shape[1], ))])
+    array['word'] = words
+    array['values'] = values
+    buff = io.BytesIO()
+    numpy.save(buff, array, allow_pickle=False)
+    return buff.getvalue()
+
+
+def decode_npy(data):
+    """
+    Reverses encode_npy, returning a tuple of (words, values)
+    """
+    array = numpy.load(io.BytesIO(data), allow_pickle=False)
+    return array['word'].tolist(), array['values']
+
+
+def encode_arrow(words, values):
+    """
+    Returns words and their (n, dim) values as an Arrow IPC stream of
+    one record batch, with a string word column and a fixed size list
+    of float32 values column (requires pyarrow)
+    """
+    if pyarrow is None:
+        raise Exception('Arrow payloads require the pyarrow package')
+
+    values = numpy.ascontiguousarray(values, dtype=numpy.float32)
+    batch = pyarrow.RecordBatch.from_arrays([
+        pyarrow.array(words, type=pyarrow.string()),
+        pyarrow.FixedSizeListArray.from_arrays(
+            pyarrow.array(values.ravel()), values.shape[1])
+    ], ['word', 'values'])
+    sink = pyarrow.BufferOutputStream()
+    writer = pyarrow.ipc.new_stream(sink, batch.schema)
+    writer.write_batch(batch)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+def decode_arrow(data):
+    """
+    Reverses encode_arrow, returning a tuple of (words, values)
+    """
+    if pyarrow is None:
+        raise Exception('Arrow payloads require the pyarrow package')
+
+    table = pyarrow.ipc.open_stream(pyarrow.py_buffer(data)).read_all()
+    dim = table.schema.field('values').type.list_size
+    values = table.column('values').combine_chunks().flatten()
+    return (table.column('word').to_pylist(),
+            values.to_numpy().reshape((-1, dim)))
+
+
+def decode_payload(data, mimetype):
+    """
+    Decodes an .npy or Arrow payload by its mimetype
+    """
+    if mimetype == NPY_MIMETYPE:
+        return decode_npy(data)
+    elif mimetype == ARROW_MIMETYPE:
+        return decode_arrow(data)
+
+    raise Exception('unknown payload type %s' % mimetype)
@@ -0,0 +1,168 @@
+import struct
+import numpy
+
+from .models import *
+from .ann import _new_vectors
+from .vectors import vector_rows, bulk_commit_rows, _train_on_sample
+from .statistics import ModelStatistics
+
+__all__ = [
+    'Projection', 'fit_pca', 'random_projection', 'load_projection',
+    'project_model', 'PROJECTIONS'
+]
+
+PROJECTIONS = ('pca', 'random')
+
+_PCA = 1
+_RANDOM = 2
+
+
+class Projection(object):
+    """
+    A linear map of vectors to fewer dimensions: the mean is subtracted
+    and the result multiplied by the (out dim, in dim) components
+    """
+
+    def __init__(self, kind, mean, components):
+        self.kind = kind
+        self.mean = numpy.asarray(mean, dtype=numpy.float32)
+        self.components = numpy.asarray(components, dtype=numpy.float32)
+
+    def transform(self, values):
+        values = numpy.asarray(values, dtype=numpy.float32)
+        return (values - self.mean).dot(self.components.T)
+
+    def to_bytes(self):
+        out_dim, in_dim = self.components.shape
+        return struct.pack('<Bii', self.kind, out_dim, in_dim) + \
+            self.mean.astype('<f4').tobytes() + \
+            self.components.astype('<f4').tobytes()
+
+    @staticmethod
+    def from_bytes(x):
+        kind, out_dim, in_dim = struct.unpack('<Bii', x[:9])
+        values = numpy.frombuffer(x, dtype='<f4', offset=9)
+        return Projection(kind, values[:in_dim],
+                          values[in_dim:].reshape((out_dim, in_dim)))
+
+
+def load_projection(model):
+    """
+    Returns the Projection a derived model was made with, or None
+    """
+    if model.projection is None:
+        return None
+
+    return Projection.from_bytes(bytes(model.projection))
+
+
+def fit_pca(blocks, dim):
+    """
+    Fits a PCA projection to dim dimensions over blocks of (n, in dim)
+    values in a single pass, keeping only the running sum and the
+    (in dim, in dim) sum of outer products, so memory does not grow
+    with the number of vectors. The components are the eigenvectors of
+    the covariance with the largest eigenvalues.
+    """
+    count = 0
+    total = None
+    outer = None
+
+    for values in blocks:
+        values = numpy.asarray(values, dtype=numpy.float64)
+
+        if total is None:
+            total = numpy.zeros(values.shape[1])
+            outer = numpy.zeros((values.shape[1], values.shape[1]))
+
+        count += len(values)
+        total += values.sum(axis=0)
+        outer += values.T.dot(values)
+
+    if not count:
+        raise Exception('no vectors to fit the projection on')
+
+    if dim > len(total):
+        raise Exception('cannot project %s dimensions to %s' %
+                        (len(total), dim))
+
+    mean = total / count
+    covariance = outer / count - numpy.outer(mean, mean)
+    eigenvalues, eigenvectors = numpy.linalg.eigh(covariance)
+    return Projection(_PCA, mean, eigenvectors[:, ::-1][:, :dim].T)
+
+
+def random_projection(in_dim, dim, seed=0):
+    """
+    Returns a Gaussian random projection to dim dimensions, which
+    preserves distances approximately (Johnson-Lindenstrauss) without
+    looking at the vectors
+    """
+    random = numpy.random.RandomState(seed)
+    return Projection(_RANDOM, numpy.zeros(in_dim),
+                      random.randn(dim, in_dim) / numpy.sqrt(dim))
+
+
+def project_model(session,
+                  model,
+                  dim,
+                  method='pca',
+                  name=None,
+                  encoding=FLOAT32_ENCODING,
+                  compression=NO_COMPRESSION,
+                  chunk_size=50000,
+                  batch_size=1000,
+                  seed=0):
+    """
+    Creates a model derived from model with its vectors projected to
+    dim dimensions, by PCA (fitted in one streaming pass over the
+    vectors) or a random projection. The vectors are read from the
+    database in chunks of chunk_size, projected and bulk inserted into
+    the derived model, which records its parent and the projection.
+    Returns the derived model.
+    """
+    if method not in PROJECTIONS:
+        raise Exception('unknown projection %s' % method)
+
+    if method == 'pca':
+        projection = fit_pca(
+            (v for i, w, v in _new_vectors(session, model, -1, chunk_size)),
+            dim)
+    else:
+        projection = random_projection(model.dim, dim, seed)
+
+    derived = Model(
+        name=name or '%s-%s%s' % (model.name, method, dim),
+        owner=model.owner,
+        description=model.description,
+        num_words=model.num_words,
+        dim=dim,
+        encoding_compression=encoding ^ compression,
+        parent_id=model.id,
+        projection=projection.to_bytes())
+    blocks = ((w, projection.transform(v))
+              for i, w, v in _new_vectors(session, model, -1, chunk_size))
+
+    if ((encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS or
+        (compression & COMPRESSION_MASK) == ZSTD_DICT_COMPRESSION):
+        blocks = _train_on_sample(derived, blocks, encoding, compression,
+                                  numpy.float32)
+
+    session.add(derived)
+    session.commit()
+    statistics = ModelStatistics()
+    rows = vector_rows(
+        blocks,
+        derived.id,
+        encoding=encoding,
+        compression=compression,
+        dictionary=derived.compression_dict,
+        quantizer=derived.quantizer,
+        statistics=statistics)
+
+    for row in bulk_commit_rows(rows, session=session, batch_size=batch_size):
+        pass
+
+    derived.statistics = statistics.to_json()
+    session.commit()
+    return derived
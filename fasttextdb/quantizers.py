@@ -0,0 +1,217 @@
+import struct
+import numpy
+
+__all__ = [
+    'ScalarQuantizer', 'ProductQuantizer', 'quantize_int8', 'dequantize_int8',
+    'load_quantizer'
+]
+
+_SCALAR = 1
+_PRODUCT = 2
+
+_loaded = {}
+
+
+def quantize_int8(values):
+    """
+    Quantizes a single vector to bytes with its own offset and scale:
+    two little-endian float32 values followed by one uint8 code per
+    dimension.
+    """
+    values = numpy.asarray(values, dtype=numpy.float32)
+    offset = values.min()
+    scale = (values.max() - offset) / 255.0 or 1.0
+    codes = numpy.rint((values - offset) / scale).astype(numpy.uint8)
+    return struct.pack('<ff', offset, scale) + codes.tobytes()
+
+
+def dequantize_int8(x):
+    """
+    Reverses quantize_int8, returning approximate float32 values
+    """
+    offset, scale = struct.unpack('<ff', bytes(x[:8]))
+    codes = numpy.frombuffer(x, dtype=numpy.uint8, offset=8)
+    return codes * numpy.float32(scale) + numpy.float32(offset)
+
+
+def load_quantizer(x):
+    """
+    Returns the quantizer serialized in x (see to_bytes), cached on the
+    bytes so each model's quantizer is only parsed once
+    """
+    x = bytes(x)
+
+    if x not in _loaded:
+        if x[0:1] == struct.pack('<B', _SCALAR):
+            _loaded[x] = ScalarQuantizer.from_bytes(x)
+        elif x[0:1] == struct.pack('<B', _PRODUCT):
+            _loaded[x] = ProductQuantizer.from_bytes(x)
+        else:
+            raise Exception('unknown quantizer type')
+
+    return _loaded[x]
+
+
+class ScalarQuantizer(object):
+    """
+    Per-model int8 quantization: each dimension is mapped onto 256
+    levels between its minimum and maximum over the training sample.
+    """
+
+    def __init__(self, offset, scale):
+        self.offset = numpy.asarray(offset, dtype=numpy.float32)
+        self.scale = numpy.asarray(scale, dtype=numpy.float32)
+
+    @staticmethod
+    def train(values):
+        values = numpy.asarray(values, dtype=numpy.float32)
+        offset = values.min(axis=0)
+        scale = (values.max(axis=0) - offset) / 255.0
+        scale[scale == 0] = 1.0
+        return ScalarQuantizer(offset, scale)
+
+    def encode(self, values):
+        codes = numpy.rint((numpy.asarray(values) - self.offset) / self.scale)
+        return numpy.clip(codes, 0, 255).astype(numpy.uint8)
+
+    def decode(self, codes):
+        return codes * self.scale + self.offset
+
+    def dot(self, codes, queries):
+        """
+        Returns the dot products of the encoded vectors (n, dim) with
+        query vectors (q, dim) as an (n, q) array, without decoding the
+        vectors first
+        """
+        queries = numpy.asarray(queries, dtype=numpy.float32)
+        return codes.dot((queries * self.scale).T) + queries.dot(self.offset)
+
+    def to_bytes(self):
+        return struct.pack('<Bi', _SCALAR, len(self.offset)) + \
+            self.offset.astype('<f4').tobytes() + \
+            self.scale.astype('<f4').tobytes()
+
+    @staticmethod
+    def from_bytes(x):
+        kind, dim = struct.unpack('<Bi', x[:5])
+        values = numpy.frombuffer(x, dtype='<f4', offset=5)
+        return ScalarQuantizer(values[:dim], values[dim:])
+
+
+class ProductQuantizer(object):
+    """
+    Product quantization: vectors are split into num_subspaces parts,
+    and each part is replaced by the index of the closest of up to 256
+    centroids learned for that subspace, one byte per subspace.
+    """
+
+    def __init__(self, codebooks):
+        # (num_subspaces, up to 256, subspace dim)
+        self.codebooks = numpy.asarray(codebooks, dtype=numpy.float32)
+
+    @staticmethod
+    def default_subspaces(dim):
+        """
+        The divisor of dim closest to dim / 10, which gives subspaces of
+        about 10 dimensions (30 bytes for 300-dim vectors)
+        """
+        return min(
+            (m for m in range(1, dim + 1) if dim % m == 0),
+            key=lambda m: abs(m - dim / 10.0))
+
+    @staticmethod
+    def train(values, num_subspaces=None, iterations=20, seed=0):
+        values = numpy.asarray(values, dtype=numpy.float32)
+        n, dim = values.shape
+        num_subspaces = num_subspaces or ProductQuantizer.default_subspaces(
+            dim)
+
+        if dim % num_subspaces:
+            raise Exception('vector length %s is not divisible by %s' %
+                            (dim, num_subspaces))
+
+        k = min(256, n)
+        sub = dim // num_subspaces
+        random = numpy.random.RandomState(seed)
+        # with fewer than 256 vectors there are only n centroids, so no
+        # code can point at an untrained one
+        codebooks = numpy.zeros((num_subspaces, k, sub), dtype=numpy.float32)
+
+        for i in range(num_subspaces):
+            x = values[:, i * sub:(i + 1) * sub]
+            centroids = x[random.choice(n, k, replace=False)]
+
+            for j in range(iterations):
+                assignments = _nearest(x, centroids)
+
+                for c in range(k):
+                    members = x[assignments == c]
+
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+
+            codebooks[i] = centroids
+
+        return ProductQuantizer(codebooks)
+
+    def encode(self, values):
+        values = numpy.asarray(values, dtype=numpy.float32)
+        m, k, sub = self.codebooks.shape
+        codes = numpy.empty((len(values), m), dtype=numpy.uint8)
+
+        for i in range(m):
+            codes[:, i] = _nearest(values[:, i * sub:(i + 1) * sub],
+                                   self.codebooks[i])
+
+        return codes
+
+    def decode(self, codes):
+        m, k, sub = self.codebooks.shape
+        codes = numpy.asarray(codes).reshape((-1, m))
+        x = self.codebooks[numpy.arange(m), codes]
+        return x.reshape((len(codes), m * sub))
+
+    def dot(self, codes, queries):
+        """
+        Returns the dot products of the encoded vectors (n, m) with
+        query vectors (q, dim) as an (n, q) array, by looking up the dot
+        products of each query part with each centroid
+        """
+        m, k, sub = self.codebooks.shape
+        queries = numpy.asarray(
+            queries, dtype=numpy.float32).reshape((-1, m, sub))
+        # (m, 256, q)
+        tables = numpy.einsum('mks,qms->mkq', self.codebooks, queries)
+        scores = numpy.zeros((len(codes), len(queries)), dtype=numpy.float32)
+
+        for i in range(m):
+            scores += tables[i][codes[:, i]]
+
+        return scores
+
+    def to_bytes(self):
+        m, k, sub = self.codebooks.shape
+        return struct.pack('<Biii', _PRODUCT, m, k, sub) + \
+            self.codebooks.astype('<f4').tobytes()
+
+    @staticmethod
+    def from_bytes(x):
+        kind, m, k, sub = struct.unpack('<Biii', x[:13])
+        codebooks = numpy.frombuffer(x, dtype='<f4', offset=13)
+        return ProductQuantizer(codebooks.reshape((m, k, sub)))
+
+
+def _nearest(x, centroids, block_rows=4096):
+    """
+    Index of the closest centroid for each row of x, in blocks to bound
+    the size of the distance matrix
+    """
+    c2 = (centroids**2).sum(axis=1)
+    result = numpy.empty(len(x), dtype=numpy.int64)
+
+    for start in range(0, len(x), block_rows):
+        block = x[start:start + block_rows]
+        result[start:start + block_rows] = (
+            c2 - 2 * block.dot(centroids.T)).argmin(axis=1)
+
+    return result
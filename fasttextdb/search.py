@@ -0,0 +1,275 @@
+import os
+import threading
+import numpy
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .models import *
+from .lookup import *
+
+__all__ = [
+    'ModelMatrix', 'model_matrix', 'drop_model_matrix', 'top_k',
+    'unit_rows', 'pairwise_similarities', 'DEFAULT_BLOCK_ROWS', 'METRICS'
+]
+
+DEFAULT_BLOCK_ROWS = 65536
+METRICS = ('cosine', 'dot')
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(os.cpu_count() or 1)
+
+    return _executor
+
+
+def _pick(x, rows):
+    """
+    Returns x[rows[i, j], j] for each element of rows (k, q)
+    """
+    return x[rows, numpy.arange(x.shape[1])]
+
+
+def top_k(scores, k):
+    """
+    Returns the row indices of the k highest scores of each column of
+    scores (n, q), as an array (k, q) in descending order of score
+    """
+    k = min(k, len(scores))
+
+    if k < len(scores):
+        rows = numpy.argpartition(-scores, k - 1, axis=0)[:k]
+    else:
+        rows = numpy.tile(numpy.arange(len(scores))[:, None],
+                          (1, scores.shape[1]))
+
+    order = numpy.argsort(-_pick(scores, rows), axis=0, kind='mergesort')
+    return _pick(rows, order)
+
+
+def unit_rows(values):
+    """
+    Returns the rows of values scaled to unit length (zero rows are left
+    as zeros), as float32
+    """
+    values = numpy.asarray(values, dtype=numpy.float32)
+    norms = numpy.linalg.norm(values, axis=1)
+    return values / numpy.where(norms == 0, 1, norms)[:, None]
+
+
+def pairwise_similarities(a, b, threshold=None, block_rows=4096):
+    """
+    Cosine similarities between the rows of a (n, dim) and b (m, dim),
+    computed as one product of the unit-length rows, in blocks of
+    block_rows rows of a. Returns the (n, m) float32 matrix, or, with a
+    threshold, a tuple of (rows, cols, scores) arrays of only the
+    entries at or above it, so that the full matrix is never held in
+    memory.
+    """
+    a = unit_rows(a)
+    b = unit_rows(b).T
+    blocks = []
+
+    for start in range(0, len(a), block_rows):
+        scores = a[start:start + block_rows].dot(b)
+
+        if threshold is None:
+            blocks.append(scores)
+        else:
+            rows, cols = numpy.nonzero(scores >= threshold)
+            blocks.append((rows.astype(numpy.int32) + start,
+                           cols.astype(numpy.int32), scores[rows, cols]))
+
+    if threshold is None:
+        if not blocks:
+            return numpy.zeros((0, b.shape[1]), dtype=numpy.float32)
+
+        return numpy.concatenate(blocks)
+
+    if not blocks:
+        return (numpy.zeros(0, dtype=numpy.int32),
+                numpy.zeros(0, dtype=numpy.int32),
+                numpy.zeros(0, dtype=numpy.float32))
+
+    return tuple(numpy.concatenate(x) for x in zip(*blocks))
+
+
+class ModelMatrix(object):
+    """
+    The vectors of a model held in memory as one float32 matrix of unit
+    length rows (with the original norms kept separately), for exact
+    nearest neighbour search
+    """
+
+    def __init__(self, words, values, copy=True):
+        """
+        With copy=False, a float32 values array is normalized in place
+        instead of copied, to halve the peak memory use for large models
+        """
+        self.words = list(words)
+        if copy:
+            self.matrix = numpy.array(values, dtype=numpy.float32)
+        else:
+            self.matrix = numpy.asarray(values, dtype=numpy.float32)
+
+        self.norms = numpy.linalg.norm(self.matrix, axis=1)
+        self.matrix /= numpy.where(self.norms == 0, 1, self.norms)[:, None]
+        self._rows = None
+
+    def __len__(self):
+        return len(self.words)
+
+    @staticmethod
+    def load(session, model, batch_size=100000):
+        """
+        Reads all of the model's vectors in batches of batch_size, paging
+        on the (model_id, word) index
+        """
+        words = []
+        values = []
+        last = None
+
+        while True:
+            q = select_vectors(model)
+
+            if last is not None:
+                q = q.where(Vector.__table__.c.word > last)
+
+            w, v = read_matrix(session,
+                               q.order_by(Vector.__table__.c.word).limit(
+                                   batch_size), model)
+
+            if not w:
+                break
+
+            words.extend(w)
+            values.append(v)
+            last = w[-1]
+
+        if not values:
+            return ModelMatrix([], numpy.empty((0, model.dim or 0)))
+
+        return ModelMatrix(words, numpy.concatenate(values), copy=False)
+
+    def row(self, word):
+        """
+        Returns the row of the word, or None if the model has no vector
+        for it
+        """
+        if self._rows is None:
+            self._rows = dict((w, i) for i, w in enumerate(self.words))
+
+        return self._rows.get(word)
+
+    def vectors_for_rows(self, rows):
+        """
+        Returns the original (not normalized) vectors of the rows
+        """
+        return self.matrix[rows] * self.norms[rows, None]
+
+    def search(self,
+               queries,
+               k=10,
+               metric='cosine',
+               exclude=None,
+               block_rows=DEFAULT_BLOCK_ROWS):
+        """
+        Brute-force search for the k rows with the highest cosine
+        similarity (or dot product) to each query vector (q, dim). The
+        matrix is scored in blocks of block_rows rows on a thread pool
+        (numpy releases the GIL for the products), keeping the top k of
+        each block. exclude is an optional list with a row to leave out
+        of the results of each query (the query word). Returns a list of
+        lists of (row, score) tuples per query.
+        """
+        if metric not in METRICS:
+            raise Exception('unknown metric %s' % metric)
+
+        queries = numpy.atleast_2d(
+            numpy.asarray(queries, dtype=numpy.float32))
+
+        if metric == 'cosine':
+            norms = numpy.linalg.norm(queries, axis=1)
+            queries = queries / numpy.where(norms == 0, 1, norms)[:, None]
+
+        extra = 1 if exclude is not None else 0
+
+        def score_block(start):
+            scores = self.matrix[start:start + block_rows].dot(queries.T)
+
+            if metric == 'dot':
+                scores *= self.norms[start:start + block_rows, None]
+
+            rows = top_k(scores, k + extra)
+            return rows + start, _pick(scores, rows)
+
+        blocks = list(
+            _get_executor().map(score_block,
+                                range(0, len(self.words), block_rows)))
+
+        if not blocks:
+            return [[] for q in queries]
+
+        rows = numpy.concatenate([b[0] for b in blocks])
+        scores = numpy.concatenate([b[1] for b in blocks])
+        best = top_k(scores, k + extra)
+        rows = _pick(rows, best)
+        scores = _pick(scores, best)
+        results = []
+
+        for i in range(len(queries)):
+            result = [(int(r), float(s)) for r, s in zip(rows[:, i],
+                                                         scores[:, i])
+                      if exclude is None or r != exclude[i]]
+            results.append(result[:k])
+
+        return results
+
+
+class _MatrixEntry(object):
+    """
+    The matrix of a model in _matrices, with a lock held while it loads
+    so that concurrent searches of other models are not blocked
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.matrix = None
+
+
+def model_matrix(session, model):
+    """
+    Returns the ModelMatrix of a model, loading it on first use and
+    keeping it in memory for later searches. Concurrent first uses of a
+    model wait for one load; _matrices_lock is only held to find the
+    model's entry.
+    """
+    with _matrices_lock:
+        entry = _matrices.get(model.id)
+
+        if entry is None:
+            entry = _matrices[model.id] = _MatrixEntry()
+
+    with entry.lock:
+        if entry.matrix is None:
+            entry.matrix = ModelMatrix.load(session, model)
+
+        return entry.matrix
+
+
+def drop_model_matrix(model_id):
+    """
+    Drops the in-memory matrix of a model (after its vectors changed). A
+    load already in progress completes for its callers, but the next
+    model_matrix call loads the model again.
+    """
+    with _matrices_lock:
+        _matrices.pop(model_id, None)
@@ -0,0 +1,145 @@
+import json
+import numpy
+
+from .models import *
+from .lookup import *
+
+__all__ = ['ModelStatistics', 'model_statistics', 'compute_statistics']
+
+# fixed log-spaced norm histogram bins (10 per decade from 1e-3 to 1e3),
+# so statistics of separate ingests can be merged; norms outside the
+# range are counted in the first or last bin
+NORM_EDGES = numpy.logspace(-3, 3, 61)
+
+
+class ModelStatistics(object):
+    """
+    Aggregates over a model's vectors: the count, mean vector,
+    per-dimension variance and a histogram of the L2 norms. They are
+    updated a block of vectors at a time, merging the block's mean and
+    sum of squared deviations into the running ones (Chan et al.), so
+    they can be kept up to date during ingest without another pass.
+    """
+
+    def __init__(self, count=0, mean=None, m2=None, norm_counts=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.norm_counts = norm_counts if norm_counts is not None else \
+            numpy.zeros(len(NORM_EDGES) - 1, dtype=numpy.int64)
+
+    def update(self, values, norms=None):
+        """
+        Adds an (n, dim) block of vectors (and their norms, if already
+        computed) to the statistics. Returns self.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+
+        if not len(values):
+            return self
+
+        if norms is None:
+            norms = numpy.linalg.norm(values, axis=1)
+
+        mean = values.mean(axis=0)
+        m2 = ((values - mean)**2).sum(axis=0)
+        counts = numpy.histogram(
+            numpy.clip(norms, NORM_EDGES[0], NORM_EDGES[-1]),
+            NORM_EDGES)[0]
+        return self.merge(ModelStatistics(len(values), mean, m2, counts))
+
+    def merge(self, other):
+        """
+        Merges the statistics of another set of vectors into these.
+        Returns self.
+        """
+        if not other.count:
+            return self
+
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * other.count / count
+            self.m2 = self.m2 + other.m2 + \
+                delta**2 * self.count * other.count / count
+            self.count = count
+
+        self.norm_counts = self.norm_counts + other.norm_counts
+        return self
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+
+        return self.m2 / self.count
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': None if self.mean is None else self.mean.tolist(),
+            'variance': None if self.m2 is None else self.variance.tolist(),
+            'normHistogram': {
+                'edges': NORM_EDGES.tolist(),
+                'counts': self.norm_counts.tolist()
+            }
+        }
+
+    def to_json(self):
+        return json.dumps({
+            'count': self.count,
+            'mean': None if self.mean is None else self.mean.tolist(),
+            'm2': None if self.m2 is None else self.m2.tolist(),
+            'normCounts': self.norm_counts.tolist()
+        })
+
+    @staticmethod
+    def from_json(s):
+        x = json.loads(s)
+        return ModelStatistics(x['count'], _array(x['mean']),
+                               _array(x['m2']),
+                               numpy.array(x['normCounts'], dtype=numpy.int64))
+
+
+def _array(values):
+    return None if values is None else numpy.array(values)
+
+
+def model_statistics(model):
+    """
+    Returns the ModelStatistics recorded for a model, or empty ones
+    """
+    if model.statistics is None:
+        return ModelStatistics()
+
+    return ModelStatistics.from_json(model.statistics)
+
+
+def compute_statistics(session, model, batch_size=100000):
+    """
+    Computes the statistics of all of a model's vectors, reading them
+    in batches of batch_size, for models ingested before statistics
+    were recorded. The result is set on the model but not committed.
+    """
+    table = Vector.__table__
+    statistics = ModelStatistics()
+    last_id = -1
+
+    while True:
+        q = select_vectors(model).where(table.c.id > last_id).order_by(
+            table.c.id).limit(batch_size)
+        rows = session.execute(q).fetchall()
+
+        if not rows:
+            break
+
+        statistics.update(
+            unpack_arrays([r[3] for r in rows], [r[4] for r in rows],
+                          model.compression_dict, model.quantizer,
+                          numpy.float64))
+        last_id = rows[-1][0]
+
+    model.statistics = statistics.to_json()
+    return statistics
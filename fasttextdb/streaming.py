@@ -0,0 +1,151 @@
+import json
+import struct
+import numpy
+
+__all__ = [
+    'read_ndjson_blocks', 'read_binary_blocks', 'binary_records',
+    'ndjson_records', 'DEFAULT_STREAM_BLOCK_SIZE'
+]
+
+# vectors per parsed block (a count of records, unlike the byte count
+# of files.DEFAULT_BLOCK_SIZE)
+DEFAULT_STREAM_BLOCK_SIZE = 1000
+
+# each binary record is the length of the UTF-8 word as a little-endian
+# uint32, the word, and dim little-endian float32 values
+_LENGTH = struct.Struct('<I')
+
+
+def _read_exactly(stream, size):
+    """
+    Reads size bytes from the stream, or fewer only at the end of it
+    """
+    parts = []
+
+    while size > 0:
+        part = stream.read(size)
+
+        if not part:
+            break
+
+        parts.append(part)
+        size -= len(part)
+
+    return b''.join(parts)
+
+
+def read_ndjson_blocks(stream,
+                       dim=None,
+                       block_size=DEFAULT_STREAM_BLOCK_SIZE,
+                       dtype=numpy.float32):
+    """
+    Reads newline-delimited JSON objects with a word and its values from
+    a stream a line at a time, and generates (words, values) blocks of
+    up to block_size vectors, with the values as dtype arrays. All
+    vectors must have dim values (or as many as the first one, if dim
+    is None).
+    """
+    words = []
+    values = []
+
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+
+        if not line:
+            continue
+
+        try:
+            x = json.loads(line.decode('utf-8'))
+            word, vector = x['word'], x['values']
+        except (ValueError, KeyError, TypeError):
+            raise ValueError('line %s is not a vector object' % number)
+
+        if dim is None:
+            dim = len(vector)
+
+        if len(vector) != dim:
+            raise ValueError('line %s has %s values instead of %s' %
+                             (number, len(vector), dim))
+
+        words.append(word)
+        values.append(vector)
+
+        if len(words) == block_size:
+            yield words, numpy.array(values, dtype=dtype)
+            words, values = [], []
+
+    if words:
+        yield words, numpy.array(values, dtype=dtype)
+
+
+def read_binary_blocks(stream, dim, block_size=DEFAULT_STREAM_BLOCK_SIZE):
+    """
+    Reads length-prefixed binary records (see binary_records) from a
+    stream and generates (words, values) blocks of up to block_size
+    vectors
+    """
+    vector_size = 4 * dim
+    count = 0
+    words = []
+    values = []
+
+    while True:
+        header = _read_exactly(stream, _LENGTH.size)
+
+        if not header:
+            break
+
+        if len(header) < _LENGTH.size:
+            raise ValueError('truncated record after %s vectors' % count)
+
+        length = _LENGTH.unpack(header)[0]
+        record = _read_exactly(stream, length + vector_size)
+
+        if len(record) < length + vector_size:
+            raise ValueError('truncated record after %s vectors' % count)
+
+        words.append(record[:length].decode('utf-8'))
+        values.append(record[length:])
+        count += 1
+
+        if len(words) == block_size:
+            yield words, _binary_values(values, dim)
+            words, values = [], []
+
+    if words:
+        yield words, _binary_values(values, dim)
+
+
+def _binary_values(values, dim):
+    return numpy.frombuffer(b''.join(values), dtype='<f4').reshape(-1, dim)
+
+
+def binary_records(blocks):
+    """
+    Generates the length-prefixed binary records of (words, values)
+    blocks, a block at a time, for read_binary_blocks
+    """
+    for words, values in blocks:
+        values = numpy.asarray(values, dtype='<f4')
+        parts = []
+
+        for word, vector in zip(words, values):
+            word = word.encode('utf-8')
+            parts.extend([_LENGTH.pack(len(word)), word, vector.tobytes()])
+
+        yield b''.join(parts)
+
+
+def ndjson_records(blocks):
+    """
+    Generates the newline-delimited JSON of (words, values) blocks, a
+    block at a time, for read_ndjson_blocks
+    """
+    for words, values in blocks:
+        yield ''.join(
+            json.dumps({
+                'word': w,
+                'values': v
+            }) + '\n'
+            for w, v in zip(words, numpy.asarray(values).tolist())).encode(
+                'utf-8')
@@ -0,0 +1,168 @@
+import os
+import threading
+import numpy
+
+__all__ = [
+    'word_ngrams', 'ngram_hashes', 'subword_ids', 'EOS', 'save_buckets',
+    'BucketMatrix', 'load_buckets', 'model_buckets_path'
+]
+
+EOS = '</s>'
+
+FNV_OFFSET = 2166136261
+FNV_PRIME = 16777619
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def word_ngrams(word, minn, maxn):
+    """
+    Returns the character n-grams (as UTF-8 bytes) that fastText uses
+    for a word: n-grams of minn to maxn characters taken from the word
+    wrapped in '<' and '>', leaving out the single-character n-grams
+    made of just the brackets.
+    """
+    if maxn <= 0 or word == EOS:
+        return []
+
+    x = ('<%s>' % word).encode('utf-8')
+    starts = [i for i in range(len(x)) if (x[i] & 0xC0) != 0x80]
+    starts.append(len(x))
+    ngrams = []
+
+    for i in range(len(starts) - 1):
+        for n in range(minn, maxn + 1):
+            if i + n >= len(starts):
+                break
+
+            if n == 1 and (i == 0 or i + n == len(starts) - 1):
+                continue
+
+            ngrams.append(x[starts[i]:starts[i + n]])
+
+    return ngrams
+
+
+def ngram_hashes(ngrams):
+    """
+    Computes the 32-bit FNV-1a hashes fastText uses for bucketing
+    n-grams. All n-grams are hashed together, one byte column at a
+    time, and returned as a numpy uint32 array.
+    """
+    h = numpy.full(len(ngrams), FNV_OFFSET, dtype=numpy.uint32)
+
+    if not ngrams:
+        return h
+
+    lengths = numpy.array([len(x) for x in ngrams])
+    width = int(lengths.max())
+    padded = b''.join(x.ljust(width, b'\0') for x in ngrams)
+
+    # fastText hashes each byte as a sign-extended char
+    columns = numpy.frombuffer(padded, dtype=numpy.int8).reshape(
+        (len(ngrams), width)).astype(numpy.int32).view(numpy.uint32)
+
+    for j in range(width):
+        active = lengths > j
+        h[active] = (h[active] ^ columns[active, j]) * numpy.uint32(FNV_PRIME)
+
+    return h
+
+
+def subword_ids(words, minn, maxn, num_buckets, offset=0):
+    """
+    Returns a tuple of (ids, counts) with the bucket rows for the
+    n-grams of each word (shifted by offset, normally the number of
+    words in the model), concatenated into a single int64 array, plus
+    the number of n-grams found for each word.
+    """
+    ngrams = []
+    counts = []
+
+    if not num_buckets:
+        return (numpy.zeros(0, dtype=numpy.int64),
+                numpy.zeros(len(words), dtype=numpy.int64))
+
+    for word in words:
+        x = word_ngrams(word, minn, maxn)
+        ngrams.extend(x)
+        counts.append(len(x))
+
+    ids = ngram_hashes(ngrams).astype(numpy.int64) % num_buckets + offset
+    return ids, numpy.array(counts, dtype=numpy.int64)
+
+
+def model_buckets_path(config, model):
+    """
+    Returns the path of the .npy file with a model's n-gram bucket
+    matrix, next to its ANN index (see fasttextdb.ann.index_dir)
+    """
+    from .ann import index_dir
+    return os.path.join(index_dir(config), 'model-%s-buckets.npy' % model.id)
+
+
+def save_buckets(path, matrix):
+    """
+    Saves the n-gram bucket rows of a fastText input matrix to path,
+    writing to a temporary file first so readers never see a partial
+    matrix
+    """
+    directory = os.path.dirname(path)
+
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tmp = path + '.tmp.npy'
+    numpy.save(tmp, matrix)
+    os.replace(tmp, path)
+
+
+class BucketMatrix(object):
+    """
+    The n-gram bucket matrix of a fastText model, for computing vectors
+    of out-of-vocabulary words the way fastText does: the average of
+    the rows of the word's character n-grams.
+    """
+
+    def __init__(self, buckets, minn, maxn):
+        self.buckets = buckets
+        self.minn = minn
+        self.maxn = maxn
+
+    def word_vectors(self, words):
+        """
+        Returns a tuple of the (len(words), dim) float32 array of the
+        vectors of the words and the number of n-grams of each (words
+        without n-grams get zeros). The n-grams of all of the words are
+        hashed together.
+        """
+        ids, counts = subword_ids(words, self.minn, self.maxn,
+                                  len(self.buckets))
+        values = numpy.zeros(
+            (len(words), self.buckets.shape[1]), dtype=numpy.float32)
+        has = counts > 0
+
+        if len(ids):
+            offsets = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+            values[has] = numpy.add.reduceat(
+                self.buckets[ids], offsets[has], axis=0) / counts[has, None]
+
+        return values, counts
+
+
+def load_buckets(path, minn, maxn):
+    """
+    Returns the BucketMatrix saved at path (memory-mapped), or None if
+    there is none; reloaded when the file changes
+    """
+    if not os.path.exists(path):
+        return None
+
+    mtime = os.path.getmtime(path)
+
+    with _loaded_lock:
+        if path not in _loaded or _loaded[path][0] != mtime:
+            _loaded[path] = (mtime, numpy.load(path, mmap_mode='r'))
+
+        return BucketMatrix(_loaded[path][1], minn, maxn)
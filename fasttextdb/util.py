@@ -2,6 +2,8 @@ import re
 
 from flask import request
 
+from .payloads import pyarrow, NPY_MIMETYPE, ARROW_MIMETYPE
+
 __all__ = [
     'camel_to_under', 'under_to_camel', 'get_requested_type',
     'get_content_type'
@@ -23,10 +25,19 @@ def under_to_camel(under):
 
 
 def get_requested_type():
-    best = request.accept_mimetypes.best_match(
-        ['application/json', 'text/html', 'text/csv'])
+    accept = request.accept_mimetypes
+    types = [
+        'application/json', 'text/html', 'text/csv', 'application/x-ndjson',
+        NPY_MIMETYPE
+    ]
+
+    # Arrow is only offered when pyarrow is installed
+    if pyarrow:
+        types.append(ARROW_MIMETYPE)
+
+    best = accept.best_match(types)
 
-    if request.accept_mimetypes[best] > request.accept_mimetypes['text/html']:
+    if best and accept[best] > accept['text/html']:
         return best.split('/')[1]
     else:
         return 'html'
@@ -1,11 +1,31 @@
+import io
+import pickle
+import binascii
+import tempfile
+import numpy
+
+from collections import deque
 from contextlib import contextmanager
+from multiprocessing import Pool
 
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 
-from .files import model_file, read_file
+from .files import model_file, model_blocks, parse_block, DEFAULT_BLOCK_SIZE
 from .models import *
+from .compression import train_dictionary, train_quantizer
+from .statistics import ModelStatistics, model_statistics
+
+__all__ = [
+    'commit_file', 'commit_vectors', 'commit_blocks', 'bulk_commit_rows',
+    'model_from_file', 'model_blocks_from_file', 'vector_rows',
+    'pipeline_rows', 'DEFAULT_BATCH_SIZE'
+]
+
+DEFAULT_BATCH_SIZE = 1000
 
-__all__ = ['commit_file', 'commit_vectors', 'model_from_file']
+# vectors sampled to train a model's quantizer or zstd dictionary on
+TRAINING_SAMPLE_SIZE = 10000
 
 
 def _get_session(engine=None, Session=None, session=None):
@@ -24,28 +44,131 @@ def commit_file(file_,
                 Session=None,
                 session=None,
                 commit_interval=100,
-                encoding=JSON_ENCODING,
-                compression=BZ2_COMPRESSION,
+                encoding=None,
+                compression=None,
                 model=None,
+                block_size=DEFAULT_BLOCK_SIZE,
+                bulk=False,
+                batch_size=DEFAULT_BATCH_SIZE,
+                workers=None,
+                buckets_path=None,
                 **model_info):
     """
     Processes a file(-like object), extracts Vectors, and commits them
     to the database. Yields the vectors as it proceeds, to allow for
-    progress monitoring
+    progress monitoring. The file may hold text vectors, a fastText
+    .bin model or word2vec binary vectors (see
+    fasttextdb.files.model_blocks).
+
+    With bulk set, the vectors are inserted with bulk_commit_rows in
+    batches of batch_size instead of through the ORM session, and the
+    rows are yielded as dicts instead of Vector objects. Setting workers
+    as well parses and packs the vectors in that many processes (see
+    pipeline_rows), leaving only the inserts to this one.
+
+    The encoding and compression default to the codec recorded for the
+    model (see Model.codec), or JSON and bz2; the codec used is recorded
+    on models without one. A zstd dictionary or quantizer the codec
+    needs is trained on a sample of all of the file's vectors if the
+    model has none yet (the parsed blocks are spooled to a temporary
+    file meanwhile).
+
+    For fastText .bin models, the n-gram bucket matrix is saved to
+    buckets_path if given, for out-of-vocabulary lookups (see
+    fasttextdb.subwords.BucketMatrix).
+
+    Each vector's L2 norm is stored with it, and the model's statistics
+    (see fasttextdb.statistics.ModelStatistics) are updated from the
+    same blocks and recorded on the model once all vectors are written.
     """
-    with model_from_file(file_, **model_info) as (m, file1):
+    if model:
+        default_encoding, default_compression = model.codec()
+    else:
+        default_encoding, default_compression = JSON_ENCODING, BZ2_COMPRESSION
+
+    encoding = default_encoding if encoding is None else encoding
+    compression = default_compression if compression is None else compression
+    dtype = _parse_dtype(encoding)
+
+    with model_blocks_from_file(
+            file_,
+            block_size=block_size,
+            dtype=dtype,
+            parse=not workers,
+            buckets_path=buckets_path,
+            **model_info) as (m, blocks):
+        if model:
+            _fill_model(model, m, exclude=model_info)
+
+        target = model or m
+
+        if target.encoding_compression is None:
+            target.encoding_compression = encoding ^ compression
+
+        needs_dictionary = ((compression & COMPRESSION_MASK) ==
+                            ZSTD_DICT_COMPRESSION
+                            and target.compression_dict is None)
+        needs_quantizer = ((encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS
+                           and target.quantizer is None)
+
+        if needs_dictionary or needs_quantizer:
+            blocks = _train_on_sample(target, blocks, encoding,
+                                      compression, dtype)
+
+        statistics = model_statistics(target)
+
+        if bulk or workers:
+            session = _get_session(engine, Session, session)
+            model = target
+
+            if model.id is None:
+                session.add(model)
+                session.commit()
+
+            if workers:
+                rows = pipeline_rows(
+                    blocks,
+                    model,
+                    workers,
+                    encoding=encoding,
+                    compression=compression,
+                    dtype=dtype,
+                    statistics=statistics)
+            else:
+                rows = vector_rows(
+                    blocks,
+                    model.id,
+                    encoding=encoding,
+                    compression=compression,
+                    dictionary=model.compression_dict,
+                    quantizer=model.quantizer,
+                    statistics=statistics)
+
+            for row in bulk_commit_rows(
+                    rows, session=session, batch_size=batch_size):
+                yield row
+
+            model.statistics = statistics.to_json()
+            session.commit()
+            return
+
+        session = _get_session(engine, Session, session)
+
         for vector in commit_vectors(
                 vectors(
-                    read_file(file1),
-                    model or m,
+                    blocks,
+                    target,
                     encoding=encoding,
-                    compression=compression),
-                engine=engine,
-                Session=Session,
+                    compression=compression,
+                    statistics=statistics),
                 session=session,
                 commit_interval=commit_interval):
             yield vector
 
+        target.statistics = statistics.to_json()
+        session.add(target)
+        session.commit()
+
 
 def commit_vectors(source,
                    engine=None,
@@ -77,6 +200,279 @@ def commit_vectors(source,
             yield vector
 
 
+def commit_blocks(source,
+                  model,
+                  engine=None,
+                  Session=None,
+                  session=None,
+                  encoding=None,
+                  compression=None,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Bulk inserts the vectors of a source of (words, values) blocks (for
+    example parsed from a stream, see fasttextdb.streaming) into an
+    existing model, in batches of batch_size (see bulk_commit_rows).
+    The codec, training and statistics are handled as in commit_file.
+    The vectors and the model's updated statistics are committed in one
+    transaction, so a source that fails part way (like a truncated
+    stream) adds nothing. Yields the rows as they are written.
+    """
+    session = _get_session(engine, Session, session)
+    default_encoding, default_compression = model.codec()
+    encoding = default_encoding if encoding is None else encoding
+    compression = default_compression if compression is None else compression
+
+    if model.encoding_compression is None:
+        model.encoding_compression = encoding ^ compression
+
+    if (((compression & COMPRESSION_MASK) == ZSTD_DICT_COMPRESSION
+         and model.compression_dict is None)
+            or ((encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS
+                and model.quantizer is None)):
+        source = _train_on_sample(model, source, encoding, compression,
+                                  _parse_dtype(encoding))
+
+    session.commit()
+    statistics = model_statistics(model)
+    rows = vector_rows(
+        source,
+        model.id,
+        encoding=encoding,
+        compression=compression,
+        dictionary=model.compression_dict,
+        quantizer=model.quantizer,
+        statistics=statistics)
+
+    for row in bulk_commit_rows(
+            _with_statistics(rows, model, statistics),
+            session=session,
+            batch_size=batch_size,
+            atomic=True):
+        yield row
+
+
+def _with_statistics(rows, model, statistics):
+    """
+    Generates the rows, and records the statistics on the model once
+    they are all read, so they are committed with the last batch
+    """
+    for row in rows:
+        yield row
+
+    model.statistics = statistics.to_json()
+
+
+def _train_on_sample(model,
+                     blocks,
+                     encoding,
+                     compression,
+                     dtype,
+                     sample_size=TRAINING_SAMPLE_SIZE):
+    """
+    Trains the model's quantizer and zstd dictionary (where the codec
+    needs them and the model has none) on a uniform reservoir sample of
+    sample_size vectors from all of the blocks, spooling the blocks to a
+    temporary file on the way, and returns the blocks replayed from it
+    """
+    random = numpy.random.RandomState(0)
+    spool = tempfile.TemporaryFile()
+    sample = None
+    seen = 0
+
+    for block in blocks:
+        pickle.dump(block, spool, pickle.HIGHEST_PROTOCOL)
+
+        if not isinstance(block, tuple):
+            block = parse_block(block, model.dim, dtype)
+
+        if not block or not len(block[0]):
+            continue
+
+        values = block[1]
+
+        if sample is None:
+            sample = numpy.empty((sample_size, values.shape[1]),
+                                 values.dtype)
+
+        # row t of the stream replaces a random slot j <= t of the
+        # sample if j < sample_size (Algorithm R, a block at a time)
+        t = numpy.arange(seen, seen + len(values))
+        j = (random.random_sample(len(values)) * (t + 1)).astype(numpy.int64)
+        j = numpy.where(t < sample_size, t, j)
+        keep = j < sample_size
+        sample[j[keep]] = values[keep]
+        seen += len(values)
+
+    if sample is not None:
+        sample = sample[:min(seen, sample_size)]
+
+        if ((encoding & ENCODING_MASK) in QUANTIZED_ENCODINGS
+                and model.quantizer is None):
+            model.quantizer = train_quantizer(sample, encoding)
+
+        if ((compression & COMPRESSION_MASK) == ZSTD_DICT_COMPRESSION
+                and model.compression_dict is None):
+            model.compression_dict = train_dictionary(
+                sample, encoding, quantizer=model.quantizer)
+
+    return _replay(spool)
+
+
+def _replay(spool):
+    spool.seek(0)
+
+    try:
+        while True:
+            try:
+                yield pickle.load(spool)
+            except EOFError:
+                break
+    finally:
+        spool.close()
+
+
+def _parse_dtype(encoding):
+    # JSON-encoded float64 values keep the short representation from
+    # text files, float32 would write out every rounding digit
+    if (encoding & ENCODING_MASK) == JSON_ENCODING:
+        return numpy.float64
+    else:
+        return numpy.float32
+
+
+def bulk_commit_rows(source,
+                     engine=None,
+                     Session=None,
+                     session=None,
+                     batch_size=DEFAULT_BATCH_SIZE,
+                     atomic=False):
+    """
+    Takes a source of vector rows (see vector_rows) and inserts them in
+    batches of batch_size, bypassing the ORM unit of work. Batches go
+    through executemany, or COPY FROM STDIN on PostgreSQL, and are
+    committed one at a time, or all together if atomic is set (rolling
+    back on errors, so a failure leaves none of the rows). On SQLite,
+    all batches are always written in a single transaction with
+    synchronous writes turned off. Yields the rows as they are written,
+    to allow for progress monitoring.
+    """
+    session = _get_session(engine, Session, session)
+    dialect = session.connection().dialect.name
+    table = Vector.__table__
+
+    if dialect == 'sqlite':
+        with _sqlite_bulk_pragmas(session):
+            for rows in _batches(source, batch_size):
+                session.execute(table.insert(), rows)
+
+                for row in rows:
+                    yield row
+
+            session.commit()
+        return
+
+    try:
+        for rows in _batches(source, batch_size):
+            if dialect == 'postgresql':
+                _copy_rows(session, rows)
+            else:
+                session.execute(table.insert(), rows)
+
+            if not atomic:
+                session.commit()
+
+            for row in rows:
+                yield row
+
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+
+
+def _batches(source, batch_size):
+    batch = []
+
+    for x in source:
+        batch.append(x)
+
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+@contextmanager
+def _sqlite_bulk_pragmas(session):
+    """
+    Context: sets SQLite pragmas for bulk loading on the session's
+    connection, restoring the previous values on exit. SQLite only
+    changes these outside of a transaction, so pending changes are
+    committed first, and the transaction is rolled back on errors.
+    """
+    pragmas = {'synchronous': 'OFF', 'cache_size': '-65536'}
+    previous = {}
+    session.commit()
+
+    for k in pragmas:
+        previous[k] = session.execute(text('PRAGMA %s' % k)).scalar()
+        session.execute(text('PRAGMA %s = %s' % (k, pragmas[k])))
+
+    try:
+        yield
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        for k in previous:
+            session.execute(text('PRAGMA %s = %s' % (k, previous[k])))
+
+
+# columns written by _copy_rows, in order
+_COPY_COLUMNS = ('word', 'word_hash', 'packed_values', 'model_id',
+                 'encoding_compression', 'norm')
+
+
+def _copy_value(x):
+    """
+    Formats a value for PostgreSQL's COPY text format: None as \\N,
+    bytea as hex, floats with all of their digits, and text with
+    backslashes, tabs and newlines escaped
+    """
+    if x is None:
+        return '\\N'
+    elif isinstance(x, (bytes, bytearray, memoryview)):
+        return '\\\\x' + binascii.hexlify(x).decode('ascii')
+    elif isinstance(x, float):
+        return repr(x)
+    else:
+        return str(x).replace('\\', '\\\\').replace('\t', '\\t').replace(
+            '\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_line(row):
+    return u'\t'.join(_copy_value(row[c]) for c in _COPY_COLUMNS) + u'\n'
+
+
+def _copy_rows(session, rows):
+    """
+    Writes a batch of rows with PostgreSQL's COPY FROM STDIN in text
+    format, using the DBAPI connection behind the session
+    """
+    buff = io.StringIO()
+
+    for row in rows:
+        buff.write(_copy_line(row))
+
+    buff.seek(0)
+    cursor = session.connection().connection.cursor()
+    cursor.copy_expert(
+        'COPY %s (%s) FROM STDIN' % (Vector.__tablename__,
+                                     ', '.join(_COPY_COLUMNS)), buff)
+
+
 @contextmanager
 def model_from_file(file_, **model_info):
     """
@@ -87,16 +483,160 @@ def model_from_file(file_, **model_info):
         yield Model(num_words=num_words, dim=vec_length, **model_info), file1
 
 
+@contextmanager
+def model_blocks_from_file(file_,
+                           block_size=DEFAULT_BLOCK_SIZE,
+                           dtype=numpy.float32,
+                           parse=True,
+                           buckets_path=None,
+                           **model_info):
+    """
+    Wraps fasttextdb.files.model_blocks to return a tuple of (Model,
+    blocks), with the Model columns filled in from the file header
+    (overridden by model_info); blocks can be used with the vectors
+    generator
+    """
+    with model_blocks(file_, block_size, dtype, parse,
+                      buckets_path) as (file_info, blocks):
+        file_info.update(model_info)
+        yield Model(**file_info), blocks
+
+
+def _fill_model(model, source, exclude=()):
+    """
+    Copies the columns read from a file onto an existing model, where
+    the model does not have a value yet
+    """
+    for column in Model.__table__.columns:
+        if column.name == 'id' or column.name in exclude:
+            continue
+
+        if getattr(model, column.name) is None:
+            setattr(model, column.name, getattr(source, column.name))
+
+
 def vectors(source,
             model=None,
             encoding=JSON_ENCODING,
-            compression=BZ2_COMPRESSION):
+            compression=BZ2_COMPRESSION,
+            statistics=None):
+    """
+    Given a model and a source of (words, values) blocks (see
+    fasttextdb.files.read_blocks), this will generate Vectors for
+    storage to a database. Each block is added to statistics (a
+    fasttextdb.statistics.ModelStatistics), if given.
+    """
+    for (words, values) in source:
+        if statistics is not None:
+            statistics.update(values)
+
+        for word, vector in zip(words, values):
+            v = Vector(model=model, word=word)
+            v.pack_values(vector, encoding=encoding, compression=compression)
+            yield v
+
+
+def vector_rows(source,
+                model_id,
+                encoding=JSON_ENCODING,
+                compression=BZ2_COMPRESSION,
+                dictionary=None,
+                quantizer=None,
+                statistics=None):
     """
-    Given a model and a source of (word, values) tuples (see
-    modeldb.files.read_file), this will generate Vectors for storage
-    to a database.
+    Like vectors, but generates plain dicts of column values for
+    bulk_commit_rows instead of Vector objects, for the model with the
+    given id (and compression dictionary and quantizer, if any).
     """
-    for (word, vector) in source:
-        v = Vector(model=model, word=word)
-        v.pack_values(vector, encoding=encoding, compression=compression)
-        yield v
+    for (words, values) in source:
+        values = numpy.asarray(values)
+        norms = numpy.linalg.norm(values, axis=1) if len(values) else []
+
+        if statistics is not None:
+            statistics.update(values, norms)
+
+        for word, vector, norm in zip(words, values, norms):
+            packed, encoding_compression = pack_values(
+                vector,
+                encoding=encoding,
+                compression=compression,
+                dictionary=dictionary,
+                quantizer=quantizer)
+            yield {
+                'word': word,
+                'word_hash': word_hash(word),
+                'packed_values': packed,
+                'model_id': model_id,
+                'encoding_compression': encoding_compression,
+                'norm': float(norm)
+            }
+
+
+def pipeline_rows(source,
+                  model,
+                  workers,
+                  encoding=JSON_ENCODING,
+                  compression=BZ2_COMPRESSION,
+                  dtype=numpy.float32,
+                  max_pending=None,
+                  statistics=None):
+    """
+    Like vector_rows, but hands each block of the source to a pool of
+    worker processes to be parsed (for raw chunks, see
+    fasttextdb.files.read_chunks) and packed. Rows are generated in file
+    order. At most max_pending blocks (twice the number of workers by
+    default) are in flight at once, so reading does not run ahead of
+    the consumer. The workers also return the statistics of their
+    blocks, which are merged into statistics if given.
+    """
+    max_pending = max_pending or 2 * workers
+    pool = Pool(workers)
+    pending = deque()
+
+    try:
+        for block in source:
+            pending.append(
+                pool.apply_async(_pack_block, (block, model.dim, dtype,
+                                               model.id, encoding, compression,
+                                               model.compression_dict,
+                                               model.quantizer)))
+
+            if len(pending) >= max_pending:
+                for row in _block_rows(pending.popleft(), statistics):
+                    yield row
+
+        while pending:
+            for row in _block_rows(pending.popleft(), statistics):
+                yield row
+
+        pool.close()
+    finally:
+        pool.terminate()
+
+
+def _block_rows(result, statistics):
+    rows, block_statistics = result.get()
+
+    if statistics is not None:
+        statistics.merge(block_statistics)
+
+    return rows
+
+
+def _pack_block(block, dim, dtype, model_id, encoding, compression,
+                dictionary, quantizer):
+    """
+    Worker for pipeline_rows: parses a block if needed, and returns a
+    tuple of the list of packed rows and the block's ModelStatistics
+    """
+    statistics = ModelStatistics()
+
+    if not isinstance(block, tuple):
+        block = parse_block(block, dim, dtype)
+
+        if not block:
+            return [], statistics
+
+    return list(
+        vector_rows([block], model_id, encoding, compression, dictionary,
+                    quantizer, statistics)), statistics
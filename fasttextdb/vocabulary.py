@@ -0,0 +1,161 @@
+import threading
+
+from bisect import bisect_left
+from sqlalchemy import select
+
+from .models import *
+
+__all__ = [
+    'Vocabulary', 'model_vocabulary', 'drop_model_vocabulary',
+    'DEFAULT_MAX_DISTANCE'
+]
+
+DEFAULT_MAX_DISTANCE = 2
+
+# sorts after any other character, to find the end of a prefix range
+_MAX_CHAR = u'\U0010ffff'
+
+_vocabularies = {}
+_vocabularies_lock = threading.Lock()
+
+
+class Vocabulary(object):
+    """
+    The words of a model as a sorted list, for prefix searches by
+    bisection and bounded edit distance searches that walk the sorted
+    words like a trie
+    """
+
+    def __init__(self, words):
+        self.words = sorted(words)
+
+    def __len__(self):
+        return len(self.words)
+
+    @staticmethod
+    def load(session, model, batch_size=100000):
+        """
+        Reads the words of a model in batches of batch_size, paging on
+        the (model_id, word) index
+        """
+        table = Vector.__table__
+        words = []
+
+        while True:
+            q = select([table.c.word]).where(table.c.model_id == model.id)
+
+            if words:
+                q = q.where(table.c.word > words[-1])
+
+            batch = [r[0] for r in session.execute(
+                q.order_by(table.c.word).limit(batch_size))]
+
+            if not batch:
+                break
+
+            words.extend(batch)
+
+        return Vocabulary(words)
+
+    def prefix(self, prefix, limit=None):
+        """
+        Returns the words starting with prefix, in order
+        """
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + _MAX_CHAR, start)
+
+        if limit is not None:
+            end = min(end, start + limit)
+
+        return self.words[start:end]
+
+    def fuzzy(self, query, max_distance=DEFAULT_MAX_DISTANCE, limit=None):
+        """
+        Returns a list of (word, distance) tuples of the words within
+        max_distance (Levenshtein) of query, closest first. The rows of
+        the edit distance table are shared by words with a common
+        prefix, and all of the words under a prefix are skipped as soon
+        as no row entry is within max_distance.
+        """
+        # rows[d] is the edit distance row after the first d characters
+        # of the previous word
+        rows = [list(range(len(query) + 1))]
+        previous = u''
+        results = []
+        i = 0
+
+        while i < len(self.words):
+            word = self.words[i]
+            common = 0
+
+            while common < min(len(previous), len(word), len(rows) - 1) and \
+                    previous[common] == word[common]:
+                common += 1
+
+            del rows[common + 1:]
+            pruned = False
+
+            for d in range(common, len(word)):
+                above = rows[-1]
+                row = [above[0] + 1]
+
+                for j in range(1, len(query) + 1):
+                    row.append(
+                        min(row[j - 1] + 1, above[j] + 1,
+                            above[j - 1] + (query[j - 1] != word[d])))
+
+                rows.append(row)
+
+                if min(row) > max_distance:
+                    previous = word[:d + 1]
+                    i = bisect_left(self.words, previous + _MAX_CHAR, i)
+                    pruned = True
+                    break
+
+            if not pruned:
+                if rows[-1][-1] <= max_distance:
+                    results.append((word, rows[-1][-1]))
+
+                previous = word
+                i += 1
+
+        results.sort(key=lambda x: (x[1], x[0]))
+        return results if limit is None else results[:limit]
+
+
+class _VocabularyEntry(object):
+    """
+    The vocabulary of a model in _vocabularies, with a lock held while
+    it loads (see fasttextdb.search.model_matrix)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.vocabulary = None
+
+
+def model_vocabulary(session, model):
+    """
+    Returns the Vocabulary of a model, loading it on first use and
+    keeping it in memory for later searches. _vocabularies_lock is only
+    held to find the model's entry, not while it loads.
+    """
+    with _vocabularies_lock:
+        entry = _vocabularies.get(model.id)
+
+        if entry is None:
+            entry = _vocabularies[model.id] = _VocabularyEntry()
+
+    with entry.lock:
+        if entry.vocabulary is None:
+            entry.vocabulary = Vocabulary.load(session, model)
+
+        return entry.vocabulary
+
+
+def drop_model_vocabulary(model_id):
+    """
+    Drops the in-memory vocabulary of a model (after words were added)
+    """
+    with _vocabularies_lock:
+        _vocabularies.pop(model_id, None)
@@ -1,14 +1,39 @@
+import csv
+import json
+import numpy
+
 from flask import jsonify
 from flask import request
 from flask import session
+from flask import Response
 
 from flask_login import login_user
 
 from functools import wraps
 
+from sqlalchemy.sql.expression import asc
+
 from ..models import *
+from ..lookup import *
+from ..cache import *
+from ..search import *
+from ..ann import *
+from ..arithmetic import *
+from ..embedding import *
+from ..subwords import *
+from ..vocabulary import *
+from ..statistics import *
+from ..clustering import *
+from ..payloads import *
+from ..batch import *
+from ..streaming import *
+from ..vectors import commit_blocks, DEFAULT_BATCH_SIZE
 from .app import app, user_loader, request_loader, page_request
+from .app import vector_codec, vector_cache, page_list, get_param
+from .app import invalidate_vectors, config, Session, with_cursor
+from .app import lookup_executor
 from ..exceptions import *
+from ..util import *
 from .pages import upload_vectors_for_model
 
 
@@ -90,9 +115,10 @@ def api_update_model(id):
 @app.route("/api/model", methods=['GET'])
 @api_auth
 def api_get_models():
-    models = request.session.query(Model)
-    models = page_request(models)
-    return jsonify([m.to_dict() for m in models])
+    models = request.session.query(Model).order_by(asc(Model.id))
+    models = list(page_request(models, Model.id))
+    return with_cursor(
+        jsonify([m.to_dict() for m in models]), [m.id for m in models])
 
 
 @app.route("/api/model/name/<name>")
@@ -106,6 +132,94 @@ def api_get_model_by_name(name):
     return jsonify(models[0].to_dict())
 
 
+@app.route("/api/model/<int:id>/statistics")
+@api_auth
+def api_model_statistics(id):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Could not find a model with ID %s' % id)
+
+    return jsonify(model_statistics(model).to_dict())
+
+
+def _clustering(model):
+    """
+    Returns the clustering of the model given by the clustering
+    parameter, or its most recent one
+    """
+    clustering_id = get_param('clustering', None, int)
+
+    if clustering_id is None:
+        clustering = latest_clustering(request.session, model)
+    else:
+        clustering = request.session.query(Clustering).get(clustering_id)
+
+    if not clustering or clustering.model_id != model.id:
+        raise NotFoundException('No clustering was found for model %s' %
+                                model.id)
+
+    return clustering
+
+
+@app.route("/api/model/<int:id>/clusterings")
+@api_auth
+def api_clusterings_for_model(id):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Could not find a model with ID %s' % id)
+
+    clusterings = request.session.query(Clustering).filter(
+        Clustering.model_id == model.id).order_by(asc(Clustering.id))
+    return jsonify([c.to_dict() for c in clusterings])
+
+
+@app.route("/api/model/<int:id>/cluster/word/<word>")
+@api_auth
+def api_cluster_of_word(id, word):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Could not find a model with ID %s' % id)
+
+    clustering = _clustering(model)
+    assignment = cluster_of_word(request.session, clustering, word)
+
+    if not assignment:
+        raise NotFoundException('Word %s is not in clustering %s' %
+                                (word, clustering.id))
+
+    return jsonify(clusteringId=clustering.id, **assignment.to_dict())
+
+
+@app.route("/api/model/<int:id>/cluster/<int:cluster>/words")
+@api_auth
+def api_cluster_members(id, cluster):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Could not find a model with ID %s' % id)
+
+    clustering = _clustering(model)
+    members = page_request(
+        cluster_members(request.session, clustering, cluster))
+    return jsonify([m.to_dict() for m in members])
+
+
+@app.route("/api/model/<int:id>/derived")
+@api_auth
+def api_derived_models(id):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Could not find a model with ID %s' % id)
+
+    models = request.session.query(Model).filter(
+        Model.parent_id == model.id).order_by(asc(Model.dim))
+    return jsonify([m.to_dict() for m in models])
+
+
 @app.route("/api/models/count")
 @api_auth
 def count_models():
@@ -125,16 +239,66 @@ def count_vectors_for_words(id):
     return jsonify(count=count)
 
 
-def _vectors_response(vectors, template, method, **kwargs):
+_PAYLOADS = {
+    NPY_MIMETYPE.split('/')[1]: (NPY_MIMETYPE, encode_npy),
+    ARROW_MIMETYPE.split('/')[1]: (ARROW_MIMETYPE, encode_arrow)
+}
+
+
+def _matrix_response(words, values):
+    """
+    Returns words and their values as an .npy or Arrow payload (see
+    fasttextdb.payloads), whichever was requested
+    """
+    mimetype, encode = _PAYLOADS[get_requested_type()]
+    return Response(encode(words, values), mimetype=mimetype)
+
+
+def _vectors_response(vectors, dim=None):
+    """
+    Returns the vectors (an iterable of VectorRecords) as CSV or NDJSON
+    if either was requested, streamed one row at a time, as an .npy or
+    Arrow payload of the (dim wide) matrix of their values, or else as
+    a JSON array
+    """
     at = get_requested_type()
 
-    if at == 'csv':
+    if at in _PAYLOADS:
+        vectors = list(vectors)
+        values = numpy.empty((len(vectors), dim or 0), dtype=numpy.float32)
+
+        for i, v in enumerate(vectors):
+            values[i] = v.values
+
+        return _matrix_response([v.word for v in vectors], values)
+    elif at == 'csv':
+        return Response(
+            iter_csv(v.to_list() for v in vectors), mimetype='text/csv')
+    elif at == 'x-ndjson':
         return Response(
-            iter_csv([v.to_list() for v in vectors]), mimetype='text/csv')
+            (json.dumps(v.to_dict()) + '\n' for v in vectors),
+            mimetype='application/x-ndjson')
 
     return jsonify([v.to_dict() for v in vectors])
 
 
+def _stream_vectors(model_id, query, batch_size=1000):
+    """
+    Generates the VectorRecords of a select_vectors query from a cursor
+    of its own session, as the request's session is closed before a
+    streamed response is sent
+    """
+    session = Session()
+
+    try:
+        model = session.query(Model).get(model_id)
+
+        for v in iter_vectors(session, query, model, batch_size=batch_size):
+            yield v
+    finally:
+        session.close()
+
+
 @app.route('/api/model/<int:id>/vectors', methods=['GET'])
 @api_auth
 def api_vectors_for_model(id):
@@ -143,15 +307,24 @@ def api_vectors_for_model(id):
     if not model:
         raise NotFoundException('Model with ID %s was not found' % id)
 
-    vectors = Vector.vectors_for_model(request.session,
-                                       model).order_by(asc(Vector.word))
-    vectors = page_request(vectors)
+    word = Vector.__table__.c.word
+    query = select_vectors(model).order_by(asc(word))
+
+    # streamed formats can export the whole model in one response
+    if get_param('all', 'false') == 'true' and \
+            get_requested_type() in ('csv', 'x-ndjson'):
+        return _vectors_response(_stream_vectors(model.id, query))
+
+    query = page_request(query, word)
+
+    if get_requested_type() in _PAYLOADS:
+        # decoded in bulk straight from the packed values
+        words, values = read_matrix(request.session, query, model)
+        return with_cursor(_matrix_response(words, values), words)
 
-    return vectors_response(
-        template='vectors.html',
-        method='vectors_for_model',
-        model=model,
-        vectors=vectors)
+    # the page is read in one query, which also gives the next cursor
+    vectors = read_vectors(request.session, query, model)
+    return with_cursor(_vectors_response(vectors), [v.word for v in vectors])
 
 
 @app.route('/api/model/<int:id>/vectors/count')
@@ -166,13 +339,30 @@ def api_count_vectors_for_model(id):
     return jsonify(count=count)
 
 
-def _vectors_from_json(model, json):
+def _vectors_from_json(model, json, statistics):
+    encoding, compression = vector_codec(model)
+
     for vector in json:
         v = Vector(word=vector['word'], model=model)
-        v.pack_values(vector['values'])
+        v.pack_values(vector['values'], encoding, compression)
+        statistics.update([vector['values']], [v.norm])
         yield v
 
 
+def _create_vectors(model):
+    """
+    Adds the vectors of a JSON list of word and values objects to a
+    model, merging them into its statistics. Returns the count.
+    """
+    statistics = model_statistics(model)
+    vectors = list(_vectors_from_json(model, request.json, statistics))
+    request.session.add_all(vectors)
+    model.statistics = statistics.to_json()
+    request.session.commit()
+    invalidate_vectors(model)
+    return len(vectors)
+
+
 @app.route('/api/model/<int:id>/vectors', methods=['POST'])
 @api_auth
 def api_create_vectors_for_model_id(id):
@@ -181,9 +371,7 @@ def api_create_vectors_for_model_id(id):
     if not model:
         raise NotFoundException('Model with ID %s was not found' % id)
 
-    vectors = list(_vectors_from_json(model, request.json))
-    request.session.add_all(vectors)
-    return jsonify({'count': len(vectors)})
+    return jsonify({'count': _create_vectors(model)})
 
 
 @app.route('/api/model/name/<name>/vectors', methods=['POST'])
@@ -194,10 +382,70 @@ def api_create_vectors_for_model_name(name):
     if len(models) == 0:
         raise NotFoundException('Model with ID %s was not found' % id)
 
-    model = models[0]
-    vectors = list(_vectors_from_json(model, request.json))
-    request.session.add_all(vectors)
-    return jsonify({'count': len(vectors)})
+    return jsonify({'count': _create_vectors(models[0])})
+
+
+def _with_model_dim(model, blocks):
+    """
+    Sets the dim of a model without one from the first block
+    """
+    for words, values in blocks:
+        if model.dim is None:
+            model.dim = values.shape[1]
+
+        yield words, values
+
+
+@app.route('/api/model/<int:id>/vectors/stream', methods=['POST'])
+@api_auth
+def api_stream_vectors_for_model(id):
+    """
+    Adds the vectors of a streamed body, NDJSON (application/x-ndjson)
+    or length-prefixed binary records (application/octet-stream, see
+    fasttextdb.streaming), which is parsed as it arrives and inserted in
+    batches, so a whole model can be sent in one request. Binary
+    records need the model's dim, or a dim parameter.
+    """
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    dim = model.dim or get_param('dim', None, int)
+    batch_size = get_param('batch_size', DEFAULT_BATCH_SIZE, int)
+
+    if batch_size < 1:
+        raise BadRequestException('batch_size must be at least 1')
+
+    if request.mimetype == 'application/x-ndjson':
+        blocks = read_ndjson_blocks(
+            request.stream, dim, block_size=batch_size, dtype=numpy.float64)
+    elif request.mimetype == 'application/octet-stream':
+        if not dim:
+            raise BadRequestException('dim is required for binary vectors')
+
+        blocks = read_binary_blocks(request.stream, dim, block_size=batch_size)
+    else:
+        raise BadRequestException('unsupported content type %s' %
+                                  request.mimetype)
+
+    encoding, compression = vector_codec(model)
+    count = 0
+
+    try:
+        for row in commit_blocks(
+                _with_model_dim(model, blocks),
+                model,
+                session=request.session,
+                encoding=encoding,
+                compression=compression,
+                batch_size=batch_size):
+            count += 1
+    except ValueError as e:
+        raise BadRequestException(str(e))
+
+    invalidate_vectors(model)
+    return jsonify({'count': count})
 
 
 @app.route('/api/model/<int:id>/vectors/word/<word>')
@@ -208,10 +456,9 @@ def api_vectors_for_word(id, word):
     if not model:
         raise NotFoundException('Model with ID %s was not found' % id)
 
-    vectors = Vector.vectors_for_word(request.session, word,
-                                      model).order_by(asc(Vector.word))
-    vectors = page_request(vectors)
-    return jsonify([v.to_dict() for v in vectors])
+    vectors = _lookup_words(model, [word],
+                            get_param('oov', 'true') == 'true')
+    return _vectors_response(page_list(vectors), model.dim)
 
 
 @app.route('/api/model/<int:id>/vectors/words', methods=['PUT', 'POST'])
@@ -222,10 +469,438 @@ def api_vectors_for_words_list(id):
     if not model:
         raise NotFoundException('Model with ID %s was not found' % id)
 
-    vectors = Vector.vectors_for_words(request.session, words,
-                                       model).order_by(asc(Vector.word))
-    vectors = page_request(vectors)
-    return jsonify([v.to_dict() for v in vectors])
+    vectors = _lookup_words(model, request.words,
+                            get_param('oov', 'true') == 'true')
+    vectors = sorted(vectors, key=lambda v: v.word)
+    vectors = page_list(vectors, lambda v: v.word)
+    return with_cursor(
+        _vectors_response(vectors, model.dim), [v.word for v in vectors])
+
+
+def _request_word_list():
+    """
+    Returns the words of a batch request body: a JSON list (or object
+    with a words list), or UTF-8 text with one word per line
+    """
+    if request.mimetype == 'application/json':
+        body = request.get_json()
+        words = body.get('words') if isinstance(body, dict) else body
+    else:
+        words = request.get_data().decode('utf-8').splitlines()
+
+    if not isinstance(words, list):
+        raise BadRequestException('a list of words is required')
+
+    return words
+
+
+@app.route('/api/model/<int:id>/vectors/batch', methods=['POST'])
+@api_auth
+def api_batch_lookup(id):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    words = _request_word_list()
+    values, found = lookup_matrix(
+        Session,
+        model,
+        words,
+        cache=vector_cache,
+        chunk_size=config['lookup']['chunk_size'],
+        executor=lookup_executor)
+
+    if get_param('oov', 'false') == 'true' and not found.all():
+        oov = dict((v.word, v.values)
+                   for v in _oov_vectors(model, [
+                       w for w, f in zip(words, found) if not f
+                   ]))
+
+        for i in numpy.flatnonzero(~found):
+            if words[i] in oov:
+                values[i] = oov[words[i]]
+                found[i] = True
+
+    # rows of NaN mark the missing words in binary payloads
+    if get_requested_type() in _PAYLOADS:
+        return _matrix_response(words, values)
+
+    return jsonify(
+        found=found.tolist(),
+        vectors=[
+            v if f else None for v, f in zip(values.tolist(), found.tolist())
+        ])
+
+
+@app.route('/api/model/<int:id>/words')
+@api_auth
+def api_search_words(id):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    prefix = get_param('prefix')
+    fuzzy = get_param('fuzzy')
+    limit = get_param('limit', 100, int)
+    vocabulary = model_vocabulary(request.session, model)
+
+    if fuzzy is not None:
+        distance = get_param('max_distance', DEFAULT_MAX_DISTANCE, int)
+
+        if distance < 0 or distance > 3:
+            raise BadRequestException('max_distance must be from 0 to 3')
+
+        matches = vocabulary.fuzzy(fuzzy, distance, limit)
+    elif prefix is not None:
+        matches = [(w, None) for w in vocabulary.prefix(prefix, limit)]
+    else:
+        raise BadRequestException('prefix or fuzzy is required')
+
+    result = [{'word': w} for w, d in matches]
+
+    if fuzzy is not None:
+        for r, (w, d) in zip(result, matches):
+            r['distance'] = d
+
+    if get_param('vectors', 'false') == 'true':
+        vectors = dict((v.word, v) for v in _lookup_words(
+            model, [w for w, d in matches]))
+
+        for r in result:
+            if r['word'] in vectors:
+                r['values'] = vectors[r['word']].values.tolist()
+
+    return jsonify(result)
+
+
+def _count(value, name, minimum=1):
+    """
+    Returns a count parameter (like k or nprobe) as an int of at least
+    minimum
+    """
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise BadRequestException('%s must be an integer' % name)
+
+    if value < minimum:
+        raise BadRequestException('%s must be at least %s' % (name, minimum))
+
+    return value
+
+
+def _searcher(model, exact, nprobe):
+    """
+    Returns the model's ANN index (and the search options for it) if it
+    has one and an exact search was not asked for, or else its
+    in-memory matrix for an exact search
+    """
+    if nprobe is not None:
+        nprobe = _count(nprobe, 'nprobe')
+
+    if not exact:
+        index = load_index(model_index_path(config, model))
+
+        if index is not None:
+            return index, {'nprobe': nprobe or config['index']['nprobe']}
+
+    return model_matrix(request.session, model), {}
+
+
+def _neighbors(searcher, options, queries, k, metric, exclude=None):
+    if metric not in METRICS:
+        raise BadRequestException('metric must be one of %s' %
+                                  ', '.join(METRICS))
+
+    if not len(queries):
+        return []
+
+    results = searcher.search(queries, k, metric, exclude, **options)
+    return [[{
+        'word': searcher.words[row],
+        'score': score
+    } for row, score in result] for result in results]
+
+
+@app.route('/api/model/<int:id>/neighbors/word/<word>')
+@api_auth
+def api_neighbors_for_word(id, word):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    searcher, options = _searcher(model,
+                                  get_param('exact', 'false') == 'true',
+                                  get_param('nprobe'))
+    row = searcher.row(word)
+
+    if row is None and options:
+        # not indexed yet
+        searcher, options = _searcher(model, True, None)
+        row = searcher.row(word)
+
+    if row is None:
+        raise NotFoundException('Model with ID %s has no vector for %s' %
+                                (id, word))
+
+    neighbors = _neighbors(searcher, options,
+                           searcher.vectors_for_rows([row]),
+                           _count(get_param('k', 10), 'k'),
+                           get_param('metric', 'cosine'), [row])
+    return jsonify(neighbors[0])
+
+
+@app.route('/api/model/<int:id>/neighbors', methods=['POST'])
+@api_auth
+def api_neighbors_for_vectors(id):
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    searcher, options = _searcher(model,
+                                  request.json.get('exact', False),
+                                  request.json.get('nprobe'))
+    queries = request.json.get('vectors', [])
+
+    if any(len(q) != model.dim for q in queries):
+        raise BadRequestException('query vectors must have length %s' %
+                                  model.dim)
+
+    return jsonify(
+        _neighbors(searcher, options, queries,
+                   _count(request.json.get('k', 10), 'k'),
+                   request.json.get('metric', 'cosine')))
+
+
+@app.route('/api/model/<int:id>/arithmetic', methods=['POST'])
+@api_auth
+def api_vector_arithmetic(id):
+    """
+    Evaluates a batch of expressions over the model's words (strings
+    like "king - man + woman", lists of words for their centroid, or
+    dicts with positive and negative lists), with all of the words read
+    in one lookup. Returns the resulting vectors if vectors is true,
+    and the k nearest neighbours of each (leaving out the words of the
+    expression) unless k is 0.
+    """
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    try:
+        terms = [
+            expression_terms(e) for e in request.json.get('expressions', [])
+        ]
+    except ValueError as e:
+        raise BadRequestException(str(e))
+
+    words = sorted(set(w for t in terms for weight, w in t))
+    vectors = _lookup_words(model, words, request.json.get('oov', True))
+    values, missing = evaluate_expressions(
+        terms, [v.word for v in vectors],
+        numpy.array([v.values for v in vectors]),
+        request.json.get('normalize', True))
+    results = [{'missing': m} for m in missing]
+
+    if request.json.get('vectors', False):
+        for result, m, v in zip(results, missing, values.tolist()):
+            result['vector'] = None if m else v
+
+    k = _count(request.json.get('k', 10), 'k', 0)
+    valid = [i for i, m in enumerate(missing) if not m]
+
+    if k and valid:
+        searcher, options = _searcher(model,
+                                      request.json.get('exact', False),
+                                      request.json.get('nprobe'))
+        extra = max(len(t) for t in terms)
+        neighbors = _neighbors(searcher, options, values[valid], k + extra,
+                               request.json.get('metric', 'cosine'))
+
+        for i, n in zip(valid, neighbors):
+            inputs = set(w for weight, w in terms[i])
+            results[i]['neighbors'] = [
+                x for x in n if x['word'] not in inputs
+            ][:k]
+
+    return jsonify(results)
+
+
+def _oov_vectors(model, words):
+    """
+    Returns VectorRecords (without IDs) computed from the n-gram buckets
+    of the model for words it has no vectors for, if the buckets were
+    saved when the model was uploaded
+    """
+    if not words or not model.num_buckets:
+        return []
+
+    buckets = load_buckets(
+        model_buckets_path(config, model), model.min_ngram_len,
+        model.max_ngram_len)
+
+    if buckets is None:
+        return []
+
+    values, counts = buckets.word_vectors(words)
+    model_dict = model.to_dict()
+    return [
+        VectorRecord(None, w, model.id, v, model_dict,
+                     float(numpy.linalg.norm(v)))
+        for w, v, c in zip(words, values.astype(numpy.float64), counts) if c
+    ]
+
+
+def _lookup_words(model, words, oov=False, chunk_size=500):
+    """
+    Returns the VectorRecords of the words through the vector cache, in
+    chunks of chunk_size words per query, plus vectors computed from
+    n-grams for the missing words if oov is set
+    """
+    vectors = []
+
+    for start in range(0, len(words), chunk_size):
+        vectors.extend(
+            cached_vectors(request.session, model,
+                           words[start:start + chunk_size], vector_cache))
+
+    if oov:
+        found = set(v.word for v in vectors)
+        vectors.extend(
+            _oov_vectors(model,
+                         [w for w in set(words) if w not in found]))
+
+    return vectors
+
+
+@app.route('/api/model/<int:id>/embed', methods=['POST'])
+@api_auth
+def api_embed_documents(id):
+    """
+    Pools the word vectors of a batch of tokenized documents into one
+    vector per document (see pool_documents); each distinct token of the
+    batch is looked up once. Returns a little-endian float32 matrix with
+    its shape in the X-Fasttextdb-Shape header, or JSON with the number
+    of tokens used per document if format is json.
+    """
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    documents = request.json.get('documents', [])
+    words = sorted(set(t for d in documents for t in d))
+    vectors = _lookup_words(model, words, request.json.get('oov', True))
+    values = numpy.array([v.values for v in vectors]).reshape(
+        (len(vectors), model.dim or 0))
+
+    try:
+        pooled, counts = pool_documents(
+            documents, [v.word for v in vectors], values,
+            request.json.get('weighting', 'mean'),
+            request.json.get('weights'), request.json.get('normalize', False))
+    except ValueError as e:
+        raise BadRequestException(str(e))
+
+    if request.json.get('format') == 'json':
+        return jsonify(vectors=pooled.tolist(), counts=counts.tolist())
+
+    return Response(
+        pooled.astype('<f4').tobytes(),
+        mimetype='application/octet-stream',
+        headers={'X-Fasttextdb-Shape': '%d,%d' % pooled.shape})
+
+
+def _word_matrix(vectors, words, dim):
+    """
+    Returns the (len(words), dim) array of the vectors of the words, with
+    NaN rows for the words that have none, and the list of those words
+    """
+    by_word = dict((v.word, v.values) for v in vectors)
+    values = numpy.full((len(words), dim), numpy.nan, dtype=numpy.float32)
+    missing = []
+
+    for i, w in enumerate(words):
+        if w in by_word:
+            values[i] = by_word[w]
+        else:
+            missing.append(w)
+
+    return values, missing
+
+
+@app.route('/api/model/<int:id>/similarity', methods=['POST'])
+@api_auth
+def api_pairwise_similarity(id):
+    """
+    Cosine similarities between each word of the list a and each word
+    of the list b. Returns the dense matrix as little-endian float32
+    (NaN for missing words) with its shape in X-Fasttextdb-Shape, or,
+    given a threshold, only the entries at or above it, as records of
+    (row int32, col int32, score float32). format json returns JSON
+    instead, with the missing words.
+    """
+    model = request.session.query(Model).get(id)
+
+    if not model:
+        raise NotFoundException('Model with ID %s was not found' % id)
+
+    a = request.json.get('a', [])
+    b = request.json.get('b', [])
+    threshold = request.json.get('threshold')
+    vectors = _lookup_words(model, sorted(set(a) | set(b)),
+                            request.json.get('oov', True))
+    a_values, a_missing = _word_matrix(vectors, a, model.dim or 0)
+    b_values, b_missing = _word_matrix(vectors, b, model.dim or 0)
+    a_nan = numpy.isnan(a_values).any(axis=1)
+    b_nan = numpy.isnan(b_values).any(axis=1)
+    result = pairwise_similarities(
+        numpy.nan_to_num(a_values), numpy.nan_to_num(b_values), threshold)
+    shape = '%d,%d' % (len(a), len(b))
+
+    # the zero vectors of missing words are scored as well, drop them
+    if threshold is None:
+        result[a_nan] = numpy.nan
+        result[:, b_nan] = numpy.nan
+    else:
+        keep = ~a_nan[result[0]] & ~b_nan[result[1]]
+        result = [r[keep] for r in result]
+
+    if request.json.get('format') == 'json':
+        x = {'missing': {'a': a_missing, 'b': b_missing}}
+
+        if threshold is None:
+            x['matrix'] = [[None if s != s else s for s in row]
+                           for row in result.tolist()]
+        else:
+            x['rows'], x['cols'], x['scores'] = [r.tolist() for r in result]
+
+        return jsonify(x)
+
+    if threshold is None:
+        data = result.astype('<f4').tobytes()
+    else:
+        records = numpy.empty(
+            len(result[0]),
+            dtype=[('row', '<i4'), ('col', '<i4'), ('score', '<f4')])
+        records['row'], records['col'], records['score'] = result
+        data = records.tobytes()
+
+    return Response(
+        data,
+        mimetype='application/octet-stream',
+        headers={'X-Fasttextdb-Shape': shape})
+
+
+@app.route('/api/cache/stats')
+@api_auth
+def api_cache_stats():
+    return jsonify(vector_cache.stats())
 
 
 @app.route('/api/model/<int:id>/upload/vectors', methods=['POST'])
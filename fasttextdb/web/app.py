@@ -1,13 +1,17 @@
 import logging
 import os
+import threading
 import re
 import csv
 import magic
 import bz2
+import base64
 import gzip
 import json
 import flask_login
 
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import Flask
 from flask import request
 from flask import render_template
@@ -27,6 +31,10 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql.expression import asc, desc
 
 from ..vectors import *
+from ..cache import *
+from ..search import *
+from ..ann import *
+from ..vocabulary import *
 from ..config import *
 from ..models import *
 from ..util import *
@@ -39,6 +47,14 @@ config = load_config()
 engine = get_engine(config)
 Session = sessionmaker(bind=engine)
 
+# per process; the ttl bounds how stale other processes' caches can get
+vector_cache = VectorCache(config['cache']['max_bytes'],
+                           config['cache']['ttl'])
+
+# batch lookups run their chunks on these threads, each with a pooled
+# connection of its own
+lookup_executor = ThreadPoolExecutor(config['lookup']['workers'])
+
 app = Flask(__name__)
 app.secret_key = config['secret']
 
@@ -61,12 +77,127 @@ def run_app():
     app.run(host=config['host'], port=config['port'], debug=config['debug'])
 
 
-def page_request(query):
+def vector_codec(model):
+    """
+    Returns the (encoding, compression) for new vectors of a model: the
+    codec recorded for the model, or the one from the configuration
+    """
+    return model.codec(ENCODINGS[config['vectors']['encoding']],
+                       COMPRESSIONS[config['vectors']['compression']])
+
+
+def encode_cursor(key):
+    """
+    Returns an opaque continuation token for the key of the last item
+    of a page
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise BadRequestException('invalid cursor %s' % cursor)
+
+
+def _request_after():
+    """
+    Returns the key to page after, from the cursor or after parameter
+    """
+    cursor = get_param('cursor')
+
+    if cursor:
+        return decode_cursor(cursor)
+
+    return get_param('after')
+
+
+def page_request(query, key=None):
+    """
+    Pages a query (or select) by page and page_size, or, if the query is
+    ordered by the key column and the request gives an after key or
+    cursor, by the rows after it (keyset pagination), which does not
+    slow down with the depth of the page
+    """
+    after = request.paging['after']
+
+    if key is not None and after is not None:
+        try:
+            after = key.type.python_type(after)
+        except (TypeError, ValueError):
+            raise BadRequestException('invalid after key %s' % after)
+
+        if hasattr(query, 'filter'):
+            query = query.filter(key > after)
+        else:
+            query = query.where(key > after)
+
+        return query.limit(request.paging['page_size'])
+
     return query.offset(
         request.paging['page'] *
         request.paging['page_size']).limit(request.paging['page_size'])
 
 
+def page_list(items, key=None):
+    """
+    Pages a list sorted by key (a function) like page_request
+    """
+    after = request.paging['after']
+
+    if key is not None and after is not None:
+        items = [i for i in items if key(i) > after]
+        return items[:request.paging['page_size']]
+
+    start = request.paging['page'] * request.paging['page_size']
+    return items[start:start + request.paging['page_size']]
+
+
+def with_cursor(response, keys):
+    """
+    Sets the X-Fasttextdb-Cursor header of the response to the cursor
+    of the next page, if the keys of this page fill it
+    """
+    if len(keys) and len(keys) >= request.paging['page_size']:
+        response.headers['X-Fasttextdb-Cursor'] = encode_cursor(keys[-1])
+
+    return response
+
+
+_index_update_lock = threading.Lock()
+
+
+def _update_index(model_id):
+    session = Session()
+
+    try:
+        with _index_update_lock:
+            model = session.query(Model).get(model_id)
+            update_index(session, model, model_index_path(config, model))
+    except Exception as e:
+        logging.error(e, exc_info=True)
+    finally:
+        session.close()
+
+
+def invalidate_vectors(model):
+    """
+    Drops the cached vectors and the in-memory matrix and vocabulary of a
+    model after vectors were added to it, and adds the new vectors to the model's
+    ANN index (if it has one) in the background
+    """
+    vector_cache.invalidate(model.id)
+    drop_model_matrix(model.id)
+    drop_model_vocabulary(model.id)
+
+    if config['index']['auto_update'] and os.path.isdir(
+            model_index_path(config, model)):
+        threading.Thread(target=_update_index, args=(model.id, )).start()
+
+
 def get_param(param, default=None, type_=None):
     camel = under_to_camel(param)
     search = [param, camel, camel.lower(), camel.upper(), param.upper]
@@ -131,7 +262,8 @@ def prepare_request():
 
     request.paging = {
         'page': get_param('page', 0, int),
-        'page_size': get_param('page_size', 25, int)
+        'page_size': get_param('page_size', 25, int),
+        'after': _request_after()
     }
 
     request.words = get_param_list('word')
@@ -20,11 +20,13 @@ from flask_login import login_required, logout_user
 
 from sqlalchemy import Integer, Float
 
-from .app import app, page_request, engine
+from .app import app, page_request, engine, config, vector_codec
+from .app import invalidate_vectors
 from ..models import *
 from ..exceptions import *
 from ..util import *
 from ..vectors import *
+from ..subwords import *
 
 
 def templ(template, **kwargs):
@@ -267,6 +269,7 @@ def upload_vectors_for_model(model):
         f = file.stream
 
     cnt = 0
+    encoding, compression = vector_codec(model)
 
     for vector in commit_file(
             f,
@@ -274,9 +277,14 @@ def upload_vectors_for_model(model):
             name="foo",
             description="test model",
             model=model,
-            session=request.session):
+            session=request.session,
+            encoding=encoding,
+            compression=compression,
+            bulk=True,
+            buckets_path=model_buckets_path(config, model)):
         cnt += 1
 
+    invalidate_vectors(model)
     return cnt
 
 
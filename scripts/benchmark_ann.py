@@ -0,0 +1,55 @@
+import time
+import numpy
+
+from fasttextdb import get_parser, IVFIndex, ModelMatrix
+
+parser = get_parser('compare recall@k and latency of the ANN index')
+
+parser.add_argument(
+    '--vectors', type=int, default=200000, help='number of vectors')
+parser.add_argument('--dim', type=int, default=300, help='vector length')
+parser.add_argument(
+    '--clusters',
+    type=int,
+    default=2000,
+    help='clusters in the generated data')
+parser.add_argument('--queries', type=int, default=200, help='queries')
+parser.add_argument('-k', type=int, default=10, help='neighbours per query')
+parser.add_argument('--nlist', type=int, help='index clusters')
+
+args = parser.parse_args()
+random = numpy.random.RandomState(0)
+centers = random.randn(args.clusters, args.dim)
+values = numpy.empty((args.vectors, args.dim), dtype=numpy.float32)
+
+# clustered data, as word vectors are, rather than uniform noise
+for start in range(0, args.vectors, 100000):
+    n = min(100000, args.vectors - start)
+    values[start:start + n] = centers[random.randint(
+        0, args.clusters, n)] + random.randn(n, args.dim)
+
+words = ['w%d' % i for i in range(args.vectors)]
+matrix = ModelMatrix(words, values)
+start = time.time()
+index = IVFIndex.train(matrix.matrix, args.nlist)
+index.add(range(args.vectors), words, values)
+print('built %d clusters in %.1fs' % (len(index.centroids),
+                                      time.time() - start))
+
+queries = values[random.choice(args.vectors, args.queries)]
+start = time.time()
+exact = matrix.search(queries, args.k)
+print('exact: %.2f ms per query' %
+      ((time.time() - start) * 1e3 / args.queries))
+
+for nprobe in [1, 2, 4, 8, 16, 32, 64]:
+    start = time.time()
+    approximate = index.search(queries, args.k, nprobe=nprobe)
+    elapsed = (time.time() - start) * 1e3 / args.queries
+    recall = numpy.mean([
+        len(set(words[r] for r, s in e) & set(index.words[r]
+                                              for r, s in a)) / float(args.k)
+        for e, a in zip(exact, approximate)
+    ])
+    print('nprobe=%d: recall@%d %.3f, %.2f ms per query' %
+          (nprobe, args.k, recall, elapsed))
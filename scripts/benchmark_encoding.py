@@ -0,0 +1,30 @@
+import time
+import numpy
+
+from fasttextdb import get_parser, pack_values, unpack_array
+from fasttextdb import ENCODINGS, COMPRESSIONS
+
+parser = get_parser('compare blob size and decode time of vector encodings')
+
+parser.add_argument(
+    '--vectors', type=int, default=2000, help='number of vectors to pack')
+parser.add_argument('--dim', type=int, default=300, help='vector length')
+
+args = parser.parse_args()
+values = numpy.random.randn(args.vectors, args.dim).round(5)
+
+for encoding in ['json', 'float32', 'float16']:
+    for compression in ['none', 'zlib', 'bz2']:
+        packed = [
+            pack_values(v, ENCODINGS[encoding], COMPRESSIONS[compression])
+            for v in values
+        ]
+        size = sum(len(p) for p, ec in packed) / float(len(packed))
+        start = time.time()
+
+        for p, ec in packed:
+            unpack_array(p, ec)
+
+        elapsed = (time.time() - start) / len(packed)
+        print('%-8s %-5s %8.0f bytes %8.1f us' % (encoding, compression, size,
+                                                  elapsed * 1e6))
@@ -0,0 +1,61 @@
+import time
+import numpy
+
+from io import BytesIO
+from fasttextdb import get_parser, load_config, get_engine, Base, commit_file
+from fasttextdb import ZLIB_COMPRESSION, BZ2_COMPRESSION
+
+parser = get_parser('compare rows per second of the vector ingest paths')
+
+parser.add_argument(
+    '--words', type=int, default=20000, help='number of words to generate')
+parser.add_argument('--dim', type=int, default=300, help='vector length')
+parser.add_argument(
+    '--batch-size', type=int, default=1000, help='rows per bulk insert')
+parser.add_argument(
+    '--workers', type=int, default=4, help='processes for the pipeline')
+parser.add_argument(
+    '--compression',
+    choices=['zlib', 'bz2'],
+    default='bz2',
+    help='compression for packed values')
+
+args = parser.parse_args()
+config = load_config(args=args)
+engine = get_engine(config)
+compression = {'zlib': ZLIB_COMPRESSION, 'bz2': BZ2_COMPRESSION}
+compression = compression[args.compression]
+Base.metadata.create_all(engine)
+
+
+def vec_file(prefix):
+    values = numpy.random.randn(args.words, args.dim).round(5)
+    lines = [b'%d %d\n' % values.shape]
+
+    for i, row in enumerate(values):
+        lines.append(b'%s_%d ' % (prefix, i) + b' '.join(
+            b'%.5f' % x for x in row) + b'\n')
+
+    return BytesIO(b''.join(lines))
+
+
+runs = [('orm', {}), ('bulk', {
+    'bulk': True,
+    'batch_size': args.batch_size
+}), ('pipeline', {
+    'workers': args.workers,
+    'batch_size': args.batch_size
+})]
+
+for name, options in runs:
+    file_ = vec_file(name.encode('ascii'))
+    start = time.time()
+    count = sum(1 for v in commit_file(
+        file_,
+        engine=engine,
+        compression=compression,
+        name='benchmark %s' % name,
+        **options))
+    elapsed = time.time() - start
+    print('%s: %d rows in %.2fs, %.0f rows/s' % (name, count, elapsed,
+                                                 count / elapsed))
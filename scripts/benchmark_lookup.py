@@ -0,0 +1,62 @@
+import time
+import random
+
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Base, Model, Vector
+from fasttextdb import word_hash
+
+parser = get_parser('compare word lookup latency with and without word hashes')
+
+parser.add_argument(
+    '--rows', type=int, default=10000000, help='vector rows to generate')
+parser.add_argument(
+    '--models', type=int, default=10, help='models to spread rows over')
+parser.add_argument(
+    '--lookups', type=int, default=2000, help='number of lookups to time')
+parser.add_argument(
+    '--skip-load', action='store_true', help='reuse previously loaded rows')
+
+args = parser.parse_args()
+config = load_config(args=args)
+engine = get_engine(config)
+Base.metadata.create_all(engine)
+session = sessionmaker(bind=engine)()
+per_model = args.rows // args.models
+
+
+def make_word(i):
+    # long words with non-ASCII characters, as found in crawl models
+    return u'wörterbuch_%d_%s' % (i, u'é' * (i % 40))
+
+
+if not args.skip_load:
+    for m in range(args.models):
+        model = Model(name='lookup benchmark %s' % m)
+        session.add(model)
+        session.commit()
+
+        for start in range(0, per_model, 100000):
+            session.execute(Vector.__table__.insert(), [{
+                'word': make_word(i),
+                'word_hash': word_hash(make_word(i)),
+                'packed_values': b'',
+                'model_id': model.id,
+                'encoding_compression': 0
+            } for i in range(start, min(start + 100000, per_model))])
+            session.commit()
+
+models = list(
+    session.query(Model).filter(Model.name.like('lookup benchmark %')))
+lookups = [(random.choice(models), make_word(random.randrange(per_model)))
+           for i in range(args.lookups)]
+
+for by_hash in [False, True]:
+    start = time.time()
+
+    for model, word in lookups:
+        assert len(list(
+            Vector.vectors_for_word(session, word, model, by_hash))) == 1
+
+    elapsed = time.time() - start
+    print('by_hash=%s: %.1f us per lookup' % (by_hash,
+                                             elapsed * 1e6 / len(lookups)))
@@ -0,0 +1,84 @@
+import time
+import numpy
+
+from io import BytesIO
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Base, Model
+from fasttextdb import Vector
+from fasttextdb import commit_file, select_vectors, read_vectors
+from fasttextdb import ENCODINGS, COMPRESSIONS
+
+parser = get_parser('compare the ORM and Core read paths for word lookups')
+
+parser.add_argument(
+    '--words', type=int, default=20000, help='number of words to generate')
+parser.add_argument('--dim', type=int, default=300, help='vector length')
+parser.add_argument(
+    '--lookup-size', type=int, default=500, help='words per lookup')
+parser.add_argument(
+    '--lookups', type=int, default=20, help='number of lookups to time')
+parser.add_argument(
+    '--encoding', choices=list(ENCODINGS), default='float32')
+parser.add_argument(
+    '--compression', choices=list(COMPRESSIONS), default='none')
+
+args = parser.parse_args()
+config = load_config(args=args)
+engine = get_engine(config)
+Base.metadata.create_all(engine)
+Session = sessionmaker(bind=engine)
+session = Session()
+values = numpy.random.randn(args.words, args.dim).round(5)
+lines = [b'%d %d\n' % values.shape]
+
+for i, row in enumerate(values):
+    lines.append(b'read_%d ' % i + b' '.join(b'%.5f' % x for x in row) + b'\n')
+
+model = Model(name='read benchmark')
+session.add(model)
+session.commit()
+
+for row in commit_file(
+        BytesIO(b''.join(lines)),
+        engine,
+        Session,
+        session,
+        encoding=ENCODINGS[args.encoding],
+        compression=COMPRESSIONS[args.compression],
+        model=model,
+        bulk=True):
+    pass
+
+lookups = [[
+    'read_%d' % i
+    for i in numpy.random.choice(args.words, args.lookup_size, replace=False)
+] for j in range(args.lookups)]
+
+
+def orm(session, model, words):
+    return [
+        v.to_dict(include_model=True)
+        for v in Vector.vectors_for_words(session, words, model)
+    ]
+
+
+def core(session, model, words):
+    return [
+        v.to_dict(include_model=True)
+        for v in read_vectors(session, select_vectors(model, words), model)
+    ]
+
+
+for name, read in [('orm', orm), ('core', core)]:
+    start = time.time()
+
+    for words in lookups:
+        # a new session per lookup, as for a web request
+        s = Session()
+        assert len(read(s, s.query(Model).get(model.id),
+                        words)) == args.lookup_size
+        s.close()
+
+    elapsed = time.time() - start
+    print('%s: %.1f ms per lookup of %d words' %
+          (name, elapsed * 1e3 / len(lookups), args.lookup_size))
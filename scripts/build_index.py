@@ -0,0 +1,41 @@
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Model
+from fasttextdb import build_index, update_index, model_index_path
+
+parser = get_parser('build or update the ANN index of a model')
+
+parser.add_argument('--model-id', type=int, help='model ID')
+parser.add_argument(
+    '--nlist', type=int, help='number of clusters (default sqrt(vectors))')
+parser.add_argument(
+    '--iterations', type=int, default=10, help='k-means iterations')
+parser.add_argument(
+    '--sample-size', type=int, help='vectors to train the clusters on')
+parser.add_argument(
+    '--update',
+    action='store_true',
+    help='only add the vectors created since the index was built')
+
+args = parser.parse_args()
+config = load_config(args=args)
+session = sessionmaker(bind=get_engine(config))()
+model = session.query(Model).get(args.model_id)
+
+if not model:
+    raise Exception('Could not find a model with ID %s' % args.model_id)
+
+path = model_index_path(config, model)
+
+if args.update:
+    count = update_index(session, model, path)
+    print('added %s vectors to %s' % (count, path))
+else:
+    index = build_index(
+        session,
+        model,
+        path,
+        nlist=args.nlist,
+        iterations=args.iterations,
+        sample_size=args.sample_size)
+    print('indexed %s vectors in %s clusters at %s' %
+          (len(index), len(index.centroids), path))
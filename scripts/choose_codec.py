@@ -0,0 +1,40 @@
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Model, choose_codec
+from fasttextdb import DEFAULT_TIME_WEIGHT
+
+parser = get_parser('pick the vector codec for a model from a sample')
+
+parser.add_argument('--model-id', type=int, help='model ID')
+parser.add_argument(
+    '--sample-size', type=int, default=1000, help='vectors to sample')
+parser.add_argument(
+    '--time-weight',
+    type=float,
+    default=DEFAULT_TIME_WEIGHT,
+    help='bytes of blob size worth one microsecond of decoding')
+parser.add_argument(
+    '--encoding',
+    action='append',
+    help='encoding to consider (default: json and float32)')
+
+args = parser.parse_args()
+config = load_config(args=args)
+session = sessionmaker(bind=get_engine(config))()
+model = session.query(Model).get(args.model_id)
+
+if not model:
+    raise Exception('Could not find a model with ID %s' % args.model_id)
+
+best, results = choose_codec(
+    session,
+    model,
+    sample_size=args.sample_size,
+    time_weight=args.time_weight,
+    encodings=args.encoding or ('json', 'float32'))
+
+for r in sorted(results, key=lambda r: r['cost']):
+    print('%-8s %-9s %8.0f bytes %8.1f us' %
+          (r['encoding'], r['compression'], r['size'], r['decodeTime']))
+
+print('chose %s/%s for model %s' % (best['encoding'], best['compression'],
+                                    model.id))
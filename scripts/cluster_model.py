@@ -0,0 +1,40 @@
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Model
+from fasttextdb import cluster_model
+
+parser = get_parser('cluster the vectors of a model with k-means')
+
+parser.add_argument('--model-id', type=int, help='model ID')
+parser.add_argument('--clusters', type=int, help='number of clusters')
+parser.add_argument(
+    '--epochs', type=int, default=3, help='passes over the vectors')
+parser.add_argument(
+    '--batch-size', type=int, default=4096, help='vectors per k-means step')
+parser.add_argument(
+    '--chunk-size',
+    type=int,
+    default=50000,
+    help='vectors read from the database at a time')
+parser.add_argument(
+    '--no-normalize',
+    action='store_true',
+    help='cluster the raw vectors instead of unit length ones')
+
+args = parser.parse_args()
+config = load_config(args=args)
+session = sessionmaker(bind=get_engine(config))()
+model = session.query(Model).get(args.model_id)
+
+if not model:
+    raise Exception('Could not find a model with ID %s' % args.model_id)
+
+clustering = cluster_model(
+    session,
+    model,
+    args.clusters,
+    epochs=args.epochs,
+    batch_size=args.batch_size,
+    chunk_size=args.chunk_size,
+    normalize=not args.no_normalize)
+print('saved clustering %s of model %s into %s clusters' %
+      (clustering.id, model.id, clustering.num_clusters))
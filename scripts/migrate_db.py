@@ -0,0 +1,7 @@
+from fasttextdb import get_parser, load_config, get_engine, migrate
+
+parser = get_parser('update the tables of an existing database')
+
+args = parser.parse_args()
+config = load_config(args=args)
+migrate(get_engine(config))
@@ -0,0 +1,40 @@
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Model
+from fasttextdb import project_model, PROJECTIONS, ENCODINGS, COMPRESSIONS
+
+parser = get_parser('derive a lower-dimensional model from a model')
+
+parser.add_argument('--model-id', type=int, help='model ID')
+parser.add_argument('--dim', type=int, help='dimensions of the new model')
+parser.add_argument(
+    '--method', choices=PROJECTIONS, default='pca', help='projection')
+parser.add_argument('--name', help='name of the new model')
+parser.add_argument(
+    '--encoding',
+    choices=sorted(ENCODINGS),
+    default='float32',
+    help='encoding of the new vectors')
+parser.add_argument(
+    '--compression',
+    choices=sorted(COMPRESSIONS),
+    default='none',
+    help='compression of the new vectors')
+
+args = parser.parse_args()
+config = load_config(args=args)
+session = sessionmaker(bind=get_engine(config))()
+model = session.query(Model).get(args.model_id)
+
+if not model:
+    raise Exception('Could not find a model with ID %s' % args.model_id)
+
+derived = project_model(
+    session,
+    model,
+    args.dim,
+    method=args.method,
+    name=args.name,
+    encoding=ENCODINGS[args.encoding],
+    compression=COMPRESSIONS[args.compression])
+print('created model %s (%s dimensions) from model %s' %
+      (derived.id, derived.dim, model.id))
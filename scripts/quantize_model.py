@@ -0,0 +1,39 @@
+from sqlalchemy.orm import sessionmaker
+from fasttextdb import get_parser, load_config, get_engine, Model
+from fasttextdb import quantize_model, ENCODINGS, COMPRESSIONS
+
+parser = get_parser('re-pack the vectors of a model with a quantized encoding')
+
+parser.add_argument('--model-id', type=int, help='model ID')
+parser.add_argument(
+    '--encoding',
+    choices=['int8', 'int8-model', 'pq'],
+    default='pq',
+    help='quantized encoding')
+parser.add_argument(
+    '--compression', default='none', help='compression for the codes')
+parser.add_argument(
+    '--sample-size',
+    type=int,
+    default=10000,
+    help='vectors to train the quantizer on')
+parser.add_argument(
+    '--subspaces', type=int, help='number of product quantizer subspaces')
+
+args = parser.parse_args()
+config = load_config(args=args)
+session = sessionmaker(bind=get_engine(config))()
+model = session.query(Model).get(args.model_id)
+
+if not model:
+    raise Exception('Could not find a model with ID %s' % args.model_id)
+
+count = quantize_model(
+    session,
+    model,
+    encoding=ENCODINGS[args.encoding],
+    compression=COMPRESSIONS[args.compression],
+    sample_size=args.sample_size,
+    num_subspaces=args.subspaces)
+
+print('re-packed %s vectors of model %s' % (count, model.id))
@@ -1,7 +1,7 @@
 import requests
 
 from argparse import FileType
-from fasttextdb import get_parser, load_config, FasttextApi, open_for_mime_type, model_from_file, vectors, read_file
+from fasttextdb import get_parser, load_config, FasttextApi, open_for_mime_type, model_blocks_from_file
 
 parser = get_parser('upload a vectors file to the web API')
 
@@ -9,25 +9,35 @@ parser.add_argument('--upload', help='path to vectors file for uploading')
 parser.add_argument('--model-name', help='model name')
 parser.add_argument('--model-id', help='model ID')
 parser.add_argument('--json', action='store_true', help='send vectors as JSON')
+parser.add_argument(
+    '--stream',
+    choices=['binary', 'ndjson'],
+    help='stream the vectors to the model (by ID) in one request')
 
 args = parser.parse_args()
 config = load_config(args=args)
 api = FasttextApi(config=config)
 
 with open(args.upload, 'rb') as file:
-    if args.json:
+    if args.stream:
         file = open_for_mime_type(file)
 
-        with model_from_file(file) as (m, file1):
+        with model_blocks_from_file(file) as (m, blocks):
+            print(api.stream_vectors(blocks, args.model_id, args.stream))
+    elif args.json:
+        file = open_for_mime_type(file)
+
+        with model_blocks_from_file(file) as (m, blocks):
             buff = []
 
-            for word, values in read_file(file1):
-                buff.append({'word': word, 'values': values})
+            for words, values in blocks:
+                for word, vector in zip(words, values.tolist()):
+                    buff.append({'word': word, 'values': vector})
 
-                if len(buff) >= 1000:
-                    print(api.create_vectors(
-                        buff, id=args.model_id, name=args.model_name))
-                    buff = []
+                    if len(buff) >= 1000:
+                        print(api.create_vectors(
+                            buff, id=args.model_id, name=args.model_name))
+                        buff = []
 
             if len(buff) > 0:
                 print(api.create_vectors(
@@ -0,0 +1,127 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy
+import pytest
+
+from passlib.hash import sha256_crypt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+USERNAME = 'test'
+PASSWORD = 'test'
+AUTH = {'X-Fasttextdb-Username': USERNAME, 'X-Fasttextdb-Password': PASSWORD}
+HEADERS = dict(AUTH, Accept='application/json')
+
+# fasttextdb.config reads FASTTEXTDB_CONFIG when it is imported, and the
+# web application loads its configuration when it is, so the test
+# configuration has to be in place before any test module imports them
+_web_dir = tempfile.mkdtemp(prefix='fasttextdb-test-')
+
+with open(os.path.join(_web_dir, 'fasttextdb.yml'), 'w') as f:
+    f.write('\n'.join([
+        'secret: test',
+        'db:',
+        '  url: sqlite:///%s' % os.path.join(_web_dir, 'fasttext.db'),
+        'index:',
+        '  path: %s' % os.path.join(_web_dir, 'indexes'),
+        'users:',
+        '  %s:' % USERNAME,
+        "    password_hash: '%s'" %
+        sha256_crypt.using(rounds=1000).hash(PASSWORD),
+        ''
+    ]))
+
+os.environ['FASTTEXTDB_CONFIG'] = os.path.join(_web_dir, 'fasttextdb.yml')
+
+
+@pytest.fixture(scope='session')
+def web():
+    """
+    The web application with a fresh SQLite database and a test user,
+    and its Session factory
+    """
+    from fasttextdb.models import Base
+    from fasttextdb.web import app
+    from fasttextdb.web.app import engine, Session
+
+    Base.metadata.create_all(engine)
+    return app, Session
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_web_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def session(tmp_path):
+    """
+    A session on a fresh SQLite database
+    """
+    engine = create_engine('sqlite:///%s' % (tmp_path / 'fasttext.db'))
+
+    from fasttextdb.models import Base
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def random_vectors(n, dim=8, seed=0):
+    """
+    Returns n words and their (n, dim) random float32 values
+    """
+    return (['w%03d' % i for i in range(n)],
+            numpy.random.RandomState(seed).randn(n, dim).astype(
+                numpy.float32))
+
+
+def create_model(session, words, values, name='test', **codec):
+    """
+    Creates a model with the vectors of words, bulk inserted with
+    commit_blocks (codec holds its encoding and compression)
+    """
+    from fasttextdb.models import Model
+    from fasttextdb.vectors import commit_blocks
+
+    model = Model(name=name, dim=values.shape[1])
+    session.add(model)
+    session.commit()
+    list(commit_blocks([(words, values)], model, session=session, **codec))
+    return model
+
+
+@pytest.fixture(scope='session')
+def client(web):
+    """
+    A test client of the web application
+    """
+    return web[0].test_client()
+
+
+def web_model(web, name, words, values, **codec):
+    """
+    Creates a model in the web application's database (see
+    create_model) and returns its ID
+    """
+    session = web[1]()
+
+    try:
+        return create_model(session, words, values, name, **codec).id
+    finally:
+        session.close()
+
+
+def get(client, url, **kwargs):
+    return client.get(url, headers=HEADERS, **kwargs)
+
+
+def post(client, url, data, **kwargs):
+    return client.post(url,
+                       headers=HEADERS,
+                       data=json.dumps(data),
+                       content_type='application/json',
+                       **kwargs)
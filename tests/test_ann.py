@@ -0,0 +1,117 @@
+import os
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.search import ModelMatrix
+from fasttextdb.ann import *
+from fasttextdb.vectors import commit_blocks
+
+from .conftest import random_vectors, create_model, web_model, get, post
+
+
+def _clustered(n=2000, dim=16, seed=0):
+    random = numpy.random.RandomState(seed)
+    centers = random.randn(20, dim)
+    values = centers[random.randint(0, 20, n)] + 0.3 * random.randn(n, dim)
+    return ['w%04d' % i for i in range(n)], values.astype(numpy.float32)
+
+
+def _index(words, values, nlist=None):
+    index = IVFIndex.train(ModelMatrix(words, values).matrix, nlist)
+    return index.add(range(len(words)), words, values)
+
+
+def test_search_recall():
+    words, values = _clustered()
+    exact = ModelMatrix(words, values)
+    index = _index(words, values)
+    queries = values[:50] + 0.05
+
+    recall = numpy.mean([
+        len(set(exact.words[r] for r, s in e) &
+            set(index.words[r] for r, s in a)) / 10.0
+        for e, a in zip(exact.search(queries, 10),
+                        index.search(queries, 10, nprobe=8))
+    ])
+    assert recall > 0.9
+
+    # probing every cluster is exact
+    everything = index.search(queries, 10, nprobe=len(index.centroids))
+    for e, a in zip(exact.search(queries, 10), everything):
+        assert [exact.words[r] for r, s in e] == \
+            [index.words[r] for r, s in a]
+
+
+@pytest.mark.parametrize('nprobe', [-1, 0, 10**6])
+def test_search_clamps_nprobe(nprobe):
+    words, values = _clustered(200)
+    index = _index(words, values, 10)
+
+    assert [len(r) for r in index.search(values[:3], 5, nprobe=nprobe)] == \
+        [5, 5, 5]
+
+
+def test_save_load_and_update(session, tmp_path):
+    words, values = random_vectors(300, 8)
+    model = create_model(session, words[:200], values[:200],
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    path = str(tmp_path / 'index' / 'model-1')
+    build_index(session, model, path)
+    first = os.path.realpath(path)
+
+    assert os.path.islink(path)
+    assert len(load_index(path)) == 200
+
+    list(commit_blocks([(words[200:], values[200:])], model, session=session))
+    assert update_index(session, model, path) == 100
+    index = load_index(path)
+
+    assert os.path.realpath(path) != first
+    assert len(index) == 300
+    assert index.row('w250') is not None
+    assert numpy.allclose(index.vectors_for_rows([index.row('w250')])[0],
+                          values[250], atol=1e-5)
+    assert load_index(str(tmp_path / 'missing')) is None
+
+
+@pytest.fixture(scope='module')
+def indexed(web):
+    from fasttextdb.web.app import config
+
+    words, values = _clustered(500)
+    model_id = web_model(web, 'ann', words, values,
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    session = web[1]()
+    model = session.query(Model).get(model_id)
+    build_index(session, model, model_index_path(config, model), nlist=10)
+    session.close()
+    return model_id
+
+
+@pytest.mark.parametrize('nprobe', ['-1', '0', 'abc'])
+def test_invalid_nprobe(client, indexed, nprobe):
+    response = get(
+        client,
+        '/api/model/%s/neighbors/word/w0001?nprobe=%s' % (indexed, nprobe))
+    assert response.status_code == 400
+
+    response = post(client, '/api/model/%s/neighbors' % indexed, {
+        'vectors': [[0.0] * 16],
+        'nprobe': nprobe
+    })
+    assert response.status_code == 400
+
+
+def test_indexed_neighbors(client, indexed):
+    response = get(client,
+                   '/api/model/%s/neighbors/word/w0001?k=5&nprobe=10' %
+                   indexed)
+    exact = get(client,
+                '/api/model/%s/neighbors/word/w0001?k=5&exact=true' % indexed)
+
+    assert response.status_code == 200
+    assert [n['word'] for n in response.json] == \
+        [n['word'] for n in exact.json]
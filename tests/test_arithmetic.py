@@ -0,0 +1,105 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.arithmetic import *
+
+from .conftest import web_model, post
+
+
+@pytest.mark.parametrize('expression,terms', [
+    ('king - man + woman', [(1.0, 'king'), (-1.0, 'man'), (1.0, 'woman')]),
+    ('0.5 * paris + .5*berlin', [(0.5, 'paris'), (0.5, 'berlin')]),
+    ('-x', [(-1.0, 'x')]),
+    ('well-known - x-ray', [(1.0, 'well-known'), (-1.0, 'x-ray')]),
+])
+def test_parse_expression(expression, terms):
+    assert parse_expression(expression) == terms
+
+
+@pytest.mark.parametrize('expression', ['', '  ', 'king man', 'a + * b'])
+def test_parse_invalid_expression(expression):
+    with pytest.raises(ValueError):
+        parse_expression(expression)
+
+
+def test_expression_terms():
+    assert expression_terms(['a', 'b']) == [(0.5, 'a'), (0.5, 'b')]
+    assert expression_terms({'positive': ['a'], 'negative': ['b']}) == \
+        [(1.0, 'a'), (-1.0, 'b')]
+
+    for expression in [[], {}, 1]:
+        with pytest.raises(ValueError):
+            expression_terms(expression)
+
+
+def test_evaluate_expressions():
+    values = numpy.array([[2.0, 0.0], [0.0, 3.0], [1.0, 1.0]])
+    terms = [[(1.0, 'a'), (-1.0, 'b')], [(2.0, 'c')], [(1.0, 'missing')],
+             [(1.0, 'a'), (1.0, 'a')]]
+    results, missing = evaluate_expressions(terms, ['a', 'b', 'c'], values)
+
+    assert missing == [[], [], ['missing'], []]
+    assert numpy.allclose(results, [[1, -1], [2**0.5, 2**0.5], [0, 0],
+                                    [2, 0]])
+
+    results, missing = evaluate_expressions(terms[:1], ['a', 'b'],
+                                            values[:2], normalize=False)
+    assert numpy.allclose(results, [[2, -3]])
+
+
+@pytest.fixture(scope='module')
+def analogy_model(web):
+    words = ['apple', 'king', 'man', 'pear', 'queen', 'woman']
+    values = numpy.array([[0, 0, 1], [1, 1, 0], [0, 1, 0], [0.1, 0, 1],
+                          [1, -1, 0], [0, -1, 0]], dtype=numpy.float32)
+    return web_model(web, 'analogies', words, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION)
+
+
+def test_analogy(client, analogy_model):
+    response = post(
+        client, '/api/model/%s/arithmetic' % analogy_model, {
+            'expressions': [
+                'king - man + woman', {
+                    'positive': ['apple'],
+                    'negative': ['nope']
+                }
+            ],
+            'k': 2,
+            'exact': True,
+            'vectors': True
+        })
+
+    assert response.status_code == 200
+    analogy, missing = response.json
+    assert [n['word'] for n in analogy['neighbors']] == ['queen', 'pear']
+    assert analogy['missing'] == []
+    assert len(analogy['vector']) == 3
+    assert missing == {'missing': ['nope'], 'vector': None}
+
+
+def test_arithmetic_without_neighbors(client, analogy_model):
+    response = post(client, '/api/model/%s/arithmetic' % analogy_model, {
+        'expressions': [['king', 'queen']],
+        'k': 0
+    })
+
+    assert response.status_code == 200
+    assert response.json == [{'missing': []}]
+
+
+@pytest.mark.parametrize('data', [{
+    'expressions': ['']
+}, {
+    'expressions': ['king man']
+}, {
+    'expressions': [[]]
+}, {
+    'expressions': ['king'],
+    'k': -1
+}])
+def test_invalid_arithmetic(client, analogy_model, data):
+    response = post(client, '/api/model/%s/arithmetic' % analogy_model, data)
+    assert response.status_code == 400
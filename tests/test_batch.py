@@ -0,0 +1,98 @@
+import numpy
+import pytest
+
+from sqlalchemy.orm import sessionmaker
+
+from fasttextdb.models import *
+from fasttextdb.batch import *
+from fasttextdb.cache import VectorCache
+
+from fasttextdb.payloads import NPY_MIMETYPE, decode_npy
+
+from .conftest import AUTH, random_vectors, create_model, web_model, post
+
+
+@pytest.fixture
+def lookup_model(session):
+    words, values = random_vectors(50, 4)
+    model = create_model(session, words, values,
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    return (sessionmaker(bind=session.bind, expire_on_commit=False), model,
+            words, values)
+
+
+@pytest.mark.parametrize('chunk_size,workers', [(None, 1), (7, 1), (7, 3)])
+def test_lookup_matrix(lookup_model, chunk_size, workers):
+    Session, model, words, values = lookup_model
+    query = ['w010', 'nope', 'w049', 'w010'] + words[:20]
+    matrix, found = lookup_matrix(Session, model, query,
+                                  chunk_size=chunk_size, workers=workers)
+
+    assert matrix.shape == (24, 4)
+    assert list(found) == [True, False, True, True] + [True] * 20
+    assert numpy.isnan(matrix[1]).all()
+    assert numpy.array_equal(matrix[[0, 2, 3]], values[[10, 49, 10]])
+    assert numpy.array_equal(matrix[4:], values[:20])
+
+
+def test_lookup_matrix_with_cache(lookup_model):
+    Session, model, words, values = lookup_model
+    cache = VectorCache(1 << 20)
+    lookup_matrix(Session, model, words[:10], cache=cache, chunk_size=4)
+    matrix, found = lookup_matrix(Session, model, words[5:15], cache=cache,
+                                  chunk_size=4)
+
+    assert found.all()
+    assert numpy.array_equal(matrix, values[5:15])
+    assert cache.stats()['hits'] == 5
+
+
+def test_lookup_matrix_without_words(lookup_model):
+    Session, model, words, values = lookup_model
+    matrix, found = lookup_matrix(Session, model, [])
+
+    assert matrix.shape == (0, 4)
+    assert len(found) == 0
+
+
+def test_in_chunk_size():
+    assert in_chunk_size('sqlite') < 999
+    assert in_chunk_size('postgresql') > in_chunk_size('sqlite')
+    assert in_chunk_size('oracle') == 1000
+
+
+@pytest.fixture(scope='module')
+def batch_model(web):
+    words, values = random_vectors(30, 3, seed=2)
+    return web_model(web, 'batch', words, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION), words, values
+
+
+def test_batch_lookup(client, batch_model):
+    model_id, words, values = batch_model
+    url = '/api/model/%s/vectors/batch' % model_id
+
+    for data in [['w001', 'nope'], {'words': ['w001', 'nope']}]:
+        response = post(client, url, data)
+
+        assert response.status_code == 200
+        assert response.json['found'] == [True, False]
+        assert numpy.allclose(response.json['vectors'][0], values[1])
+        assert response.json['vectors'][1] is None
+
+    response = client.post(url, data=u'w002\nnope\nw003\n'.encode('utf-8'),
+                           content_type='text/plain',
+                           headers=dict(AUTH, Accept=NPY_MIMETYPE))
+    w, v = decode_npy(response.data)
+
+    assert w == ['w002', 'nope', 'w003']
+    assert numpy.array_equal(v[[0, 2]], values[[2, 3]])
+    assert numpy.isnan(v[1]).all()
+
+
+def test_batch_lookup_without_word_list(client, batch_model):
+    response = post(client, '/api/model/%s/vectors/batch' % batch_model[0],
+                    {'words': 'w001'})
+    assert response.status_code == 400
@@ -0,0 +1,115 @@
+import io
+import struct
+import numpy
+import pytest
+
+from fasttextdb.binary import *
+from fasttextdb.files import *
+from fasttextdb.subwords import word_ngrams
+
+
+def _fnv(ngram):
+    h = 2166136261
+
+    for b in bytearray(ngram):
+        h = ((h ^ (b if b < 128 else b | 0xFFFFFF00)) * 16777619) & 0xFFFFFFFF
+
+    return h
+
+
+def _fasttext_bin(words, matrix, minn=2, maxn=3, bucket=10, quant=False):
+    """
+    Returns a fastText .bin model of the words (followed by one label)
+    and the input matrix (words, then n-gram buckets)
+    """
+    x = [
+        struct.pack('<ii', FASTTEXT_MAGIC, 12),
+        struct.pack('<12id', matrix.shape[1], 5, 5, 1, 5, 1, 2, 1, bucket,
+                    minn, maxn, 100, 1e-4),
+        struct.pack('<iiiqq', len(words) + 1, len(words), 1, 100, -1)
+    ]
+
+    for word in words:
+        x.append(word.encode('utf-8') + b'\0' + struct.pack('<qb', 10, 0))
+
+    x.append(b'__label__x\0' + struct.pack('<qb', 1, 1))
+    x.append(struct.pack('<?', quant))
+    x.append(struct.pack('<qq', *matrix.shape))
+    x.append(matrix.astype('<f4').tobytes())
+    return io.BytesIO(b''.join(x))
+
+
+def test_read_fasttext_bin(tmp_path):
+    words = ['a', 'bc', u'd\xe9f']
+    matrix = numpy.random.RandomState(0).randn(13, 4).astype(numpy.float32)
+    buckets_path = str(tmp_path / 'buckets.npy')
+    file_ = _fasttext_bin(words, matrix)
+
+    assert get_model_format(file_) == FASTTEXT_FORMAT
+
+    with model_blocks(file_, buckets_path=buckets_path) as (info, blocks):
+        blocks = list(blocks)
+
+    assert info['num_words'] == 3
+    assert info['dim'] == 4
+    assert info['loss_function'] == 'ns'
+    assert (info['min_ngram_len'], info['max_ngram_len']) == (2, 3)
+    assert sum([b[0] for b in blocks], []) == words
+    values = numpy.concatenate([b[1] for b in blocks])
+
+    for i, word in enumerate(words):
+        rows = [i] + [
+            3 + _fnv(x) % 10 for x in word_ngrams(word, 2, 3)
+        ]
+        assert numpy.allclose(values[i], matrix[rows].mean(axis=0),
+                              atol=1e-6)
+
+    assert numpy.array_equal(numpy.load(buckets_path), matrix[3:])
+
+
+def test_quantized_fasttext_bin():
+    file_ = _fasttext_bin(['a'], numpy.zeros((11, 2)), quant=True)
+
+    with pytest.raises(Exception):
+        read_fasttext_header(file_)
+
+
+def _word2vec_bin(words, values):
+    x = [('%s %s\n' % values.shape).encode('utf-8')]
+
+    for word, v in zip(words, values):
+        x.append(word.encode('utf-8') + b' ' + v.astype('<f4').tobytes() +
+                 b'\n')
+
+    return io.BytesIO(b''.join(x))
+
+
+def test_read_word2vec_bin():
+    words = ['w%04d' % i for i in range(2500)]
+    values = numpy.random.RandomState(0).randn(2500, 5).astype(numpy.float32)
+    file_ = _word2vec_bin(words, values)
+
+    assert get_model_format(file_) == WORD2VEC_FORMAT
+
+    with model_blocks(file_) as (info, blocks):
+        blocks = list(blocks)
+
+    assert (info['num_words'], info['dim']) == (2500, 5)
+    assert [len(b[0]) for b in blocks] == [1000, 1000, 500]
+    assert sum([b[0] for b in blocks], []) == words
+    assert numpy.array_equal(numpy.concatenate([b[1] for b in blocks]),
+                             values)
+
+
+@pytest.mark.parametrize('head,word2vec', [
+    (b'2 3\na 0.1 0.2 0.3\nb 1 2 3\n', False),
+    (b'1 2\na 1.5 -2\n', False),
+    (b'2 3\na 0.1 0.2', False),
+    (b'not a header\n', False),
+    (b'1 1\na ' + struct.pack('<f', 1.0) + b'\n', True),
+    (b'1 2\na ' + struct.pack('<ff', 0.0, 0.0) + b'\n', True),
+])
+def test_is_word2vec_file(head, word2vec):
+    assert is_word2vec_file(head) == word2vec
+    assert get_model_format(io.BytesIO(head)) == \
+        (WORD2VEC_FORMAT if word2vec else TEXT_FORMAT)
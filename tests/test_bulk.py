@@ -0,0 +1,79 @@
+import io
+import numpy
+
+from fasttextdb.models import *
+from fasttextdb.lookup import read_matrix, select_vectors
+from fasttextdb.vectors import *
+from fasttextdb.vectors import _copy_line
+
+from .conftest import random_vectors
+
+
+def _text_file(words, values):
+    return io.BytesIO(b'%d %d\n' % values.shape + b''.join(
+        w.encode('utf-8') + b' ' + b' '.join(b'%.6f' % x for x in row) +
+        b'\n' for w, row in zip(words, values)))
+
+
+def _read_model(session, name):
+    model = session.query(Model).filter(Model.name == name).one()
+    words, values = read_matrix(session, select_vectors(model), model)
+    order = numpy.argsort(words)
+    return [words[i] for i in order], values[order]
+
+
+def test_bulk_and_orm_ingest_agree(session):
+    words, values = random_vectors(250)
+
+    rows = list(commit_file(_text_file(words, values), session=session,
+                            encoding=FLOAT32_ENCODING,
+                            compression=NO_COMPRESSION, bulk=True,
+                            batch_size=100, name='bulk'))
+    vectors = list(commit_file(_text_file(words, values), session=session,
+                               encoding=FLOAT32_ENCODING,
+                               compression=NO_COMPRESSION, name='orm'))
+
+    assert len(rows) == len(vectors) == 250
+    assert all(isinstance(r, dict) for r in rows)
+
+    bulk_words, bulk_values = _read_model(session, 'bulk')
+    orm_words, orm_values = _read_model(session, 'orm')
+
+    assert bulk_words == orm_words == words
+    assert numpy.array_equal(bulk_values, orm_values)
+    assert numpy.allclose(bulk_values, values, atol=1e-6)
+
+
+def test_bulk_commit_rows(session):
+    model = Model(name='rows', dim=2)
+    session.add(model)
+    session.commit()
+    rows = list(vector_rows([(['a', 'b', 'c'], numpy.eye(3, 2))], model.id,
+                            encoding=FLOAT32_ENCODING,
+                            compression=NO_COMPRESSION))
+
+    assert list(bulk_commit_rows(iter(rows), session=session,
+                                 batch_size=2)) == rows
+    assert Vector.count_vectors_for_model(session, model) == 3
+    assert [r['norm'] for r in rows] == [1.0, 1.0, 0.0]
+
+
+def test_copy_line_escapes():
+    line = _copy_line({
+        'word': u'a\tb\\c\nd',
+        'word_hash': None,
+        'packed_values': b'\x01\xff',
+        'model_id': 3,
+        'encoding_compression': 32,
+        'norm': None
+    })
+
+    assert line == u'a\\tb\\\\c\\nd\t\\N\t\\\\x01ff\t3\t32\t\\N\n'
+    assert _copy_line({
+        'word': u'x',
+        'word_hash': -5,
+        'packed_values': b'',
+        'model_id': 3,
+        'encoding_compression': 32,
+        'norm': 0.1
+    }).split(u'\t')[1:] == [u'-5', u'\\\\x', u'3', u'32', u'0.1\n']
@@ -0,0 +1,88 @@
+import numpy
+
+from fasttextdb.models import *
+from fasttextdb.lookup import VectorRecord
+from fasttextdb.cache import *
+
+from .conftest import random_vectors, create_model
+
+
+def _record(word, values):
+    return VectorRecord(1, word, 1, values)
+
+
+def test_put_copies_the_values():
+    matrix = numpy.array([[0.1, 0.2], [0.3, 0.4]])
+    record = _record('a', matrix[0])
+    cache = VectorCache()
+    cache.put(1, 'a', record)
+    cached = cache.get(1, ['a'])[0]['a']
+
+    # the caller's record is left alone, the cached one does not pin the
+    # matrix and keeps its dtype
+    assert record.values.base is matrix
+    assert cached.values.base is None
+    assert cached.values.dtype == numpy.float64
+    assert cached.values.tolist() == [0.1, 0.2]
+    assert not cached.values.flags.writeable
+
+
+def test_lru_eviction():
+    cache = VectorCache(max_bytes=3 * (200 + 4 + 8 * 10))
+
+    for word in 'abc':
+        cache.put(1, word, _record(word, numpy.zeros(10)))
+
+    cache.get(1, ['a'])
+    cache.put(1, 'd', _record('d', numpy.zeros(10)))
+    found, missing = cache.get(1, list('abcd'))
+
+    assert sorted(found) == ['a', 'c', 'd']
+    assert missing == ['b']
+    assert cache.size <= cache.max_bytes
+
+
+def test_ttl_and_invalidate():
+    cache = VectorCache(ttl=-1)
+    cache.put(1, 'a', None)
+    assert cache.get(1, ['a']) == ({}, ['a'])
+
+    cache = VectorCache()
+    cache.put(1, 'a', None)
+    cache.put(2, 'a', None)
+    cache.invalidate(1)
+    assert cache.get(1, ['a']) == ({}, ['a'])
+    assert cache.get(2, ['a']) == ({'a': None}, [])
+
+
+def test_cached_vectors(session):
+    words, values = random_vectors(20)
+    model = create_model(session, words, values,
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    cache = VectorCache()
+    first = cached_vectors(session, model, ['w001', 'nope', 'w005'], cache)
+    second = cached_vectors(session, model, ['w005', 'nope', 'w001'], cache)
+
+    assert [r.word for r in first] == ['w001', 'w005']
+    assert [r.word for r in second] == ['w005', 'w001']
+    assert numpy.array_equal(second[0].values, values[5])
+    assert cache.stats()['hits'] == 3
+    assert cache.stats()['misses'] == 3
+
+
+def test_put_after_invalidate_is_skipped():
+    cache = VectorCache()
+    generation = cache.generation(1)
+    # an upload invalidates the model while a request reads missing words
+    cache.invalidate(1)
+    cache.put(1, 'a', None, generation)
+    cache.put(2, 'a', None, cache.generation(2))
+
+    assert cache.get(1, ['a']) == ({}, ['a'])
+    assert cache.get(2, ['a']) == ({'a': None}, [])
+
+    generation = cache.generation(2)
+    cache.invalidate()
+    cache.put(2, 'b', None, generation)
+    assert cache.get(2, ['b']) == ({}, ['b'])
@@ -0,0 +1,132 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.clustering import *
+
+from .conftest import create_model, web_model, get
+
+
+def _blobs(n=600, dim=8, k=3, seed=0):
+    random = numpy.random.RandomState(seed)
+    centers = numpy.eye(dim)[:k] * 10
+    truth = random.randint(0, k, n)
+    values = centers[truth] + random.randn(n, dim)
+    return (['w%04d' % i for i in range(n)], values.astype(numpy.float32),
+            truth)
+
+
+def _agree(labels, truth):
+    """
+    Checks that labels split the vectors like truth, up to the numbering
+    of the clusters
+    """
+    pairs = set(zip(labels, truth))
+    return len(pairs) == len(set(labels)) == len(set(truth))
+
+
+@pytest.mark.parametrize('normalize', [True, False])
+def test_mini_batch_k_means(normalize):
+    words, values, truth = _blobs()
+    kmeans = MiniBatchKMeans(3, normalize)
+
+    for start in range(0, len(values), 50):
+        kmeans.partial_fit(values[start:start + 50])
+
+    labels, distances = kmeans.assign(values)
+
+    assert _agree(labels, truth)
+    assert kmeans.counts.sum() == len(values)
+    assert (distances >= 0).all()
+
+
+def test_flush_short_stream():
+    words, values, truth = _blobs(5, k=2)
+    kmeans = MiniBatchKMeans(2).partial_fit(values)
+
+    assert kmeans.centroids is None
+    assert kmeans.flush().centroids.shape == (2, 8)
+    assert MiniBatchKMeans(6).partial_fit(values).flush().centroids is None
+
+
+def test_cluster_model(session):
+    words, values, truth = _blobs()
+    model = create_model(session, words, values)
+    clustering = cluster_model(session, model, 3, batch_size=100,
+                               chunk_size=250)
+
+    assert latest_clustering(session, model).id == clustering.id
+    assert clustering.centroid_array().shape == (3, 8)
+
+    assignments = session.query(ClusterAssignment).filter(
+        ClusterAssignment.clustering_id == clustering.id).order_by(
+            ClusterAssignment.word).all()
+    assert [a.word for a in assignments] == words
+    assert _agree([a.cluster for a in assignments], truth)
+
+    assignment = cluster_of_word(session, clustering, 'w0000')
+    members = list(cluster_members(session, clustering, assignment.cluster))
+    distances = [m.distance for m in members]
+
+    assert 'w0000' in [m.word for m in members]
+    assert distances == sorted(distances)
+    assert count_cluster_members(session, clustering,
+                                 assignment.cluster) == len(members)
+    assert cluster_of_word(session, clustering, 'nope') is None
+
+    second = cluster_model(session, model, 2, epochs=1)
+    assert latest_clustering(session, model).id == second.id
+
+
+def test_cluster_model_with_too_few_vectors(session):
+    words, values, truth = _blobs(4)
+    model = create_model(session, words, values)
+
+    with pytest.raises(Exception):
+        cluster_model(session, model, 5)
+
+    assert latest_clustering(session, model) is None
+
+
+@pytest.fixture(scope='module')
+def clustered_model(web):
+    words, values, truth = _blobs(90)
+    model_id = web_model(web, 'clustered', words, values)
+    session = web[1]()
+    model = session.query(Model).get(model_id)
+    clustering_id = cluster_model(session, model, 3).id
+    session.close()
+    return model_id, clustering_id
+
+
+def test_cluster_endpoints(client, clustered_model):
+    model_id, clustering_id = clustered_model
+    response = get(client, '/api/model/%s/clusterings' % model_id)
+
+    assert response.status_code == 200
+    assert response.json == [{
+        'id': clustering_id,
+        'modelId': model_id,
+        'numClusters': 3,
+        'normalized': True
+    }]
+
+    response = get(client, '/api/model/%s/cluster/word/w0001' % model_id)
+    assert response.status_code == 200
+    assert response.json['clusteringId'] == clustering_id
+    cluster = response.json['cluster']
+
+    response = get(client, '/api/model/%s/cluster/%s/words?page_size=5' %
+                   (model_id, cluster))
+    assert response.status_code == 200
+    assert len(response.json) == 5
+    assert all(m['cluster'] == cluster for m in response.json)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/model/%s/cluster/word/nope',
+    '/api/model/%s/cluster/word/w0001?clustering=999999',
+])
+def test_cluster_endpoint_errors(client, clustered_model, url):
+    response = get(client, url % clustered_model[0])
+    assert response.status_code == 404
@@ -0,0 +1,74 @@
+import numpy
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fasttextdb.models import *
+from fasttextdb.lookup import read_vectors, select_vectors
+from fasttextdb.compression import *
+
+from .conftest import random_vectors, create_model
+
+zstd = pytest.mark.skipif('zstd' not in available_compressions(),
+                          reason='needs the zstandard package')
+
+
+@pytest.mark.parametrize('compression', available_compressions())
+def test_compression_round_trip(compression):
+    words, values = random_vectors(50, 20)
+    compression = COMPRESSIONS[compression]
+    dictionary = None
+
+    if compression == ZSTD_DICT_COMPRESSION:
+        dictionary = train_dictionary(values, FLOAT32_ENCODING)
+
+    for v in values:
+        packed, ec = pack_values(v, FLOAT32_ENCODING, compression,
+                                 dictionary)
+        assert ec & COMPRESSION_MASK == compression
+        assert numpy.array_equal(unpack_array(packed, ec, dictionary), v)
+
+
+@zstd
+def test_zstd_across_threads():
+    blocks = [random_vectors(100, 50, seed)[1] for seed in range(64)]
+
+    def round_trip(values):
+        packed = compress(values.tobytes(), ZSTD_COMPRESSION)
+        return numpy.array_equal(
+            numpy.frombuffer(
+                decompress(packed, ZSTD_COMPRESSION), '<f4').reshape(
+                    values.shape), values)
+
+    with ThreadPoolExecutor(8) as pool:
+        assert all(pool.map(round_trip, blocks))
+
+
+def test_choose_codec(session):
+    words, values = random_vectors(200, 20)
+    model = create_model(session, words, values,
+                         encoding=JSON_ENCODING, compression=BZ2_COMPRESSION)
+    best, results = choose_codec(session, model, compressions=['none', 'zlib'])
+
+    assert model.encoding_compression == \
+        ENCODINGS[best['encoding']] ^ COMPRESSIONS[best['compression']]
+    assert len(results) == 4
+    assert best['cost'] == min(r['cost'] for r in results)
+
+
+@zstd
+def test_choose_codec_keeps_dictionary_in_use(session):
+    words, values = random_vectors(500, 20)
+    model = create_model(session, words, values,
+                         encoding=FLOAT32_ENCODING,
+                         compression=ZSTD_DICT_COMPRESSION)
+    dictionary = model.compression_dict
+    choose_codec(session, model, encodings=['float32'],
+                 compressions=['zstd-dict'])
+
+    assert model.compression_dict == dictionary
+    records = read_vectors(session, select_vectors(model, words[:20]),
+                           model)
+    assert numpy.array_equal(
+        numpy.array([r.values for r in records]),
+        values[[words.index(r.word) for r in records]])
@@ -0,0 +1,78 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.embedding import *
+
+from .conftest import web_model, post
+
+WORDS = ['a', 'b', 'c']
+VALUES = numpy.array([[1, 0], [0, 2], [3, 3]], dtype=numpy.float32)
+
+
+def test_document_weights():
+    documents = [['a', 'b'], ['a'], ['c', 'c']]
+
+    assert document_weights(documents) == {'a': 1.0, 'b': 1.0, 'c': 1.0}
+    weights = document_weights(documents, 'idf', {'c': 5.0})
+    assert numpy.isclose(weights['a'], numpy.log(4.0 / 3) + 1)
+    assert numpy.isclose(weights['b'], numpy.log(2.0) + 1)
+    assert weights['c'] == 5.0
+
+    with pytest.raises(ValueError):
+        document_weights(documents, 'max')
+
+
+def test_pool_documents():
+    documents = [['a', 'b', 'unknown'], [], ['unknown'], ['c', 'a', 'a']]
+    pooled, counts = pool_documents(documents, WORDS, VALUES)
+
+    assert list(counts) == [2, 0, 0, 3]
+    assert numpy.allclose(pooled, [[0.5, 1], [0, 0], [0, 0], [5.0 / 3, 1]])
+
+    pooled, counts = pool_documents(documents[:1], WORDS, VALUES,
+                                    weights={'a': 3.0}, normalize=True)
+    assert numpy.allclose(pooled, [[0.75, 0.25]])
+
+
+def test_pool_documents_without_vectors():
+    pooled, counts = pool_documents([['a']], [], numpy.empty((0, 2)))
+
+    assert pooled.shape == (1, 2)
+    assert list(counts) == [0]
+
+
+@pytest.fixture(scope='module')
+def embed_model(web):
+    return web_model(web, 'embed', WORDS, VALUES,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION)
+
+
+def test_embed(client, embed_model):
+    documents = [['a', 'b'], ['c', 'nope']]
+    response = post(client, '/api/model/%s/embed' % embed_model,
+                    {'documents': documents})
+
+    assert response.status_code == 200
+    assert response.headers['X-Fasttextdb-Shape'] == '2,2'
+    assert numpy.allclose(
+        numpy.frombuffer(response.data, dtype='<f4').reshape((2, 2)),
+        [[0.5, 1], [3, 3]])
+
+    response = post(client, '/api/model/%s/embed' % embed_model, {
+        'documents': documents,
+        'weighting': 'idf',
+        'format': 'json'
+    })
+    assert response.status_code == 200
+    assert response.json['counts'] == [2, 1]
+    assert numpy.allclose(response.json['vectors'], [[0.5, 1], [3, 3]])
+
+
+def test_embed_invalid_weighting(client, embed_model):
+    response = post(client, '/api/model/%s/embed' % embed_model, {
+        'documents': [['a']],
+        'weighting': 'max'
+    })
+    assert response.status_code == 400
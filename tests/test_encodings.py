@@ -0,0 +1,62 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.compression import train_dictionary
+
+
+@pytest.fixture
+def values():
+    return numpy.random.RandomState(0).randn(300, 20).astype(numpy.float32)
+
+
+@pytest.mark.parametrize('compression', available_compressions())
+@pytest.mark.parametrize('encoding', ['json', 'float32', 'float16'])
+def test_pack_values_round_trip(values, encoding, compression):
+    encoding, compression = ENCODINGS[encoding], COMPRESSIONS[compression]
+    dictionary = None
+
+    if compression == ZSTD_DICT_COMPRESSION:
+        dictionary = train_dictionary(values, encoding)
+
+    tolerance = {
+        JSON_ENCODING: 1e-6,
+        FLOAT32_ENCODING: 0,
+        FLOAT16_ENCODING: 1e-2
+    }[encoding]
+
+    packed, encoding_compression = pack_values(values[0], encoding,
+                                               compression, dictionary)
+    assert encoding_compression == encoding ^ compression
+    unpacked = unpack_array(packed, encoding_compression, dictionary)
+    assert numpy.abs(unpacked - values[0]).max() <= tolerance
+
+
+def test_unpack_arrays_mixed_codecs(values):
+    packed = [
+        pack_values(v, encoding, compression) for v, (encoding, compression)
+        in zip(values, [(JSON_ENCODING, BZ2_COMPRESSION),
+                        (FLOAT32_ENCODING, NO_COMPRESSION),
+                        (FLOAT32_ENCODING, ZLIB_COMPRESSION)] * 100)
+    ]
+    unpacked = unpack_arrays([x for x, ec in packed],
+                             [ec for x, ec in packed])
+    assert numpy.allclose(unpacked, values, atol=1e-6)
+
+
+def test_raw_encodings_size(values):
+    float32, ec = pack_values(values[0], FLOAT32_ENCODING, NO_COMPRESSION)
+    float16, ec = pack_values(values[0], FLOAT16_ENCODING, NO_COMPRESSION)
+
+    assert len(float32) == 4 * 20
+    assert len(float16) == 2 * 20
+
+
+def test_vector_pack_values(values):
+    vector = Vector(word='w').pack_values(values[0].tolist(),
+                                          FLOAT16_ENCODING, ZLIB_COMPRESSION)
+
+    assert vector.encoding_compression == \
+        FLOAT16_ENCODING ^ ZLIB_COMPRESSION
+    assert numpy.isclose(vector.norm, numpy.linalg.norm(values[0]))
+    assert numpy.allclose(vector.unpack_values(), values[0], atol=1e-2)
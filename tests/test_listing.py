@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import numpy
+import pytest
+
+from fasttextdb.models import *
+
+from .conftest import AUTH, web_model
+
+WORDS = ['a,b', 'plain', 'quote"d', u'\xe9t\xe9']
+VALUES = numpy.arange(8, dtype=numpy.float32).reshape((4, 2)) / 4
+
+
+@pytest.fixture(scope='module')
+def listed_model(web):
+    return web_model(web, 'listing', WORDS, VALUES,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION)
+
+
+def _get(client, url, accept):
+    return client.get(url, headers=dict(AUTH, Accept=accept))
+
+
+@pytest.mark.parametrize('query', ['?all=true', '?page_size=10'])
+def test_ndjson_listing(client, listed_model, query):
+    response = _get(client,
+                    '/api/model/%s/vectors%s' % (listed_model, query),
+                    'application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    vectors = [json.loads(l) for l in response.data.splitlines()]
+    assert [v['word'] for v in vectors] == sorted(WORDS)
+    assert all(v['modelId'] == listed_model for v in vectors)
+    assert vectors[0]['values'] == [0.0, 0.25]
+
+
+@pytest.mark.parametrize('query', ['?all=true', '?page_size=2&page=1'])
+def test_csv_listing(client, listed_model, query):
+    response = _get(client,
+                    '/api/model/%s/vectors%s' % (listed_model, query),
+                    'text/csv')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.data.decode('utf-8'))))
+    expected = sorted(WORDS) if 'all' in query else sorted(WORDS)[2:]
+
+    assert [r[2] for r in rows] == expected
+    assert all(int(r[0]) == listed_model for r in rows)
+    assert all(len(r) == 5 for r in rows)
+
+
+def test_all_only_streams_ndjson_and_csv(client, listed_model):
+    response = _get(client,
+                    '/api/model/%s/vectors?all=true&page_size=2' %
+                    listed_model, 'application/json')
+
+    assert len(json.loads(response.data)) == 2
+
+
+def test_word_as_ndjson(client, listed_model):
+    response = _get(client, '/api/model/%s/vectors/word/plain' %
+                    listed_model, 'application/x-ndjson')
+
+    assert response.status_code == 200
+    vector, = [json.loads(l) for l in response.data.splitlines()]
+    assert vector['word'] == 'plain'
+    assert vector['values'] == [0.5, 0.75]
@@ -0,0 +1,70 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.lookup import *
+from fasttextdb.vectors import commit_blocks
+
+from .conftest import random_vectors, create_model
+
+
+@pytest.fixture
+def model(session):
+    words, values = random_vectors(30, 6)
+    model = create_model(session, words[:20], values[:20],
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    # a model can have vectors stored with more than one codec
+    list(commit_blocks([(words[20:], values[20:])], model, session=session,
+                       encoding=JSON_ENCODING, compression=ZLIB_COMPRESSION))
+    return model, words, values
+
+
+@pytest.mark.parametrize('by_hash', [False, True])
+def test_read_vectors(session, model, by_hash):
+    model, words, values = model
+    query = select_vectors(model, ['w025', 'w003', 'missing'], by_hash)
+    records = sorted(read_vectors(session, query, model),
+                     key=lambda r: r.word)
+
+    assert [r.word for r in records] == ['w003', 'w025']
+    assert numpy.allclose([r.values for r in records], values[[3, 25]],
+                          atol=1e-6)
+
+    for record in records:
+        vector = session.query(Vector).get(record.id)
+        assert record.to_dict() == vector.to_dict()
+        assert record.to_dict(True) == vector.to_dict(True)
+        assert record.to_list() == vector.to_list()
+
+
+def test_select_one_word(session, model):
+    model, words, values = model
+    records = read_vectors(session, select_vectors(model, ['w007'], True),
+                           model)
+
+    assert [r.word for r in records] == ['w007']
+
+
+def test_iter_vectors(session, model):
+    model, words, values = model
+    query = select_vectors(model).order_by(Vector.__table__.c.word)
+    records = list(iter_vectors(session, query, model, batch_size=7))
+
+    assert [r.word for r in records] == words
+    assert numpy.allclose([r.values for r in records], values, atol=1e-6)
+
+
+def test_read_matrix(session, model):
+    model, words, values = model
+    w, v = read_matrix(session,
+                       select_vectors(model).order_by(
+                           Vector.__table__.c.word), model)
+
+    assert w == words
+    assert v.dtype == numpy.float32
+    assert numpy.allclose(v, values, atol=1e-6)
+
+    w, v = read_matrix(session, select_vectors(model, ['missing']), model)
+    assert w == []
+    assert v.shape == (0, 6)
@@ -0,0 +1,87 @@
+import json
+import numpy
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from fasttextdb.models import *
+from fasttextdb.migrate import migrate
+
+
+def _old_database(path, words, values):
+    """
+    Creates a database with the vector table of before the (model_id,
+    word) indexes, without the columns added since, and a model of the
+    words
+    """
+    engine = create_engine('sqlite:///%s' % path)
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text('DROP TABLE vector'))
+        conn.execute(text('ALTER TABLE model DROP COLUMN statistics'))
+        conn.execute(
+            text('CREATE TABLE vector (id INTEGER PRIMARY KEY, '
+                 'word VARCHAR UNIQUE, packed_values BLOB, '
+                 'model_id INTEGER REFERENCES model (id), '
+                 'encoding_compression SMALLINT)'))
+        conn.execute(
+            text('CREATE INDEX ix_vector_model_id ON vector (model_id)'))
+        conn.execute(text("INSERT INTO model (id, name, dim) "
+                          "VALUES (1, 'old', %s)" % values.shape[1]))
+
+        for i, (word, v) in enumerate(zip(words, values)):
+            packed, encoding_compression = pack_values(v.tolist())
+            conn.execute(
+                text('INSERT INTO vector VALUES (:id, :word, :packed, 1, '
+                     ':ec)'), {
+                         'id': i + 1,
+                         'word': word,
+                         'packed': packed,
+                         'ec': encoding_compression
+                     })
+
+    return engine
+
+
+def test_migrate(tmp_path):
+    words = ['w%02d' % i for i in range(25)]
+    values = numpy.random.RandomState(0).randn(25, 4)
+    engine = _old_database(tmp_path / 'old.db', words, values)
+
+    migrate(engine, batch_size=10)
+
+    inspector = inspect(engine)
+    indexes = [i['name'] for i in inspector.get_indexes('vector')]
+    assert 'ix_vector_model_id' not in indexes
+    assert 'ix_vector_model_id_word' in indexes
+    assert 'ix_vector_model_id_word_hash' in indexes
+    assert not inspector.get_unique_constraints('vector')
+
+    session = sessionmaker(bind=engine)()
+    vectors = list(Vector.vectors_for_model(session, session.query(Model).get(
+        1)).order_by(Vector.word))
+
+    assert [v.word for v in vectors] == words
+    assert [v.word_hash for v in vectors] == [word_hash(w) for w in words]
+    assert numpy.allclose([v.norm for v in vectors],
+                          numpy.linalg.norm(values, axis=1))
+    assert json.loads(session.query(Model).get(1).statistics)
+
+    # the same word can now be stored for another model
+    model = Model(name='new', dim=4)
+    session.add(model)
+    session.commit()
+    vector = Vector(word=words[0], model=model)
+    vector.pack_values(values[0].tolist())
+    session.add(vector)
+    session.commit()
+
+    found = list(Vector.vectors_for_words(session, [words[0]], model,
+                                          by_hash=True))
+    assert [v.id for v in found] == [vector.id]
+
+    # migrating again changes nothing
+    migrate(engine)
+    assert session.query(Vector).count() == 26
+    session.close()
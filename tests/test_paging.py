@@ -0,0 +1,73 @@
+import json
+import pytest
+
+from fasttextdb.models import *
+
+from .conftest import AUTH, random_vectors, web_model, get
+
+CURSOR = 'X-Fasttextdb-Cursor'
+
+
+@pytest.fixture(scope='module')
+def paged_model(web):
+    words, values = random_vectors(25, 4)
+    return web_model(web, 'paging', words, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION), words
+
+
+def _pages(client, url, parse, accept='application/json'):
+    headers = dict(AUTH, Accept=accept)
+    pages = []
+    response = client.get(url, headers=headers)
+
+    while True:
+        assert response.status_code == 200
+        pages.append(parse(response))
+
+        if CURSOR not in response.headers:
+            return pages
+
+        response = client.get(
+            '%s&cursor=%s' % (url, response.headers[CURSOR]),
+            headers=headers)
+
+
+def test_vectors_keyset_cursor(client, paged_model):
+    model_id, words = paged_model
+    pages = _pages(client, '/api/model/%s/vectors?page_size=10' % model_id,
+                   lambda r: [v['word'] for v in json.loads(r.data)])
+
+    assert [len(p) for p in pages] == [10, 10, 5]
+    assert sum(pages, []) == words
+
+
+def test_ndjson_keyset_cursor(client, paged_model):
+    model_id, words = paged_model
+    pages = _pages(
+        client, '/api/model/%s/vectors?page_size=10' % model_id,
+        lambda r: [json.loads(l)['word'] for l in r.data.splitlines()],
+        'application/x-ndjson')
+
+    assert [len(p) for p in pages] == [10, 10, 5]
+    assert sum(pages, []) == words
+
+
+def test_vectors_after_key(client, paged_model):
+    model_id, words = paged_model
+    response = get(client, '/api/model/%s/vectors?page_size=5&after=%s' %
+                   (model_id, words[9]))
+
+    assert [v['word'] for v in json.loads(response.data)] == words[10:15]
+
+
+def test_invalid_cursor(client, paged_model):
+    model_id, words = paged_model
+    response = get(client,
+                   '/api/model/%s/vectors?cursor=not-a-cursor' % model_id)
+
+    assert response.status_code == 400
+
+
+def test_invalid_after_key(client):
+    assert get(client, '/api/models?after=abc').status_code == 400
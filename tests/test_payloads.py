@@ -0,0 +1,94 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.payloads import *
+from fasttextdb.payloads import pyarrow
+
+from .conftest import AUTH, random_vectors, web_model
+
+CURSOR = 'X-Fasttextdb-Cursor'
+
+
+def test_npy_round_trip():
+    words, values = random_vectors(20, 5)
+    words[3] = u'\xe9t\xe9 longer word'
+    decoded = decode_payload(encode_npy(words, values), NPY_MIMETYPE)
+
+    assert decoded[0] == words
+    assert decoded[1].dtype == numpy.float32
+    assert numpy.array_equal(decoded[1], values)
+
+
+def test_empty_npy():
+    words, values = decode_npy(encode_npy([], numpy.empty((0, 3))))
+
+    assert words == []
+    assert values.shape == (0, 3)
+
+
+@pytest.mark.skipif(pyarrow is None, reason='requires pyarrow')
+def test_arrow_round_trip():
+    words, values = random_vectors(20, 5)
+    decoded = decode_payload(encode_arrow(words, values), ARROW_MIMETYPE)
+
+    assert decoded[0] == words
+    assert numpy.array_equal(decoded[1], values)
+
+
+def test_unknown_payload():
+    with pytest.raises(Exception):
+        decode_payload(b'', 'application/json')
+
+
+@pytest.fixture(scope='module')
+def payload_model(web):
+    words, values = random_vectors(25, 4)
+    return web_model(web, 'payloads', words, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION), words, values
+
+
+def _get(client, url, mimetype=NPY_MIMETYPE):
+    return client.get(url, headers=dict(AUTH, Accept=mimetype))
+
+
+def test_npy_vectors(client, payload_model):
+    model_id, words, values = payload_model
+    response = _get(client, '/api/model/%s/vectors?page_size=20' % model_id)
+
+    assert response.status_code == 200
+    assert response.mimetype == NPY_MIMETYPE
+    w, v = decode_npy(response.data)
+    assert w == words[:20]
+    assert numpy.array_equal(v, values[:20])
+
+    response = _get(client, '/api/model/%s/vectors?page_size=20&cursor=%s' %
+                    (model_id, response.headers[CURSOR]))
+    assert decode_npy(response.data)[0] == words[20:]
+    assert CURSOR not in response.headers
+
+
+def test_npy_word(client, payload_model):
+    model_id, words, values = payload_model
+    w, v = decode_npy(
+        _get(client, '/api/model/%s/vectors/word/w007' % model_id).data)
+
+    assert w == ['w007']
+    assert numpy.array_equal(v, values[7:8])
+
+    w, v = decode_npy(
+        _get(client, '/api/model/%s/vectors/word/nope' % model_id).data)
+    assert v.shape == (0, 4)
+
+
+@pytest.mark.skipif(pyarrow is None, reason='requires pyarrow')
+def test_arrow_vectors(client, payload_model):
+    model_id, words, values = payload_model
+    response = _get(client, '/api/model/%s/vectors?page_size=30' % model_id,
+                    ARROW_MIMETYPE)
+
+    assert response.mimetype == ARROW_MIMETYPE
+    w, v = decode_arrow(response.data)
+    assert w == words
+    assert numpy.array_equal(v, values)
@@ -0,0 +1,117 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.lookup import *
+from fasttextdb.projection import *
+from fasttextdb.statistics import model_statistics
+
+from .conftest import create_model, web_model, get
+
+
+def _correlated(n=500, dim=8, seed=0):
+    random = numpy.random.RandomState(seed)
+    values = random.randn(n, dim) * numpy.linspace(5, 0.1, dim) + 3
+    rotation = numpy.linalg.qr(random.randn(dim, dim))[0]
+    return (['w%03d' % i for i in range(n)],
+            values.dot(rotation).astype(numpy.float32))
+
+
+def test_fit_pca():
+    words, values = _correlated()
+    projection = fit_pca((values[i:i + 64] for i in range(0, 500, 64)), 3)
+    centered = values - values.mean(axis=0)
+    components = numpy.linalg.svd(centered, full_matrices=False)[2][:3]
+
+    assert numpy.allclose(projection.mean, values.mean(axis=0), atol=1e-4)
+    # the same components up to their signs
+    assert numpy.allclose(
+        numpy.abs((projection.components * components).sum(axis=1)), 1,
+        atol=1e-3)
+    assert numpy.allclose(projection.transform(values).mean(axis=0), 0,
+                          atol=1e-3)
+
+
+def test_fit_pca_errors():
+    with pytest.raises(Exception):
+        fit_pca([], 2)
+
+    with pytest.raises(Exception):
+        fit_pca([numpy.zeros((3, 2))], 3)
+
+
+def test_random_projection():
+    words, values = _correlated(50, 64)
+    projection = random_projection(64, 32)
+    projected = projection.transform(values)
+    ratios = (numpy.linalg.norm(projected[1:] - projected[0], axis=1) /
+              numpy.linalg.norm(values[1:] - values[0], axis=1))
+
+    assert projected.shape == (50, 32)
+    assert 0.5 < ratios.min() and ratios.max() < 1.5
+
+
+def test_projection_bytes():
+    projection = random_projection(5, 2)
+    copy = Projection.from_bytes(projection.to_bytes())
+
+    assert copy.kind == projection.kind
+    assert numpy.array_equal(copy.mean, projection.mean)
+    assert numpy.array_equal(copy.components, projection.components)
+
+
+@pytest.mark.parametrize('method', PROJECTIONS)
+def test_project_model(session, method):
+    words, values = _correlated()
+    model = create_model(session, words, values, 'parent')
+    derived = project_model(session, model, 3, method, chunk_size=120,
+                            batch_size=50)
+    projection = load_projection(derived)
+    w, v = read_matrix(session,
+                       select_vectors(derived).order_by(
+                           Vector.__table__.c.word), derived)
+
+    assert derived.name == 'parent-%s3' % method
+    assert (derived.parent_id, derived.dim) == (model.id, 3)
+    assert w == words
+    assert numpy.allclose(v, projection.transform(values), atol=1e-4)
+    assert model_statistics(derived).count == 500
+    assert load_projection(model) is None
+
+
+def test_project_model_quantized(session):
+    words, values = _correlated()
+    model = create_model(session, words, values, 'parent')
+    derived = project_model(session, model, 4, name='small',
+                            encoding=INT8_MODEL_ENCODING)
+    w, v = read_matrix(session,
+                       select_vectors(derived).order_by(
+                           Vector.__table__.c.word), derived)
+
+    assert derived.name == 'small'
+    assert derived.quantizer is not None
+    assert numpy.allclose(v, load_projection(derived).transform(values),
+                          atol=0.1)
+
+
+def test_unknown_projection(session):
+    words, values = _correlated(10)
+    model = create_model(session, words, values)
+
+    with pytest.raises(Exception):
+        project_model(session, model, 2, 'tsne')
+
+
+def test_derived_models(client, web):
+    words, values = _correlated(60)
+    model_id = web_model(web, 'derived', words, values)
+    session = web[1]()
+    model = session.query(Model).get(model_id)
+    project_model(session, model, 4)
+    project_model(session, model, 2, 'random')
+    session.close()
+
+    response = get(client, '/api/model/%s/derived' % model_id)
+    assert response.status_code == 200
+    assert [(m['name'], m['dim']) for m in response.json] == \
+        [('derived-random2', 2), ('derived-pca4', 4)]
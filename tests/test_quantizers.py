@@ -0,0 +1,146 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.quantizers import *
+from fasttextdb.compression import train_quantizer, quantize_model
+from fasttextdb.lookup import read_matrix, select_vectors
+from fasttextdb.vectors import commit_blocks
+
+from .conftest import random_vectors, create_model
+
+
+@pytest.fixture
+def values():
+    return numpy.random.RandomState(0).randn(300, 20).astype(numpy.float32)
+
+
+def test_int8_round_trip(values):
+    for v in values[:20]:
+        packed, ec = pack_values(v, INT8_ENCODING, NO_COMPRESSION)
+
+        # accurate to half a step of the vector's range
+        assert numpy.abs(unpack_array(packed, ec) - v).max() <= \
+            numpy.ptp(v) / 254 + 1e-6
+
+
+@pytest.mark.parametrize('encoding', ['int8-model', 'pq'])
+def test_quantized_encodings_round_trip(values, encoding):
+    encoding = ENCODINGS[encoding]
+    quantizer = train_quantizer(values, encoding)
+    packed = [pack_values(v, encoding, NO_COMPRESSION, None, quantizer)
+              for v in values]
+    rows = numpy.array([unpack_array(x, ec, None, quantizer)
+                        for x, ec in packed])
+    batch = unpack_arrays([x for x, ec in packed], [ec for x, ec in packed],
+                          None, quantizer)
+
+    assert numpy.allclose(rows, batch)
+    error = numpy.linalg.norm(rows - values) / numpy.linalg.norm(values)
+    assert error < (0.02 if encoding == INT8_MODEL_ENCODING else 0.8)
+
+
+def test_scalar_quantizer_round_trip(values):
+    quantizer = ScalarQuantizer.train(values)
+    restored = ScalarQuantizer.from_bytes(quantizer.to_bytes())
+    codes = restored.encode(values)
+
+    assert codes.dtype == numpy.uint8
+    assert numpy.array_equal(codes, quantizer.encode(values))
+    assert numpy.abs(restored.decode(codes) - values).max() <= \
+        restored.scale.max() / 2 + 1e-6
+    assert numpy.allclose(
+        restored.dot(codes, values[:3]),
+        restored.decode(codes).dot(values[:3].T),
+        rtol=1e-4,
+        atol=1e-3)
+
+
+def test_product_quantizer_round_trip(values):
+    quantizer = ProductQuantizer.train(values, 4)
+    restored = ProductQuantizer.from_bytes(quantizer.to_bytes())
+    codes = restored.encode(values)
+
+    assert codes.shape == (len(values), 4)
+    assert numpy.array_equal(codes, quantizer.encode(values))
+    assert numpy.allclose(
+        restored.dot(codes, values[:3]),
+        restored.decode(codes).dot(values[:3].T),
+        rtol=1e-4,
+        atol=1e-3)
+
+
+def test_product_quantizer_with_few_vectors(values):
+    # every vector is its own centroid, and no code points at an
+    # untrained one
+    quantizer = ProductQuantizer.train(values[:50] + 10, 4)
+
+    assert quantizer.codebooks.shape == (4, 50, 5)
+    assert numpy.allclose(
+        quantizer.decode(quantizer.encode(values[:50] + 10)),
+        values[:50] + 10)
+
+
+def _read(session, model):
+    words, matrix = read_matrix(session, select_vectors(model), model)
+    return dict(zip(words, matrix))
+
+
+def test_quantizer_trained_on_all_blocks(session):
+    # the first block is much smaller than the rest, which int8 ranges
+    # trained on it alone would clip
+    words, values = random_vectors(3000, 16)
+    values *= numpy.linspace(0.1, 5, 3000)[:, None]
+    model = Model(name='int8', dim=16)
+    session.add(model)
+    session.commit()
+    blocks = [(words[i:i + 300], values[i:i + 300])
+              for i in range(0, 3000, 300)]
+    list(commit_blocks(blocks, model, session=session,
+                       encoding=INT8_MODEL_ENCODING,
+                       compression=NO_COMPRESSION))
+    read = _read(session, model)
+    got = numpy.array([read[w] for w in words])
+
+    assert numpy.linalg.norm(got - values) / numpy.linalg.norm(values) < 0.02
+
+
+def test_quantize_model(session):
+    words, values = random_vectors(500, 20)
+    model = create_model(session, words, values,
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+
+    assert quantize_model(session, model, INT8_MODEL_ENCODING,
+                          batch_size=128) == 500
+    assert model.encoding_compression == INT8_MODEL_ENCODING
+    read = _read(session, model)
+    assert numpy.allclose([read[w] for w in words], values, atol=0.05)
+
+
+def test_quantize_model_failure_keeps_old_codec(session, monkeypatch):
+    from fasttextdb import compression
+
+    words, values = random_vectors(500, 20)
+    model = create_model(session, words, values,
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    packed = []
+
+    def failing_pack_values(*args):
+        if len(packed) == 300:
+            raise RuntimeError('failed')
+
+        packed.append(args)
+        return pack_values(*args)
+
+    monkeypatch.setattr(compression, 'pack_values', failing_pack_values)
+
+    with pytest.raises(RuntimeError):
+        quantize_model(session, model, PQ_ENCODING, batch_size=100)
+
+    session.expire_all()
+    assert model.encoding_compression == FLOAT32_ENCODING
+    assert model.quantizer is None
+    read = _read(session, model)
+    assert numpy.array_equal([read[w] for w in words], values)
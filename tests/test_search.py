@@ -0,0 +1,144 @@
+import threading
+import numpy
+import pytest
+
+from fasttextdb import search
+from fasttextdb.models import *
+from fasttextdb.search import *
+
+from .conftest import random_vectors, create_model, web_model, get, post
+
+
+def _brute_force(values, queries, k, metric):
+    if metric == 'cosine':
+        values = unit_rows(values)
+        queries = unit_rows(queries)
+
+    scores = queries.dot(values.T)
+    return [list(numpy.argsort(-s, kind='mergesort')[:k]) for s in scores]
+
+
+@pytest.mark.parametrize('metric', METRICS)
+@pytest.mark.parametrize('block_rows', [7, DEFAULT_BLOCK_ROWS])
+def test_model_matrix_search(metric, block_rows):
+    words, values = random_vectors(100, 8)
+    matrix = ModelMatrix(words, values)
+    queries = values[:5] + 0.1
+    results = matrix.search(queries, 10, metric, block_rows=block_rows)
+
+    assert [[r for r, s in result] for result in results] == \
+        _brute_force(values, queries, 10, metric)
+    assert numpy.allclose(matrix.vectors_for_rows([3]), values[3], atol=1e-6)
+
+
+def test_model_matrix_search_excludes_rows():
+    words, values = random_vectors(50, 8)
+    matrix = ModelMatrix(words, values)
+    results = matrix.search(values[:3], 5, exclude=[0, 1, 2])
+
+    for i, result in enumerate(results):
+        assert len(result) == 5
+        assert i not in [r for r, s in result]
+
+
+def test_model_matrix_load(session):
+    words, values = random_vectors(250, 8)
+    model = create_model(session, words, values, encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    matrix = ModelMatrix.load(session, model, batch_size=100)
+
+    assert matrix.words == words
+    assert numpy.allclose(matrix.vectors_for_rows(range(250)), values,
+                          atol=1e-5)
+
+
+def test_model_matrix_loads_models_concurrently(monkeypatch):
+    loading = threading.Event()
+    release = threading.Event()
+
+    class _Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    def slow_load(session, model):
+        if model.id == -1:
+            loading.set()
+            release.wait(10)
+
+        return ModelMatrix([], numpy.empty((0, 8)))
+
+    monkeypatch.setattr(ModelMatrix, 'load', staticmethod(slow_load))
+    thread = threading.Thread(target=model_matrix, args=(None, _Model(-1)))
+    thread.start()
+
+    try:
+        assert loading.wait(10)
+        # another model is loaded while the first one is still loading
+        other = threading.Thread(target=model_matrix,
+                                 args=(None, _Model(-2)))
+        other.start()
+        other.join(5)
+        assert not other.is_alive()
+    finally:
+        release.set()
+        thread.join()
+
+    assert model_matrix(None, _Model(-1)) is model_matrix(None, _Model(-1))
+    drop_model_matrix(-1)
+    drop_model_matrix(-2)
+    assert -1 not in search._matrices
+
+
+@pytest.fixture(scope='module')
+def exact_model(web):
+    words, values = random_vectors(60, 8, seed=1)
+    return web_model(web, 'exact', words, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION), words, values
+
+
+def test_exact_neighbors(client, exact_model):
+    model_id, words, values = exact_model
+    response = get(client,
+                   '/api/model/%s/neighbors/word/w003?k=5&exact=true' %
+                   model_id)
+    expected = [words[r] for r in
+                _brute_force(values, values[3:4], 6, 'cosine')[0]
+                if r != 3][:5]
+
+    assert response.status_code == 200
+    assert [n['word'] for n in response.json] == expected
+
+    response = post(client, '/api/model/%s/neighbors' % model_id, {
+        'vectors': [values[3].tolist()],
+        'k': 6,
+        'exact': True
+    })
+    assert response.status_code == 200
+    assert [n['word'] for n in response.json[0]] == ['w003'] + expected
+
+
+@pytest.mark.parametrize('k', ['0', '-1', 'abc'])
+def test_invalid_k(client, exact_model, k):
+    model_id = exact_model[0]
+    response = get(
+        client, '/api/model/%s/neighbors/word/w003?k=%s' % (model_id, k))
+    assert response.status_code == 400
+
+    response = post(client, '/api/model/%s/neighbors' % model_id, {
+        'vectors': [[0.0] * 8],
+        'k': k
+    })
+    assert response.status_code == 400
+
+
+def test_neighbors_errors(client, exact_model):
+    model_id = exact_model[0]
+
+    assert get(client, '/api/model/%s/neighbors/word/nope' %
+               model_id).status_code == 404
+    assert get(client, '/api/model/%s/neighbors/word/w003?metric=l2' %
+               model_id).status_code == 400
+    assert post(client, '/api/model/%s/neighbors' % model_id, {
+        'vectors': [[0.0] * 3]
+    }).status_code == 400
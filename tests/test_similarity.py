@@ -0,0 +1,78 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.search import pairwise_similarities
+
+from .conftest import web_model, post
+
+WORDS = ['a', 'b', 'c']
+VALUES = numpy.array([[1, 0], [0, 2], [3, 3]], dtype=numpy.float32)
+COSINES = numpy.array([[1, 0, 0.5**0.5], [0, 1, 0.5**0.5],
+                       [0.5**0.5, 0.5**0.5, 1]])
+
+
+@pytest.mark.parametrize('block_rows', [1, 4096])
+def test_pairwise_similarities(block_rows):
+    assert numpy.allclose(
+        pairwise_similarities(VALUES, VALUES, block_rows=block_rows), COSINES)
+
+    rows, cols, scores = pairwise_similarities(
+        VALUES, VALUES, 0.9, block_rows=block_rows)
+    assert list(zip(rows, cols)) == [(0, 0), (1, 1), (2, 2)]
+    assert numpy.allclose(scores, 1)
+
+
+def test_pairwise_similarities_empty():
+    assert pairwise_similarities(numpy.empty((0, 2)), VALUES).shape == (0, 3)
+    assert [len(x) for x in pairwise_similarities(
+        numpy.empty((0, 2)), VALUES, 0.5)] == [0, 0, 0]
+
+
+@pytest.fixture(scope='module')
+def similarity_model(web):
+    return web_model(web, 'similarity', WORDS, VALUES,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION)
+
+
+def test_similarity_matrix(client, similarity_model):
+    response = post(client, '/api/model/%s/similarity' % similarity_model, {
+        'a': ['a', 'nope'],
+        'b': ['c', 'b', 'a']
+    })
+
+    assert response.status_code == 200
+    assert response.headers['X-Fasttextdb-Shape'] == '2,3'
+    matrix = numpy.frombuffer(response.data, dtype='<f4').reshape((2, 3))
+    assert numpy.allclose(matrix[0], COSINES[0, [2, 1, 0]])
+    assert numpy.isnan(matrix[1]).all()
+
+    response = post(client, '/api/model/%s/similarity' % similarity_model, {
+        'a': ['a', 'nope'],
+        'b': ['c', 'b', 'a'],
+        'format': 'json'
+    })
+    assert response.json['missing'] == {'a': ['nope'], 'b': []}
+    assert response.json['matrix'][1] == [None, None, None]
+    assert numpy.allclose(response.json['matrix'][0], COSINES[0, [2, 1, 0]])
+
+
+def test_similarity_threshold(client, similarity_model):
+    data = {'a': ['a', 'c', 'nope'], 'b': ['a', 'b', 'nope'], 'threshold': 0.5}
+    response = post(client, '/api/model/%s/similarity' % similarity_model,
+                    data)
+
+    assert response.status_code == 200
+    records = numpy.frombuffer(
+        response.data,
+        dtype=[('row', '<i4'), ('col', '<i4'), ('score', '<f4')])
+    assert [(r, c) for r, c, s in records.tolist()] == [(0, 0), (1, 0),
+                                                        (1, 1)]
+
+    data['format'] = 'json'
+    response = post(client, '/api/model/%s/similarity' % similarity_model,
+                    data)
+    assert response.json['rows'] == [0, 1, 1]
+    assert response.json['cols'] == [0, 0, 1]
+    assert numpy.allclose(response.json['scores'], [1, 0.5**0.5, 0.5**0.5])
@@ -0,0 +1,85 @@
+import numpy
+
+from fasttextdb.models import *
+from fasttextdb.statistics import *
+from fasttextdb.vectors import commit_blocks
+
+from .conftest import random_vectors, create_model, web_model, get, post
+
+
+def test_merged_statistics_equal_full_statistics():
+    values = numpy.random.RandomState(0).randn(1000, 5) * 3 + 1
+    full = ModelStatistics().update(values)
+    merged = ModelStatistics()
+
+    for start, end in [(0, 1), (1, 400), (400, 400), (400, 1000)]:
+        merged.merge(ModelStatistics().update(values[start:end]))
+
+    for statistics in [full, merged]:
+        assert statistics.count == 1000
+        assert numpy.allclose(statistics.mean, values.mean(axis=0))
+        assert numpy.allclose(statistics.variance, values.var(axis=0))
+        assert statistics.norm_counts.sum() == 1000
+
+    assert numpy.array_equal(merged.norm_counts, full.norm_counts)
+
+
+def test_norm_histogram_clips_outliers():
+    statistics = ModelStatistics().update([[0.0, 0.0], [1e-6, 0], [1e6, 0]])
+    counts = statistics.to_dict()['normHistogram']['counts']
+
+    assert counts[0] == 2
+    assert counts[-1] == 1
+
+
+def test_json_round_trip():
+    statistics = ModelStatistics().update(numpy.eye(3))
+    copy = ModelStatistics.from_json(statistics.to_json())
+
+    assert copy.to_dict() == statistics.to_dict()
+    assert ModelStatistics.from_json(
+        ModelStatistics().to_json()).to_dict()['mean'] is None
+
+
+def test_ingest_statistics(session):
+    words, values = random_vectors(300, 4)
+    model = create_model(session, words[:100], values[:100])
+    list(commit_blocks([(words[100:200], values[100:200]),
+                        (words[200:], values[200:])], model, session=session))
+    statistics = model_statistics(model)
+
+    assert statistics.count == 300
+    assert numpy.allclose(statistics.mean, values.mean(axis=0), atol=1e-5)
+    assert numpy.allclose(statistics.variance, values.var(axis=0),
+                          atol=1e-5)
+    assert numpy.allclose([v.norm for v in Vector.vectors_for_model(
+        session, model).order_by(Vector.word)],
+                          numpy.linalg.norm(values, axis=1), atol=1e-5)
+
+    model.statistics = None
+    computed = compute_statistics(session, model, batch_size=70)
+
+    assert computed.count == 300
+    assert numpy.allclose(computed.mean, statistics.mean)
+    assert numpy.allclose(computed.variance, statistics.variance)
+    assert numpy.array_equal(computed.norm_counts, statistics.norm_counts)
+    assert model_statistics(model).count == 300
+
+def test_statistics_endpoint(client, web):
+    words, values = random_vectors(10, 3)
+    model_id = web_model(web, 'statistics', words, values)
+    response = post(client, '/api/model/%s/vectors' % model_id, [{
+        'word': 'extra',
+        'values': [1.0, 2.0, 3.0]
+    }])
+    assert response.status_code == 200
+
+    response = get(client, '/api/model/%s/statistics' % model_id)
+    all_values = numpy.vstack([values, [[1, 2, 3]]])
+
+    assert response.status_code == 200
+    assert response.json['count'] == 11
+    assert numpy.allclose(response.json['mean'], all_values.mean(axis=0),
+                          atol=1e-5)
+    assert numpy.allclose(response.json['variance'],
+                          all_values.var(axis=0), atol=1e-5)
@@ -0,0 +1,146 @@
+import io
+import numpy
+import pytest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from fasttextdb.models import *
+from fasttextdb.lookup import read_matrix, select_vectors
+from fasttextdb.streaming import *
+from fasttextdb.vectors import commit_blocks
+
+from .conftest import HEADERS, web_model, get
+
+
+def _vectors(n, dim=8):
+    return (['w%s' % i for i in range(n)],
+            numpy.random.RandomState(0).randn(n, dim).astype(numpy.float32))
+
+
+def _binary(words, values):
+    return io.BytesIO(b''.join(binary_records([(words, values)])))
+
+
+def _ndjson(words, values):
+    return io.BytesIO(b''.join(ndjson_records([(words, values)])))
+
+
+def test_binary_blocks_are_bounded():
+    words, values = _vectors(2500)
+    blocks = list(read_binary_blocks(_binary(words, values), 8))
+
+    assert [len(w) for w, v in blocks] == [DEFAULT_STREAM_BLOCK_SIZE] * 2 + \
+        [2500 - 2 * DEFAULT_STREAM_BLOCK_SIZE]
+    assert sum([w for w, v in blocks], []) == words
+    assert numpy.array_equal(numpy.concatenate([v for w, v in blocks]),
+                             values)
+
+
+def test_ndjson_blocks_are_bounded():
+    words, values = _vectors(250)
+    blocks = list(read_ndjson_blocks(_ndjson(words, values), block_size=100))
+
+    assert [len(w) for w, v in blocks] == [100, 100, 50]
+    assert all(v.shape == (len(w), 8) for w, v in blocks)
+    assert sum([w for w, v in blocks], []) == words
+    assert numpy.allclose(numpy.concatenate([v for w, v in blocks]), values)
+
+
+def test_truncated_binary_record():
+    words, values = _vectors(10)
+    data = _binary(words, values).getvalue()
+
+    with pytest.raises(ValueError):
+        list(read_binary_blocks(io.BytesIO(data[:-3]), 8))
+
+
+def test_ndjson_dim_mismatch():
+    data = b'{"word": "a", "values": [1, 2]}\n{"word": "b", "values": [1]}\n'
+
+    with pytest.raises(ValueError):
+        list(read_ndjson_blocks(io.BytesIO(data)))
+
+
+def test_commit_streamed_blocks(tmp_path):
+    engine = create_engine('sqlite:///%s' % (tmp_path / 'stream.db'))
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    model = Model(name='stream', dim=8)
+    session.add(model)
+    session.commit()
+    words, values = _vectors(2500)
+
+    rows = list(
+        commit_blocks(
+            read_binary_blocks(_binary(words, values), 8, block_size=300),
+            model,
+            session=session,
+            encoding=FLOAT32_ENCODING,
+            compression=NO_COMPRESSION,
+            batch_size=300))
+    found, matrix = read_matrix(session,
+                                select_vectors(model, words[::7]), model)
+
+    assert len(rows) == 2500
+    assert sorted(found) == sorted(words[::7])
+    assert numpy.array_equal(
+        matrix, values[[words.index(w) for w in found]])
+
+
+@pytest.fixture(scope='module')
+def stream_model(web):
+    words, values = _vectors(10)
+    return web_model(web, 'stream', words, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION)
+
+
+def _post_stream(client, model_id, data, content_type, query=''):
+    return client.post('/api/model/%s/vectors/stream%s' % (model_id, query),
+                       headers=HEADERS,
+                       data=data,
+                       content_type=content_type)
+
+
+def _model_state(client, model_id):
+    count = get(client, '/api/model/%s/vectors/count' % model_id).json
+    statistics = get(client, '/api/model/%s/statistics' % model_id).json
+    return count['count'], statistics['count']
+
+
+def test_stream_endpoint(client, stream_model):
+    words = ['s%s' % i for i in range(2500)]
+    values = numpy.random.RandomState(1).randn(2500, 8)
+    response = _post_stream(client, stream_model,
+                            _binary(words, values).getvalue(),
+                            'application/octet-stream', '?batch_size=700')
+
+    assert response.status_code == 200
+    assert response.json == {'count': 2500}
+    assert _model_state(client, stream_model) == (2510, 2510)
+
+    response = _post_stream(client, stream_model,
+                            _ndjson(['n1', 'n2', 'n3'], values[:3]).getvalue(),
+                            'application/x-ndjson')
+    assert response.json == {'count': 3}
+
+
+@pytest.mark.parametrize('content_type', [
+    'application/octet-stream', 'application/x-ndjson'
+])
+def test_bad_stream_adds_nothing(client, stream_model, content_type):
+    before = _model_state(client, stream_model)
+    words = ['bad%s' % i for i in range(50)]
+    values = numpy.ones((50, 8))
+
+    if content_type == 'application/x-ndjson':
+        data = _ndjson(words, values).getvalue() + b'{"word": "x"}\n'
+    else:
+        data = _binary(words, values).getvalue()[:-5]
+
+    response = _post_stream(client, stream_model, data, content_type,
+                            '?batch_size=10')
+
+    assert response.status_code == 400
+    assert _model_state(client, stream_model) == before
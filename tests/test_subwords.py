@@ -0,0 +1,95 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.subwords import *
+
+from .conftest import random_vectors, create_model, get
+
+
+def test_word_ngrams():
+    assert word_ngrams('where', 3, 3) == \
+        [b'<wh', b'whe', b'her', b'ere', b're>']
+    assert word_ngrams(u'\xe9', 1, 2) == \
+        [b'<\xc3\xa9', b'\xc3\xa9', b'\xc3\xa9>']
+    assert word_ngrams('where', 3, 0) == []
+    assert word_ngrams(EOS, 3, 6) == []
+
+
+def test_ngram_hashes():
+    ngrams = [b'<wh', b'where>', u'<\xe9t\xe9'.encode('utf-8'), b'']
+    expected = []
+
+    for ngram in ngrams:
+        h = 2166136261
+
+        for b in bytearray(ngram):
+            # fastText hashes each byte as a sign-extended char
+            h ^= b if b < 128 else b | 0xFFFFFF00
+            h = (h * 16777619) & 0xFFFFFFFF
+
+        expected.append(h)
+
+    assert list(ngram_hashes(ngrams)) == expected
+    assert len(ngram_hashes([])) == 0
+
+
+def test_bucket_matrix():
+    buckets = numpy.random.RandomState(0).randn(20, 4).astype(numpy.float32)
+    matrix = BucketMatrix(buckets, 2, 3)
+    values, counts = matrix.word_vectors(['abc', EOS])
+
+    rows = ngram_hashes(word_ngrams('abc', 2, 3)) % 20
+    assert list(counts) == [len(rows), 0]
+    assert numpy.allclose(values[0], buckets[rows].mean(axis=0), atol=1e-6)
+    assert not values[1].any()
+
+
+def test_load_buckets(tmp_path):
+    path = str(tmp_path / 'buckets' / 'model-1-buckets.npy')
+    assert load_buckets(path, 2, 3) is None
+
+    buckets = numpy.ones((5, 2), dtype=numpy.float32)
+    save_buckets(path, buckets)
+    assert numpy.array_equal(load_buckets(path, 2, 3).buckets, buckets)
+
+
+@pytest.fixture(scope='module')
+def subword_model(web):
+    from fasttextdb.web.app import config
+
+    words, values = random_vectors(5, 4)
+    session = web[1]()
+    model = create_model(session, words, values, 'subwords',
+                         encoding=FLOAT32_ENCODING,
+                         compression=NO_COMPRESSION)
+    model.num_buckets = 50
+    model.min_ngram_len = 2
+    model.max_ngram_len = 4
+    session.commit()
+    buckets = numpy.random.RandomState(1).randn(50, 4).astype(numpy.float32)
+    save_buckets(model_buckets_path(config, model), buckets)
+    model_id = model.id
+    session.close()
+    return model_id, BucketMatrix(buckets, 2, 4)
+
+
+def test_oov_vectors(client, subword_model):
+    model_id, buckets = subword_model
+    response = get(client, '/api/model/%s/vectors/word/unseen' % model_id)
+
+    assert response.status_code == 200
+    vector, = response.json
+    assert vector['word'] == 'unseen'
+    assert vector['id'] is None
+    assert numpy.allclose(vector['values'],
+                          buckets.word_vectors(['unseen'])[0][0],
+                          atol=1e-6)
+
+    response = get(client,
+                   '/api/model/%s/vectors/word/unseen?oov=false' % model_id)
+    assert response.json == []
+
+    # words of the model are not computed from their n-grams
+    response = get(client, '/api/model/%s/vectors/word/w001' % model_id)
+    assert response.json[0]['id'] is not None
@@ -0,0 +1,100 @@
+import numpy
+import pytest
+
+from fasttextdb.models import *
+from fasttextdb.vocabulary import *
+
+from .conftest import create_model, web_model, get
+
+WORDS = ['car', 'card', 'care', 'cart', 'cat', 'dog', u'\xe9t\xe9', 'scar']
+
+
+def _levenshtein(a, b):
+    row = list(range(len(b) + 1))
+
+    for i, x in enumerate(a):
+        previous, row = row, [i + 1]
+
+        for j, y in enumerate(b):
+            row.append(min(row[j] + 1, previous[j + 1] + 1,
+                           previous[j] + (x != y)))
+
+    return row[-1]
+
+
+def test_prefix():
+    vocabulary = Vocabulary(reversed(WORDS))
+
+    assert vocabulary.prefix('car') == ['car', 'card', 'care', 'cart']
+    assert vocabulary.prefix('car', 2) == ['car', 'card']
+    assert vocabulary.prefix(u'\xe9') == [u'\xe9t\xe9']
+    assert vocabulary.prefix('x') == []
+    assert vocabulary.prefix('') == sorted(WORDS)
+
+
+@pytest.mark.parametrize('max_distance', [0, 1, 2, 3])
+def test_fuzzy(max_distance):
+    random = numpy.random.RandomState(0)
+    words = set(''.join(random.choice(list('abcd'), random.randint(1, 7)))
+                for i in range(500))
+    vocabulary = Vocabulary(words)
+
+    for query in ['abc', 'dddd', 'a', 'bacadab']:
+        expected = sorted(((w, _levenshtein(query, w)) for w in words
+                           if _levenshtein(query, w) <= max_distance),
+                          key=lambda x: (x[1], x[0]))
+        assert vocabulary.fuzzy(query, max_distance) == expected
+
+    assert len(vocabulary.fuzzy('abc', max_distance, 3)) <= 3
+
+
+def test_load(session):
+    model = create_model(session, WORDS, numpy.zeros((len(WORDS), 2)))
+
+    assert Vocabulary.load(session, model, batch_size=3).words == \
+        sorted(WORDS)
+
+
+@pytest.fixture(scope='module')
+def vocabulary_model(web):
+    values = numpy.arange(len(WORDS) * 2, dtype=numpy.float32).reshape(
+        (len(WORDS), 2))
+    return web_model(web, 'vocabulary', WORDS, values,
+                     encoding=FLOAT32_ENCODING,
+                     compression=NO_COMPRESSION)
+
+
+def test_search_words(client, vocabulary_model):
+    url = '/api/model/%s/words' % vocabulary_model
+    response = get(client, url + '?prefix=car&limit=3')
+
+    assert response.status_code == 200
+    assert response.json == [{'word': 'car'}, {'word': 'card'},
+                             {'word': 'care'}]
+
+    response = get(client, url + '?fuzzy=cat&max_distance=1&vectors=true')
+    assert [(r['word'], r['distance']) for r in response.json] == \
+        [('cat', 0), ('car', 1), ('cart', 1)]
+    assert response.json[0]['values'] == [8.0, 9.0]
+
+
+@pytest.mark.parametrize('query', ['', '?fuzzy=cat&max_distance=4',
+                                   '?fuzzy=cat&max_distance=-1'])
+def test_search_words_errors(client, vocabulary_model, query):
+    response = get(client, '/api/model/%s/words%s' % (vocabulary_model, query))
+    assert response.status_code == 400
+
+
+def test_model_vocabulary(session):
+    model = create_model(session, WORDS[:3], numpy.zeros((3, 2)),
+                         'cached')
+    # the cache is keyed by model ID, which other databases reuse
+    drop_model_vocabulary(model.id)
+    vocabulary = model_vocabulary(session, model)
+
+    assert vocabulary.words == WORDS[:3]
+    assert model_vocabulary(session, model) is vocabulary
+
+    drop_model_vocabulary(model.id)
+    assert model_vocabulary(session, model) is not vocabulary
+    drop_model_vocabulary(model.id)